@@ -1 +1,6 @@
-from autojenkins.jobs import Jenkins
+import time
+
+#: When the package started loading, to report import time with ``--profile``
+IMPORT_STARTED = time.time()
+
+from autojenkins.jobs import Jenkins  # noqa: E402
@@ -0,0 +1,149 @@
+"""
+Export and import the ``config.xml`` of every job as a single archive.
+
+The archive is a gzipped tarball with one ``jobs/<name>/config.xml`` member
+per job, followed by a ``manifest.json`` that records the SHA-256 of each
+configuration::
+
+    {"format": 1, "jobs": {"<name>": {"sha256": "..."}}}
+"""
+import hashlib
+import io
+import json
+import os
+import tarfile
+import time
+
+from autojenkins.jobs import HttpNotFoundError
+from autojenkins.parallel import DEFAULT_WORKERS, imap_unordered
+
+
+MANIFEST = 'manifest.json'
+FORMAT_VERSION = 1
+CONFIG_MEMBER = 'jobs/{0}/config.xml'
+
+CREATED = 'created'
+UPDATED = 'updated'
+UNCHANGED = 'unchanged'
+
+
+class ArchiveError(Exception):
+    pass
+
+
+def config_hash(config):
+    """
+    Return the SHA-256 hex digest of a job configuration.
+    """
+    if not isinstance(config, bytes):
+        config = config.encode('utf-8')
+    return hashlib.sha256(config).hexdigest()
+
+
+def _add_member(tar, name, data):
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mtime = int(time.time())
+    tar.addfile(info, io.BytesIO(data))
+
+
+def export_jobs(jenkins, path, workers=DEFAULT_WORKERS):
+    """
+    Write the configuration of every job in ``jenkins`` to archive ``path``.
+
+    Configurations are fetched with at most ``workers`` concurrent requests
+    and written to the archive as soon as they arrive. Jobs deleted since
+    the listing are left out. The archive is written next to ``path`` and
+    only replaces it once complete, so a failed export keeps the previous
+    archive.
+
+    :returns: the manifest, a dict of job name to ``{'sha256': ...}``
+    """
+    names = [name for name, _ in jenkins.all_jobs(include_colorless=True)]
+    manifest = {}
+    partial = path + '.tmp'
+    try:
+        with tarfile.open(partial, 'w:gz') as tar:
+            results = imap_unordered(jenkins.get_config_xml, names, workers)
+            for name, config, error in results:
+                if isinstance(error, HttpNotFoundError):
+                    continue
+                if error is not None:
+                    raise error
+                data = config.encode('utf-8')
+                _add_member(tar, CONFIG_MEMBER.format(name), data)
+                manifest[name] = {'sha256': config_hash(data)}
+            content = {'format': FORMAT_VERSION, 'jobs': manifest}
+            _add_member(tar, MANIFEST,
+                        json.dumps(content, indent=1,
+                                   sort_keys=True).encode())
+    except BaseException:
+        os.remove(partial)
+        raise
+    os.rename(partial, path)
+    return manifest
+
+
+def read_manifest(tar):
+    """
+    Return the job manifest stored in an open archive.
+    """
+    try:
+        member = tar.getmember(MANIFEST)
+    except KeyError:
+        raise ArchiveError("Archive has no '{0}'".format(MANIFEST))
+    content = json.loads(tar.extractfile(member).read().decode('utf-8'))
+    if content.get('format') != FORMAT_VERSION:
+        raise ArchiveError(
+            "Unsupported archive format: {0}".format(content.get('format')))
+    return content['jobs']
+
+
+def _iter_configs(tar, manifest):
+    """
+    Yield ``(name, config)`` for each job in the archive, checking hashes.
+    """
+    for member in tar:
+        parts = member.name.split('/')
+        if len(parts) != 3 or parts[0] != 'jobs' or not member.isfile():
+            continue
+        name = parts[1]
+        data = tar.extractfile(member).read()
+        expected = manifest.get(name, {}).get('sha256')
+        if config_hash(data) != expected:
+            raise ArchiveError("Checksum mismatch for job '{0}'".format(name))
+        yield name, data.decode('utf-8')
+
+
+def import_jobs(jenkins, path, workers=DEFAULT_WORKERS):
+    """
+    Restore all jobs from archive ``path`` into ``jenkins``.
+
+    New jobs are created, existing ones have their ``config.xml`` replaced,
+    and jobs whose remote configuration already matches the archived hash
+    are left alone. Up to ``workers`` jobs are restored concurrently.
+
+    :returns: a dict of job name to ``'created'``, ``'updated'``,
+        ``'unchanged'`` or the exception raised while restoring it
+    """
+    existing = set(name for name, _ in
+                   jenkins.all_jobs(include_colorless=True))
+
+    def restore(job):
+        name, config = job
+        if name not in existing:
+            jenkins.create_from_xml(name, config)
+            return CREATED
+        if config_hash(jenkins.get_config_xml(name)) == config_hash(config):
+            return UNCHANGED
+        jenkins.set_config_xml(name, config)
+        return UPDATED
+
+    outcome = {}
+    with tarfile.open(path, 'r:gz') as tar:
+        manifest = read_manifest(tar)
+        results = imap_unordered(restore, _iter_configs(tar, manifest),
+                                 workers)
+        for (name, _), status, error in results:
+            outcome[name] = status if error is None else error
+    return outcome
@@ -0,0 +1,257 @@
+"""
+List and download build artifacts.
+
+Downloads are streamed to disk in fixed-size chunks, so memory use does not
+depend on file size. Large files are split into byte ranges fetched
+concurrently, and interrupted downloads resume from the ranges already on
+disk. Should the server (or a proxy) stop honouring ranges, the file is
+downloaded again as a whole. When Jenkins recorded a fingerprint for the
+file, its MD5 is checked.
+Fingerprints only name the file, not its directory, so files sharing their
+name with another artifact are not checked.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import Counter, namedtuple
+
+try:
+    from urllib.parse import quote
+except ImportError:  # Python 2
+    from urllib import quote
+
+from autojenkins.jobs import BUILDINFO, LAST_BUILD, _validate, parse
+from autojenkins.parallel import DEFAULT_WORKERS, imap_unordered
+
+
+CHUNK_SIZE = 1024 * 1024
+PART_SIZE = 64 * 1024 * 1024
+ARTIFACT_TREE = ('url,artifacts[fileName,relativePath],'
+                 'fingerprint[fileName,hash]')
+CONTENT_RANGE = re.compile(r'bytes \d+-\d+/(\d+)')
+RANGE_NOT_SATISFIABLE = 416
+
+
+class ArtifactChecksumError(Exception):
+    pass
+
+
+class RangeIgnored(Exception):
+    pass
+
+
+class Artifact(namedtuple('Artifact', 'filename relative_path url md5')):
+    """
+    A file archived by a build.
+
+    ``md5`` is the hash of the Jenkins fingerprint, or ``None`` if there
+    is none or it cannot be told apart from that of another artifact.
+    """
+    __slots__ = ()
+
+
+def list_artifacts(jenkins, jobname, build_number=None):
+    """
+    Return the :class:`Artifact` list of a build (default: the last one).
+    """
+    if build_number is not None:
+        args = (BUILDINFO, jobname, build_number)
+    else:
+        args = (LAST_BUILD, jobname)
+    response = jenkins._build_get(*args, params={'tree': ARTIFACT_TREE})
+    info = parse(response)
+    artifacts = info.get('artifacts') or []
+    fingerprints = info.get('fingerprint') or []
+    # Fingerprints only carry the name of the file, without its directory
+    archived = Counter(artifact['fileName'] for artifact in artifacts)
+    fingerprinted = Counter(fingerprint['fileName']
+                            for fingerprint in fingerprints)
+    hashes = dict((fingerprint['fileName'], fingerprint['hash'])
+                  for fingerprint in fingerprints
+                  if archived[fingerprint['fileName']] == 1 and
+                  fingerprinted[fingerprint['fileName']] == 1)
+    return [Artifact(artifact['fileName'], artifact['relativePath'],
+                     info['url'] + 'artifact/' +
+                     quote(artifact['relativePath']),
+                     hashes.get(artifact['fileName']))
+            for artifact in artifacts]
+
+
+def _get_range(jenkins, url, start, end):
+    headers = {'Range': 'bytes={0}-{1}'.format(start, end)}
+    return jenkins._http_get(url, stream=True, headers=headers)
+
+
+def _check_range(response, start, end, size):
+    """
+    Make sure ``response`` holds bytes ``start`` to ``end`` of a file of
+    ``size`` bytes, and not the whole file or another range.
+
+    :raises RangeIgnored: if it does not
+    """
+    expected = 'bytes {0}-{1}/{2}'.format(start, end, size)
+    if (response.status_code != 206 or
+            response.headers.get('Content-Range', '').strip() != expected):
+        response.close()
+        raise RangeIgnored('Expected {0}, got HTTP {1} with {2!r}'.format(
+            expected, response.status_code,
+            response.headers.get('Content-Range')))
+
+
+def _get_first_range(jenkins, url, end):
+    """
+    Request the first range of a file, or the whole file if it is empty, as
+    no range of an empty file can be satisfied.
+    """
+    headers = {'Range': 'bytes=0-{0}'.format(end)}
+    response = jenkins._request('GET', url, stream=True, headers=headers)
+    if response.status_code == RANGE_NOT_SATISFIABLE:
+        response.close()
+        return jenkins._http_get(url, stream=True)
+    return _validate(response)
+
+
+def _write(response, fileobj, chunk_size):
+    try:
+        for chunk in response.iter_content(chunk_size):
+            fileobj.write(chunk)
+    finally:
+        response.close()
+
+
+def _file_md5(path, chunk_size=CHUNK_SIZE):
+    md5 = hashlib.md5()
+    with open(path, 'rb') as fileobj:
+        for chunk in iter(lambda: fileobj.read(chunk_size), b''):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+
+class _PartState(object):
+    """
+    Record of the byte ranges of a partial download that are complete.
+    """
+
+    def __init__(self, path, size=None, done=()):
+        self.path = path
+        self.size = size
+        self.done = set(done)
+        self.lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(path) as fileobj:
+                state = json.load(fileobj)
+        except (IOError, OSError, ValueError):
+            return cls(path)
+        return cls(path, state['size'], state['done'])
+
+    def add(self, part):
+        with self.lock:
+            self.done.add(part)
+            with open(self.path, 'w') as fileobj:
+                json.dump({'size': self.size, 'done': sorted(self.done)},
+                          fileobj)
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def download_artifact(jenkins, artifact, path, workers=4,
+                      part_size=PART_SIZE, chunk_size=CHUNK_SIZE):
+    """
+    Download an artifact to ``path``.
+
+    The file is fetched into ``path + '.part'`` in ranges of ``part_size``
+    bytes, ``workers`` at a time, and moved to ``path`` once complete and
+    verified. Completed ranges are recorded in ``path + '.part.json'`` so
+    that a later call resumes where an interrupted one stopped.
+
+    :raises ArtifactChecksumError: if the MD5 does not match the fingerprint
+    """
+    partial = path + '.part'
+    state = _PartState.load(partial + '.json')
+    if state.size is None or not os.path.exists(partial):
+        response = _get_first_range(jenkins, artifact.url, part_size - 1)
+        match = CONTENT_RANGE.match(response.headers.get('Content-Range', ''))
+        if response.status_code != 206 or match is None:
+            # no support for ranges: the whole file is in the response
+            with open(partial, 'wb') as fileobj:
+                _write(response, fileobj, chunk_size)
+            state.size = None
+        else:
+            state = _PartState(state.path, int(match.group(1)))
+            with open(partial, 'wb') as fileobj:
+                fileobj.truncate(state.size)
+                _write(response, fileobj, chunk_size)
+            state.add(0)
+
+    if state.size is not None:
+        parts = (state.size + part_size - 1) // part_size
+        missing = [part for part in range(parts) if part not in state.done]
+
+        def fetch(part):
+            start = part * part_size
+            end = min(start + part_size, state.size) - 1
+            response = _get_range(jenkins, artifact.url, start, end)
+            _check_range(response, start, end, state.size)
+            with open(partial, 'r+b') as fileobj:
+                fileobj.seek(start)
+                _write(response, fileobj, chunk_size)
+            state.add(part)
+
+        errors = [error for _, _, error in
+                  imap_unordered(fetch, missing, workers)
+                  if error is not None]
+        if any(isinstance(error, RangeIgnored) for error in errors):
+            # the ranges written so far cannot be trusted either
+            state.remove()
+            with open(partial, 'wb') as fileobj:
+                _write(jenkins._http_get(artifact.url, stream=True), fileobj,
+                       chunk_size)
+        elif errors:
+            raise errors[0]
+
+    if artifact.md5 is not None and _file_md5(partial) != artifact.md5:
+        os.remove(partial)
+        state.remove()
+        raise ArtifactChecksumError(
+            "MD5 mismatch for '{0}'".format(artifact.relative_path))
+    os.rename(partial, path)
+    state.remove()
+    return path
+
+
+def download_artifacts(jenkins, jobname, directory, build_number=None,
+                       workers=DEFAULT_WORKERS, part_workers=4,
+                       part_size=PART_SIZE):
+    """
+    Download all artifacts of a build into ``directory``, keeping their
+    relative paths. Up to ``workers`` files are downloaded concurrently.
+
+    :returns: a dict of artifact relative path to local path or exception
+    """
+    artifacts = list_artifacts(jenkins, jobname, build_number)
+
+    def download(artifact):
+        parts = artifact.relative_path.split('/')
+        if '..' in parts:
+            raise ValueError("Unsafe artifact path '{0}'".format(
+                artifact.relative_path))
+        path = os.path.join(directory, *parts)
+        if not os.path.isdir(os.path.dirname(path)):
+            try:
+                os.makedirs(os.path.dirname(path))
+            except OSError:
+                if not os.path.isdir(os.path.dirname(path)):
+                    raise
+        return download_artifact(jenkins, artifact, path, part_workers,
+                                 part_size)
+
+    return dict((artifact.relative_path, path if error is None else error)
+                for artifact, path, error in
+                imap_unordered(download, artifacts, workers))
@@ -0,0 +1,265 @@
+"""
+Trigger many builds at once and collect their results.
+"""
+import re
+import time
+from collections import namedtuple
+
+from autojenkins.deadline import Deadline, DeadlineExceeded, within
+from autojenkins.jobs import (API, BUILDINFO, JOBINFO, LIST, JobInexistent,
+                              JobNotBuildable, parse)
+from autojenkins.parallel import DEFAULT_WORKERS, imap_unordered
+
+
+QUEUE_ITEM = re.compile(r'/queue/item/(\d+)')
+QUEUE_ITEM_INFO = '{0}/queue/item/{1}/' + API
+BUILD_TREE = 'number,building,result'
+
+
+class BuildCancelled(Exception):
+    pass
+
+
+class BuildOutcome(namedtuple('BuildOutcome',
+                              'jobname params queue_id number result error')):
+    """
+    Outcome of one triggered build.
+
+    ``number`` and ``result`` are only known when waiting for completion.
+    ``error`` holds the exception that prevented triggering the build, or
+    following it until completion, if any.
+    """
+    __slots__ = ()
+
+
+def _normalize(builds):
+    """
+    Turn job names or ``(jobname, params)`` pairs into pairs.
+    """
+    for build in builds:
+        if isinstance(build, tuple):
+            yield build
+        else:
+            yield build, None
+
+
+def parse_queue_id(response):
+    """
+    Return the id of the queue item created by a build trigger, or ``None``.
+    """
+    match = QUEUE_ITEM.search(response.headers.get('Location') or '')
+    return int(match.group(1)) if match else None
+
+
+def buildable_jobs(jenkins):
+    """
+    Return a dict of job name to ``buildable`` flag, in a single request.
+    """
+    response = jenkins._build_get(LIST,
+                                  params={'tree': 'jobs[name,buildable]'})
+    jobs = parse(response).get('jobs', [])
+    return dict((job['name'], job.get('buildable', False)) for job in jobs)
+
+
+def preflight_error(buildable, jobname):
+    """
+    Return the error that prevents building ``jobname``, if any, given the
+    result of :func:`buildable_jobs`.
+    """
+    if jobname not in buildable:
+        return JobInexistent("Job '%s' doesn't exists" % jobname)
+    elif not buildable[jobname]:
+        return JobNotBuildable("Job '%s' is not buildable (deactivated)."
+                               % jobname)
+    return None
+
+
+def trigger_many(jenkins, builds, workers=DEFAULT_WORKERS, deadline=None):
+    """
+    Trigger builds concurrently after a single preflight check.
+
+    :param builds:
+        Job names, or ``(jobname, params)`` pairs to trigger the same job
+        several times with different parameters.
+    :param deadline:
+        Seconds, or a :class:`autojenkins.deadline.Deadline`, to trigger
+        all builds in
+    :returns: a list of :class:`BuildOutcome`, in the order of ``builds``
+    :raises DeadlineExceeded: when the deadline passed, with the list of
+        outcomes as ``progress``
+    """
+    builds = list(_normalize(builds))
+    deadline = Deadline.start(deadline)
+    with within(jenkins, deadline):
+        buildable = buildable_jobs(jenkins)
+    outcomes = [None] * len(builds)
+
+    def trigger(index):
+        jobname, params = builds[index]
+        with within(jenkins, deadline):
+            response = jenkins._trigger(jobname, params)
+        return parse_queue_id(response)
+
+    to_trigger = []
+    for index, (jobname, params) in enumerate(builds):
+        error = preflight_error(buildable, jobname)
+        if error is None:
+            to_trigger.append(index)
+        else:
+            outcomes[index] = BuildOutcome(jobname, params, None, None, None,
+                                           error)
+
+    for index, queue_id, error in imap_unordered(trigger, to_trigger,
+                                                 workers):
+        jobname, params = builds[index]
+        outcomes[index] = BuildOutcome(jobname, params, queue_id, None, None,
+                                       error)
+    if any(isinstance(outcome.error, DeadlineExceeded)
+           for outcome in outcomes):
+        raise DeadlineExceeded('Deadline of {0}s exceeded while triggering '
+                               'builds'.format(deadline.seconds), outcomes)
+    return outcomes
+
+
+def _recent_builds(jenkins, jobname, count):
+    tree = 'builds[number,queueId,building,result]{{0,{0}}}'.format(count)
+    response = jenkins._build_get(JOBINFO, jobname, params={'tree': tree})
+    return parse(response).get('builds', [])
+
+
+def _locate(jenkins, jobname, queue_id, number=None):
+    """
+    Return ``(number, build)`` for a queue item that is not among the recent
+    builds of its job, looking the build up by ``number`` if already known.
+    ``build`` is ``None`` while the item waits in the queue.
+
+    :raises BuildCancelled: if the queue item was cancelled
+    """
+    if number is None:
+        item = parse(jenkins._build_get(QUEUE_ITEM_INFO, queue_id))
+        if item.get('cancelled'):
+            raise BuildCancelled("Build of '{0}' was cancelled in the queue"
+                                 .format(jobname))
+        executable = item.get('executable')
+        if not executable:
+            return None, None
+        number = executable['number']
+    response = jenkins._build_get(BUILDINFO, jobname, number,
+                                  params={'tree': BUILD_TREE})
+    return number, parse(response)
+
+
+def wait_for_all(jenkins, outcomes, poll_interval=10,
+                 workers=DEFAULT_WORKERS, deadline=None):
+    """
+    Wait until every triggered build in ``outcomes`` has finished.
+
+    Builds are matched to their queue items; each round costs one request
+    per job that still has running builds, plus one per queue item whose
+    build is not among the recent builds of its job, such as items still
+    waiting or cancelled. A build that cannot be followed, for instance
+    because its job was deleted, gets the error in its outcome.
+
+    :returns: a new list of :class:`BuildOutcome` with number and result
+    :raises DeadlineExceeded: when the deadline passed, with the list of
+        outcomes known so far as ``progress``
+    """
+    outcomes = list(outcomes)
+    deadline = Deadline.start(deadline)
+    # Jenkins merges identical triggers of a job into a single queue item,
+    # so several outcomes may share a queue id
+    pending = {}
+    for index, outcome in enumerate(outcomes):
+        if outcome.error is None and outcome.queue_id is not None:
+            pending.setdefault(outcome.queue_id, []).append(index)
+    numbers = {}
+
+    def update(queue_id, **fields):
+        for index in pending.pop(queue_id):
+            outcomes[index] = outcomes[index]._replace(**fields)
+
+    def failed(queue_id, error):
+        if isinstance(error, DeadlineExceeded):
+            raise DeadlineExceeded(str(error), outcomes)
+        update(queue_id, error=error)
+
+    def recent_builds(jobname):
+        with within(jenkins, deadline):
+            return _recent_builds(jenkins, jobname, window[jobname])
+
+    def locate(item):
+        queue_id, jobname = item
+        with within(jenkins, deadline):
+            return _locate(jenkins, jobname, queue_id, numbers.get(queue_id))
+
+    while pending:
+        per_job = {}
+        for queue_id, indices in pending.items():
+            jobname = outcomes[indices[0]].jobname
+            per_job.setdefault(jobname, []).append(queue_id)
+        window = dict((jobname, len(queue_ids) + 10)
+                      for jobname, queue_ids in per_job.items())
+        seen = set()
+        rounds = imap_unordered(recent_builds, list(per_job), workers)
+        for jobname, builds, error in rounds:
+            if error is not None:
+                for queue_id in per_job[jobname]:
+                    failed(queue_id, error)
+                continue
+            for build in builds:
+                queue_id = build.get('queueId')
+                if queue_id not in pending:
+                    continue
+                seen.add(queue_id)
+                if not build.get('building', True):
+                    update(queue_id, number=build['number'],
+                           result=build['result'])
+
+        missing = [(queue_id, outcomes[indices[0]].jobname)
+                   for queue_id, indices in pending.items()
+                   if queue_id not in seen]
+        for (queue_id, _), found, error in imap_unordered(locate, missing,
+                                                          workers):
+            if error is not None:
+                failed(queue_id, error)
+                continue
+            number, build = found
+            if build is None:
+                continue
+            numbers[queue_id] = number
+            if not build.get('building', True):
+                update(queue_id, number=number, result=build.get('result'))
+
+        if pending:
+            if deadline is None:
+                time.sleep(poll_interval)
+            else:
+                deadline.sleep(poll_interval, outcomes)
+    return outcomes
+
+
+def build_many(jenkins, builds, wait=False, workers=DEFAULT_WORKERS,
+               poll_interval=10, deadline=None):
+    """
+    Trigger many builds concurrently and optionally wait for all of them,
+    all within ``deadline`` if given.
+
+    See :func:`trigger_many` and :func:`wait_for_all`.
+    """
+    deadline = Deadline.start(deadline)
+    outcomes = trigger_many(jenkins, builds, workers, deadline)
+    if wait:
+        outcomes = wait_for_all(jenkins, outcomes, poll_interval, workers,
+                                deadline)
+    return outcomes
+
+
+def succeeded(outcomes, wait=True):
+    """
+    Tell whether every build succeeded.
+
+    If builds were not waited for, only check that they were triggered.
+    """
+    return all(outcome.error is None and
+               (not wait or outcome.result == 'SUCCESS')
+               for outcome in outcomes)
@@ -0,0 +1,101 @@
+"""
+Enable or disable many jobs at once.
+
+Jobs are selected from a single listing of the server, by name, glob,
+regex or color, and only those not already in the requested state are
+changed, with concurrent requests::
+
+    disable_jobs(jenkins, globs=['release-*'], colors=['blue', 'red'])
+"""
+import fnmatch
+from collections import namedtuple
+
+from autojenkins.jobs import AutojenkinsError, JobInexistent
+from autojenkins.listing import job_filter, split_color
+from autojenkins.parallel import DEFAULT_WORKERS, imap_unordered
+
+
+class ToggleOutcome(namedtuple('ToggleOutcome', 'jobname changed error')):
+    """
+    Outcome of enabling or disabling one job.
+
+    ``changed`` is ``False`` for jobs already in the requested state, and
+    ``error`` holds the exception that prevented the change, if any.
+    """
+    __slots__ = ()
+
+
+def is_disabled(color):
+    return split_color(color)[0] == 'disabled'
+
+
+def select_jobs(jobs, names=None, globs=None, pattern=None, colors=None):
+    """
+    Select jobs from ``(name, color)`` pairs.
+
+    A job is selected if it is one of ``names`` or matches one of ``globs``
+    (any job, when neither is given), and its name matches the regex
+    ``pattern`` and its color is one of ``colors``, when given.
+
+    :returns: ``(selected, missing)``: the selected ``(name, color)`` pairs
+        sorted by name, and the ``names`` that are not in ``jobs``
+    :raises AutojenkinsError: if no criteria is given at all
+    """
+    if not (names or globs or pattern or colors):
+        raise AutojenkinsError('No job selected: give names, globs, a '
+                               'pattern or colors')
+    names = set(names or [])
+    globs = list(globs or [])
+    accept = job_filter(pattern, colors)
+    selected = []
+    for name, color in jobs:
+        if (names or globs) and name not in names and not any(
+                fnmatch.fnmatchcase(name, glob) for glob in globs):
+            continue
+        if accept is not None and not accept((name, color)):
+            continue
+        selected.append((name, color))
+    missing = names - set(name for name, _ in jobs)
+    return sorted(selected), sorted(missing)
+
+
+def set_enabled(jenkins, enabled, names=None, globs=None, pattern=None,
+                colors=None, workers=DEFAULT_WORKERS, dry_run=False):
+    """
+    Enable or disable the jobs selected by :func:`select_jobs`.
+
+    :param enabled: ``True`` to enable the jobs, ``False`` to disable them
+    :param dry_run: if ``True``, only report what would change
+    :returns: a list of :class:`ToggleOutcome`, sorted by job name
+    """
+    selected, missing = select_jobs(jenkins.all_jobs(), names, globs,
+                                    pattern, colors)
+    outcomes = [ToggleOutcome(name, False, JobInexistent(
+        "Job '%s' doesn't exist" % name)) for name in missing]
+    outcomes.extend(ToggleOutcome(name, False, None)
+                    for name, color in selected
+                    if is_disabled(color) != enabled)
+    to_change = [name for name, color in selected
+                 if is_disabled(color) == enabled]
+    if dry_run:
+        outcomes.extend(ToggleOutcome(name, True, None) for name in to_change)
+    else:
+        toggle = jenkins.enable if enabled else jenkins.disable
+        outcomes.extend(ToggleOutcome(name, error is None, error)
+                        for name, _, error in
+                        imap_unordered(toggle, to_change, workers))
+    return sorted(outcomes, key=lambda outcome: outcome.jobname)
+
+
+def enable_jobs(jenkins, **selection):
+    """
+    Enable the selected jobs; see :func:`set_enabled`.
+    """
+    return set_enabled(jenkins, True, **selection)
+
+
+def disable_jobs(jenkins, **selection):
+    """
+    Disable the selected jobs; see :func:`set_enabled`.
+    """
+    return set_enabled(jenkins, False, **selection)
@@ -0,0 +1,432 @@
+"""
+Local caching daemon shared by short-lived ``autojenkins`` processes.
+
+Every CLI invocation starts cold: it opens new connections, negotiates TLS
+and asks the server again for job lists it asked for a second ago. A
+:class:`CacheDaemon`, started with ``autojenkins serve``, stays up and
+answers requests on a Unix socket over pooled connections, caching:
+
+* job lists and job information for ``ttl`` seconds,
+* the information of completed builds, which never changes, until the job
+  is written to.
+
+Any POST drops the cached entries of the job it targets, and the job lists.
+Clients talk to the daemon through a :class:`DaemonTransport`, which sends
+requests directly to the server when the daemon is not running, and always
+sends streamed requests and GETs that are never cached, such as console
+logs and artifacts, directly too, as the daemon relays whole bodies::
+
+    jenkins = Jenkins(url, transport=DaemonTransport())
+
+Messages are JSON lines: a request holds the method, URL and the keyword
+arguments of :func:`requests.request`; a response holds the status,
+headers, cookies and body, as recorded by
+:class:`autojenkins.transport.RecordingTransport`, or the name of the
+``requests`` exception raised upstream.
+"""
+import hashlib
+import json
+import os
+import re
+import socket
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+
+from autojenkins.jobs import parse
+from autojenkins.transport import (ReplayResponse, SessionTransport,
+                                   Transport, _decode_body, _encode_body,
+                                   request_key)
+
+try:
+    from socketserver import StreamRequestHandler, ThreadingMixIn
+    from socketserver import UnixStreamServer
+except ImportError:  # Python 2
+    from SocketServer import StreamRequestHandler, ThreadingMixIn
+    from SocketServer import UnixStreamServer
+
+
+#: Environment variable overriding :data:`DEFAULT_SOCKET`
+SOCKET_ENV = 'AUTOJENKINS_SOCKET'
+DEFAULT_SOCKET = '~/.autojenkins.sock'
+
+LISTING = re.compile(r'^https?://[^/]+(/(?!queue/|computer/|crumbIssuer/)'
+                     r'[^/]+)?/api/python$')
+JOB_INFO = re.compile(r'/job/[^/]+/api/python$')
+BUILD_INFO = re.compile(r'/job/[^/]+/\d+/api/python$')
+JOB = re.compile(r'/job/([^/]+)/')
+
+
+def socket_path(path=None):
+    """
+    Return the socket of the daemon: ``path``, else the one named by
+    :data:`SOCKET_ENV`, else :data:`DEFAULT_SOCKET`.
+    """
+    path = path or os.environ.get(SOCKET_ENV) or DEFAULT_SOCKET
+    return os.path.expanduser(path)
+
+
+def cacheable(url):
+    """
+    Tell whether a GET of ``url`` may have its response cached.
+    """
+    return bool(BUILD_INFO.search(url) or JOB_INFO.search(url) or
+                LISTING.match(url))
+
+
+def _completed(response):
+    """
+    Tell whether a build information response is that of a completed build.
+    """
+    try:
+        return parse(response).get('building') is False
+    except Exception:
+        return False
+
+
+def lifetime(method, url, response):
+    """
+    Return for how long a response may be cached: ``'ttl'``, ``'forever'``
+    or ``None`` if it may not.
+    """
+    if method.upper() != 'GET' or response.status_code != 200:
+        return None
+    if BUILD_INFO.search(url):
+        return 'forever' if _completed(response) else None
+    if JOB_INFO.search(url) or LISTING.match(url):
+        return 'ttl'
+    return None
+
+
+class ResponseCache(object):
+    """
+    Thread-safe cache of response records, evicting the least recently
+    used beyond ``max_entries``.
+    """
+
+    def __init__(self, ttl=10, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return None
+            url, expires, record = entry
+            if expires is not None and expires < time.time():
+                return None
+            self._entries[key] = entry
+            return record
+
+    def put(self, key, url, record, forever=False):
+        expires = None if forever else time.time() + self.ttl
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (url, expires, record)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, url):
+        """
+        Drop what a POST to ``url`` may have changed: the entries of its
+        job and all job lists, or everything but completed builds if it
+        does not target a job.
+        """
+        match = JOB.search(url)
+        prefix = match.group(0) if match else None
+        with self._lock:
+            for key, (cached, expires, _) in list(self._entries.items()):
+                if prefix is not None and prefix in cached:
+                    del self._entries[key]
+                elif expires is not None and (prefix is None or
+                                              LISTING.match(cached)):
+                    del self._entries[key]
+
+
+def _auth_key(auth):
+    if auth is None:
+        return None
+    return hashlib.sha256(json.dumps(list(auth)).encode('utf-8')).hexdigest()
+
+
+def encode_request(method, url, kwargs):
+    """
+    Return the message sent to the daemon for a request.
+    """
+    message = {'method': method, 'url': url}
+    for name in ('params', 'headers', 'verify', 'proxies', 'timeout'):
+        if kwargs.get(name) is not None:
+            message[name] = kwargs[name]
+    if kwargs.get('auth') is not None:
+        message['auth'] = list(kwargs['auth'])
+    if kwargs.get('cookies'):
+        message['cookies'] = dict(kwargs['cookies'])
+    data = kwargs.get('data')
+    if isinstance(data, dict):
+        message['form'] = data
+    elif data is not None:
+        if not isinstance(data, bytes):
+            data = data.encode('utf-8')
+        message['data'] = _encode_body(data)
+    return message
+
+
+def decode_request(message):
+    """
+    Return the ``(method, url, kwargs)`` of a message from a client.
+    """
+    kwargs = dict((name, message[name]) for name in
+                  ('params', 'headers', 'verify', 'proxies', 'cookies')
+                  if name in message)
+    if 'auth' in message:
+        kwargs['auth'] = tuple(message['auth'])
+    if 'timeout' in message:
+        timeout = message['timeout']
+        kwargs['timeout'] = (tuple(timeout) if isinstance(timeout, list)
+                             else timeout)
+    if 'form' in message:
+        kwargs['data'] = message['form']
+    elif 'data' in message:
+        kwargs['data'] = _decode_body(message['data'])
+    return message['method'], message['url'], kwargs
+
+
+class _DaemonHandler(StreamRequestHandler):
+
+    def handle(self):
+        for line in iter(self.rfile.readline, b''):
+            if self.server.stopped:
+                return
+            message = json.loads(line.decode('utf-8'))
+            record = self.server.daemon.handle(message)
+            self.wfile.write((json.dumps(record) + '\n').encode('utf-8'))
+            self.wfile.flush()
+
+
+class _ThreadingUnixServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+    stopped = False
+
+
+class CacheDaemon(object):
+    """
+    Serve requests from local clients on the Unix socket ``path``, through
+    a pooled ``transport`` and a :class:`ResponseCache`.
+
+    The socket is only accessible to the user running the daemon, and
+    cached responses are only served to clients with the same credentials.
+    Run it in the foreground with :meth:`serve_forever`, or use it as a
+    context manager to run it in a background thread.
+    """
+
+    def __init__(self, path=None, transport=None, ttl=10, max_entries=10000):
+        self.path = socket_path(path)
+        self.transport = transport or SessionTransport()
+        self.cache = ResponseCache(ttl, max_entries)
+        self.hits = self.misses = 0
+        self._server = None
+        self._thread = None
+
+    def handle(self, message):
+        """
+        Answer one request message with a response record.
+        """
+        method, url, kwargs = decode_request(message)
+        key = (request_key(method, url, kwargs.get('params')),
+               _auth_key(kwargs.get('auth')))
+        if method.upper() == 'GET':
+            record = self.cache.get(key)
+            if record is not None:
+                self.hits += 1
+                return record
+            self.misses += 1
+        started = time.time()
+        try:
+            response = self.transport.request(method, url, **kwargs)
+            content = response.content
+        except requests.RequestException as error:
+            return {'error': type(error).__name__, 'message': str(error)}
+        finally:
+            if method.upper() != 'GET':
+                self.cache.invalidate(url)
+        record = {
+            'status': response.status_code,
+            'headers': dict(response.headers),
+            'cookies': dict(response.cookies or {}),
+            'elapsed': time.time() - started,
+        }
+        record.update(_encode_body(content))
+        kind = lifetime(method, url, response)
+        if kind is not None:
+            self.cache.put(key, url, record, forever=kind == 'forever')
+        return record
+
+    def _bind(self):
+        if os.path.exists(self.path):
+            if is_running(self.path):
+                raise socket.error('A daemon already listens on {0}'
+                                   .format(self.path))
+            os.remove(self.path)
+        umask = os.umask(0o077)
+        try:
+            self._server = _ThreadingUnixServer(self.path, _DaemonHandler)
+        finally:
+            os.umask(umask)
+        self._server.daemon = self
+
+    def serve_forever(self):
+        """
+        Serve until interrupted, then remove the socket.
+        """
+        self._bind()
+        try:
+            self._server.serve_forever()
+        finally:
+            self._close()
+
+    def _close(self):
+        self._server.stopped = True
+        self._server.server_close()
+        self._server = None
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.transport.close()
+
+    def start(self):
+        """
+        Start serving in a background thread.
+        """
+        self._bind()
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stop the server and wait for its thread to finish.
+        """
+        if self._server is not None:
+            self._server.shutdown()
+            self._thread.join()
+            self._close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def _connect(path):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except socket.error:
+        sock.close()
+        raise
+    return sock
+
+
+def is_running(path=None):
+    """
+    Tell whether a daemon accepts connections on ``path``.
+    """
+    try:
+        _connect(socket_path(path)).close()
+    except socket.error:
+        return False
+    return True
+
+
+def _requests_error(record):
+    cls = getattr(requests.exceptions, record['error'], None)
+    if not (isinstance(cls, type) and
+            issubclass(cls, requests.RequestException)):
+        cls = requests.RequestException
+    return cls(record['message'])
+
+
+class DaemonTransport(Transport):
+    """
+    Send requests through the daemon listening on ``path``, or directly
+    through ``fallback`` (by default a
+    :class:`autojenkins.transport.SessionTransport`) when it is not running.
+
+    Streamed requests and GETs the daemon never caches (see
+    :func:`cacheable`) are always sent directly, so that large bodies are
+    neither buffered by the daemon nor encoded in its messages.
+
+    Each thread keeps its own connection to the daemon. A request that was
+    sent but not answered is only sent again directly if it is a GET, so
+    that builds are never triggered twice.
+    """
+
+    def __init__(self, path=None, fallback=None):
+        self.path = socket_path(path)
+        self._fallback = fallback
+        self._fallback_lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def fallback(self):
+        with self._fallback_lock:
+            if self._fallback is None:
+                self._fallback = SessionTransport()
+            return self._fallback
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            sock = _connect(self.path)
+            connection = (sock, sock.makefile('rb'))
+            self._local.connection = connection
+        return connection
+
+    def _disconnect(self):
+        connection = getattr(self._local, 'connection', None)
+        self._local.connection = None
+        if connection is not None:
+            connection[1].close()
+            connection[0].close()
+
+    def request(self, method, url, **kwargs):
+        if kwargs.get('stream') or (method.upper() == 'GET' and
+                                    not cacheable(url)):
+            return self.fallback.request(method, url, **kwargs)
+        message = (json.dumps(encode_request(method, url, kwargs)) +
+                   '\n').encode('utf-8')
+        try:
+            sock, reader = self._connection()
+        except socket.error:
+            return self.fallback.request(method, url, **kwargs)
+        try:
+            sock.sendall(message)
+            line = reader.readline()
+            if not line:
+                raise socket.error('Daemon closed the connection')
+        except socket.error as error:
+            self._disconnect()
+            if method.upper() != 'GET':
+                raise requests.ConnectionError(error)
+            return self.fallback.request(method, url, **kwargs)
+        record = json.loads(line.decode('utf-8'))
+        if 'error' in record:
+            raise _requests_error(record)
+        response = ReplayResponse(url, record['status'], record['headers'],
+                                  _decode_body(record), record['elapsed'])
+        response.cookies = record.get('cookies', {})
+        return response
+
+    def close(self):
+        self._disconnect()
+        if self._fallback is not None:
+            self._fallback.close()
@@ -0,0 +1,100 @@
+"""
+End-to-end time limits for operations made of many requests.
+
+A :class:`Deadline` is the point in time by which a whole operation, such
+as triggering a build and waiting for it, must be over. Every request made
+on its behalf gets a timeout no longer than the time remaining, and once it
+is past, :class:`DeadlineExceeded` is raised with whatever the operation
+had achieved so far.
+"""
+import time
+from contextlib import contextmanager
+
+
+class DeadlineExceeded(Exception):
+    """
+    The deadline of an operation passed before it completed.
+
+    ``progress`` holds the partial result of the operation, if any.
+    """
+
+    def __init__(self, msg, progress=None):
+        super(DeadlineExceeded, self).__init__(msg)
+        self.progress = progress
+
+
+class Deadline(object):
+    """
+    A point in time ``seconds`` from now.
+    """
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires = time.time() + seconds
+
+    @classmethod
+    def start(cls, deadline):
+        """
+        Return ``deadline`` as a :class:`Deadline`, starting it now if it is
+        a number of seconds. ``None`` means no deadline.
+        """
+        if deadline is None or isinstance(deadline, Deadline):
+            return deadline
+        return cls(deadline)
+
+    def remaining(self):
+        """
+        Return the number of seconds left, which may be negative.
+        """
+        return self.expires - time.time()
+
+    @property
+    def expired(self):
+        return self.remaining() <= 0
+
+    def check(self, progress=None):
+        """
+        Raise :class:`DeadlineExceeded` with ``progress`` if expired.
+        """
+        if self.expired:
+            raise DeadlineExceeded(
+                'Deadline of {0}s exceeded'.format(self.seconds), progress)
+
+    def timeout(self, timeout=None):
+        """
+        Cap a ``requests`` timeout (seconds, a ``(connect, read)`` pair or
+        ``None``) to the time remaining.
+        """
+        self.check()
+        remaining = self.remaining()
+        if timeout is None:
+            return remaining
+        if isinstance(timeout, tuple):
+            return tuple(remaining if part is None else min(part, remaining)
+                         for part in timeout)
+        return min(timeout, remaining)
+
+    def sleep(self, seconds, progress=None):
+        """
+        Sleep for ``seconds``, or raise :class:`DeadlineExceeded` with
+        ``progress`` if the deadline passes first.
+        """
+        remaining = self.remaining()
+        if remaining < seconds:
+            time.sleep(max(0, remaining))
+            raise DeadlineExceeded(
+                'Deadline of {0}s exceeded'.format(self.seconds), progress)
+        time.sleep(seconds)
+
+
+@contextmanager
+def within(jenkins, deadline):
+    """
+    Apply ``deadline``, if not ``None``, to the requests made by this thread
+    through ``jenkins`` in the ``with`` block.
+    """
+    if deadline is None:
+        yield
+    else:
+        with jenkins.limits(deadline=deadline):
+            yield
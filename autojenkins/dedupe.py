@@ -0,0 +1,222 @@
+"""
+Avoid triggering a build that is already queued or running.
+
+A :class:`QueueSnapshot` keeps an index of the queue items and running
+builds of the controller, keyed by job name. It is refreshed with two
+``tree=`` queries at most once per interval, and builds triggered through
+it are added to the index right away, so repeated triggers of the same job
+and parameters in between do not reach the controller. Parameters left out
+of a request are compared with their default values, read once per job::
+
+    snapshot = QueueSnapshot(jenkins, interval=10)
+    pending, response = snapshot.find_or_trigger('deploy',
+                                                 {'COMMIT': 'abc123'})
+"""
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+from autojenkins.batch import parse_queue_id
+from autojenkins.jobs import JOBINFO, LIST, QUEUE, parse
+
+
+QUEUE_TREE = 'items[id,task[name],actions[parameters[name,value]]]'
+RUNNING_TREE = ('jobs[name,builds[number,building,queueId,'
+                'actions[parameters[name,value]]]{{0,{0}}}]')
+DEFAULTS_TREE = ('property[parameterDefinitions[name,'
+                 'defaultParameterValue[value]]]')
+
+try:
+    text_type = unicode
+except NameError:  # Python 3
+    text_type = str
+
+
+class PendingBuild(namedtuple('PendingBuild',
+                              'jobname params queue_id number')):
+    """
+    A build waiting in the queue (``number`` is ``None``) or running.
+    """
+    __slots__ = ()
+
+
+def _text(value):
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return text_type(value)
+
+
+def _parameters(actions):
+    """
+    Return the build parameters found in the ``actions`` of a queue item or
+    a build, as a dict of strings.
+    """
+    params = {}
+    for action in actions or []:
+        for param in (action or {}).get('parameters') or []:
+            params[param['name']] = _text(param.get('value'))
+    return params
+
+
+def _defaults(job):
+    """
+    Return the default parameter values found in the ``property`` of a job,
+    as a dict of strings.
+    """
+    defaults = {}
+    for prop in job.get('property') or []:
+        for definition in (prop or {}).get('parameterDefinitions') or []:
+            default = definition.get('defaultParameterValue')
+            if default is not None and 'value' in default:
+                defaults[definition['name']] = _text(default['value'])
+    return defaults
+
+
+def requested(params, defaults=None):
+    """
+    Return the parameters a build requested with ``params`` runs with:
+    ``defaults`` overridden by ``params``, as a dict of strings.
+    """
+    result = dict(defaults or {})
+    result.update((name, _text(value))
+                  for name, value in (params or {}).items())
+    return result
+
+
+def matches(params, pending, defaults=None):
+    """
+    Tell whether a build requested with ``params`` would duplicate a
+    pending build with parameters ``pending``.
+
+    Parameters not given in ``params`` take their ``defaults``; all
+    parameters of both builds must then be the same.
+    """
+    return requested(params, defaults) == pending
+
+
+class QueueSnapshot(object):
+    """
+    Index of the queued and running builds, refreshed at most once every
+    ``interval`` seconds.
+
+    :param running_window:
+        How many of the most recent builds of each job are checked for
+        being still running
+    """
+
+    def __init__(self, jenkins, interval=10, running_window=5):
+        self.jenkins = jenkins
+        self.interval = interval
+        self.running_window = running_window
+        self.refreshed = None
+        self._index = {}
+        self._defaults = {}
+        self._lock = threading.Lock()
+        self._trigger_locks = {}
+
+    def refresh(self, force=False):
+        """
+        Read the queue and running builds again, unless the snapshot is
+        younger than ``interval`` seconds.
+        """
+        with self._lock:
+            now = time.time()
+            if (not force and self.refreshed is not None and
+                    now - self.refreshed < self.interval):
+                return
+            queue = self.jenkins._build_get(QUEUE,
+                                            params={'tree': QUEUE_TREE})
+            tree = RUNNING_TREE.format(self.running_window)
+            jobs = self.jenkins._build_get(LIST, params={'tree': tree})
+            index = {}
+            for item in parse(queue).get('items', []):
+                jobname = (item.get('task') or {}).get('name')
+                params = _parameters(item.get('actions'))
+                pending = PendingBuild(jobname, params, item['id'], None)
+                index.setdefault(jobname, []).append(pending)
+            for job in parse(jobs).get('jobs', []):
+                for build in job.get('builds') or []:
+                    if not build.get('building'):
+                        continue
+                    pending = PendingBuild(job['name'],
+                                           _parameters(build.get('actions')),
+                                           build.get('queueId'),
+                                           build['number'])
+                    index.setdefault(job['name'], []).append(pending)
+            self._index = index
+            self.refreshed = now
+
+    def defaults(self, jobname):
+        """
+        Return the default parameter values of ``jobname``, read on first
+        use.
+        """
+        with self._lock:
+            defaults = self._defaults.get(jobname)
+        if defaults is None:
+            response = self.jenkins._build_get(
+                JOBINFO, jobname, params={'tree': DEFAULTS_TREE})
+            defaults = _defaults(parse(response))
+            with self._lock:
+                self._defaults[jobname] = defaults
+        return defaults
+
+    def find(self, jobname, params=None):
+        """
+        Return the :class:`PendingBuild` of ``jobname`` matching ``params``,
+        or ``None``.
+        """
+        self.refresh()
+        defaults = self.defaults(jobname)
+        with self._lock:
+            for pending in self._index.get(jobname, []):
+                if matches(params, pending.params, defaults):
+                    return pending
+        return None
+
+    def add(self, jobname, params, queue_id):
+        """
+        Record a build just triggered, until the next refresh sees it.
+        """
+        params = requested(params, self.defaults(jobname))
+        pending = PendingBuild(jobname, params, queue_id, None)
+        with self._lock:
+            self._index.setdefault(jobname, []).append(pending)
+        return pending
+
+    @contextmanager
+    def _triggering(self, jobname):
+        """
+        Hold the trigger lock of ``jobname``, which is dropped once no
+        thread uses it.
+        """
+        with self._lock:
+            entry = self._trigger_locks.setdefault(
+                jobname, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._trigger_locks[jobname]
+
+    def find_or_trigger(self, jobname, params=None):
+        """
+        Return ``(pending, None)`` for the :class:`PendingBuild` of
+        ``jobname`` matching ``params``, or trigger the job and return
+        ``(None, response)``, recording the new build.
+
+        Looking up, triggering and recording hold a lock per job, so that
+        threads sharing the snapshot trigger a build only once.
+        """
+        with self._triggering(jobname):
+            pending = self.find(jobname, params)
+            if pending is not None:
+                return pending, None
+            response = self.jenkins._trigger(jobname, params)
+            self.add(jobname, params, parse_queue_id(response))
+            return None, response
@@ -0,0 +1,82 @@
+"""
+Query several Jenkins controllers as one.
+"""
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from autojenkins.deadline import Deadline, within
+
+
+DEFAULT_TIMEOUT = 30
+
+
+class ControllerTimeout(Exception):
+    pass
+
+
+class FederatedJenkins(object):
+    """
+    Fan out read operations to many :class:`autojenkins.jobs.Jenkins`
+    instances concurrently and merge their results.
+
+    Every call returns a pair ``(results, errors)``, where ``errors`` maps
+    the URL of each controller that failed, or did not answer within
+    ``timeout`` seconds, to the exception raised. Results of the remaining
+    controllers are still returned. The requests made for a call are
+    limited to the same ``timeout``, so none of them outlives it.
+    """
+
+    def __init__(self, clients, timeout=DEFAULT_TIMEOUT):
+        self.clients = list(clients)
+        self.timeout = timeout
+
+    def map(self, method, *args, **kwargs):
+        """
+        Call a :class:`Jenkins` method on every controller.
+
+        :returns: a dict of controller URL to result, and a dict of
+            controller URL to error
+        """
+        deadline = Deadline.start(self.timeout)
+
+        def call(client):
+            with within(client, deadline):
+                return getattr(client, method)(*args, **kwargs)
+
+        executor = ThreadPoolExecutor(max_workers=max(1, len(self.clients)))
+        try:
+            futures = dict((executor.submit(call, client), client.ROOT)
+                           for client in self.clients)
+            done, not_done = wait(futures, timeout=self.timeout)
+        finally:
+            executor.shutdown(wait=False)
+        results = {}
+        errors = {}
+        for future in not_done:
+            future.cancel()
+            errors[futures[future]] = ControllerTimeout(
+                'No answer within {0}s'.format(self.timeout))
+        for future in done:
+            if future.exception() is not None:
+                errors[futures[future]] = future.exception()
+            else:
+                results[futures[future]] = future.result()
+        return results, errors
+
+    def all_jobs(self, include_colorless=False):
+        """
+        Get ``(controller, name, color)`` tuples of jobs in all controllers.
+        """
+        results, errors = self.map('all_jobs',
+                                   include_colorless=include_colorless)
+        jobs = [(root, name, color)
+                for root in sorted(results)
+                for name, color in results[root]]
+        return jobs, errors
+
+    def find_job(self, jobname):
+        """
+        Get the URLs of the controllers that have a job called ``jobname``.
+        """
+        results, errors = self.map('job_exists', jobname)
+        return sorted(root for root, exists in results.items()
+                      if exists), errors
@@ -0,0 +1,246 @@
+"""
+Dependency graph of upstream and downstream jobs.
+
+The graph for the whole server is read with a single ``tree=`` query and
+kept as an adjacency index, so questions such as "what runs after this
+job" or "how long does this pipeline take end to end" are answered
+without further requests.
+"""
+import json
+from collections import deque
+
+from autojenkins.jobs import LIST, JobInexistent, parse
+
+
+GRAPH_TREE = ('jobs[name,downstreamProjects[name],'
+              'lastSuccessfulBuild[duration],lastBuild[duration]]')
+
+
+class GraphCycleError(Exception):
+    pass
+
+
+def _escape(name):
+    """
+    Escape a job name for a quoted ``dot`` string.
+    """
+    return name.replace('\\', '\\\\').replace('"', '\\"')
+
+
+def _duration(job):
+    for key in ('lastSuccessfulBuild', 'lastBuild'):
+        build = job.get(key)
+        if build and build.get('duration') is not None:
+            return build['duration']
+    return 0
+
+
+class JobGraph(object):
+    """
+    Adjacency index of job dependencies, with the last known duration of
+    each job in milliseconds.
+    """
+
+    def __init__(self):
+        self.downstream = {}
+        self.upstream = {}
+        self.duration = {}
+
+    def add_job(self, name, duration=0):
+        self.downstream.setdefault(name, set())
+        self.upstream.setdefault(name, set())
+        self.duration[name] = duration
+
+    def add_edge(self, upstream, downstream):
+        for name in (upstream, downstream):
+            if name not in self.duration:
+                self.add_job(name)
+        self.downstream[upstream].add(downstream)
+        self.upstream[downstream].add(upstream)
+
+    @classmethod
+    def from_jobs(cls, jobs):
+        """
+        Build the graph from the ``jobs`` list of the remote API.
+        """
+        graph = cls()
+        for job in jobs:
+            graph.add_job(job['name'], _duration(job))
+        for job in jobs:
+            for downstream in job.get('downstreamProjects') or []:
+                graph.add_edge(job['name'], downstream['name'])
+        return graph
+
+    def _check(self, name):
+        if name not in self.duration:
+            raise JobInexistent("Job '%s' doesn't exists" % name)
+
+    def subgraph(self, name):
+        """
+        Return the graph of ``name`` and all jobs downstream of it.
+
+        :raises JobInexistent: if there is no job called ``name``
+        """
+        self._check(name)
+        nodes = self.transitive_downstream(name) | set([name])
+        graph = JobGraph()
+        for job in nodes:
+            graph.add_job(job, self.duration[job])
+        for job in nodes:
+            for child in self.downstream[job] & nodes:
+                graph.add_edge(job, child)
+        return graph
+
+    def transitive_downstream(self, name):
+        """
+        Return the set of jobs triggered, directly or not, by ``name``.
+
+        :raises JobInexistent: if there is no job called ``name``
+        """
+        self._check(name)
+        seen = set()
+        queue = deque(self.downstream[name])
+        while queue:
+            job = queue.popleft()
+            if job not in seen:
+                seen.add(job)
+                queue.extend(self.downstream[job] - seen)
+        return seen
+
+    def cycles(self):
+        """
+        Return the groups of jobs that trigger each other in a loop, as
+        sorted lists.
+        """
+        index = {}
+        lowlink = {}
+        on_stack = set()
+        stack = []
+        cycles = []
+        counter = 0
+
+        for root in sorted(self.downstream):
+            if root in index:
+                continue
+            # iterative Tarjan's algorithm, to cope with long chains
+            work = [(root, iter(sorted(self.downstream[root])))]
+            index[root] = lowlink[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack.add(root)
+            while work:
+                node, children = work[-1]
+                for child in children:
+                    if child not in index:
+                        index[child] = lowlink[child] = counter
+                        counter += 1
+                        stack.append(child)
+                        on_stack.add(child)
+                        work.append((child,
+                                     iter(sorted(self.downstream[child]))))
+                        break
+                    elif child in on_stack:
+                        lowlink[node] = min(lowlink[node], index[child])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        lowlink[parent] = min(lowlink[parent], lowlink[node])
+                    if lowlink[node] == index[node]:
+                        component = []
+                        while True:
+                            job = stack.pop()
+                            on_stack.discard(job)
+                            component.append(job)
+                            if job == node:
+                                break
+                        looped = node in self.downstream[node]
+                        if len(component) > 1 or looped:
+                            cycles.append(sorted(component))
+        return cycles
+
+    def critical_path(self, name=None):
+        """
+        Return the slowest chain of jobs and its estimated wall time.
+
+        The wall time of a chain is the sum of the last durations of its
+        jobs, as each downstream job starts when its upstream one ends.
+
+        :param name: only consider chains starting at this job
+        :returns: a tuple ``(jobs, milliseconds)``
+        :raises GraphCycleError: if the jobs considered contain a cycle
+        """
+        if name is None:
+            nodes = set(self.downstream)
+        else:
+            nodes = self.transitive_downstream(name) | set([name])
+        order = self._topological_order(nodes)
+        best = {}
+        following = {}
+        for job in reversed(order):
+            successors = [child for child in self.downstream[job]
+                          if child in nodes]
+            slowest = max(successors, key=lambda child: best[child]) \
+                if successors else None
+            best[job] = self.duration[job] + (
+                best[slowest] if slowest is not None else 0)
+            following[job] = slowest
+        if not best:
+            return [], 0
+        start = name if name is not None else max(order,
+                                                  key=lambda j: best[j])
+        path = [start]
+        while following[path[-1]] is not None:
+            path.append(following[path[-1]])
+        return path, best[start]
+
+    def _topological_order(self, nodes):
+        incoming = dict((job, len(self.upstream[job] & nodes))
+                        for job in nodes)
+        ready = deque(sorted(job for job, count in incoming.items()
+                             if count == 0))
+        order = []
+        while ready:
+            job = ready.popleft()
+            order.append(job)
+            for child in sorted(self.downstream[job] & nodes):
+                incoming[child] -= 1
+                if incoming[child] == 0:
+                    ready.append(child)
+        if len(order) != len(nodes):
+            raise GraphCycleError('Jobs trigger each other in a loop: '
+                                  '{0}'.format(self.cycles()))
+        return order
+
+    def to_dot(self):
+        """
+        Return the graph in Graphviz ``dot`` format.
+        """
+        lines = ['digraph jobs {']
+        for job in sorted(self.downstream):
+            lines.append('  "{0}" [label="{0}\\n{1:.0f}s"];'.format(
+                _escape(job), self.duration[job] / 1000.0))
+            for child in sorted(self.downstream[job]):
+                lines.append('  "{0}" -> "{1}";'.format(
+                    _escape(job), _escape(child)))
+        lines.append('}')
+        return '\n'.join(lines)
+
+    def to_json(self):
+        """
+        Return the graph as a JSON document of nodes and edges.
+        """
+        return json.dumps({
+            'nodes': [{'name': job, 'duration': self.duration[job]}
+                      for job in sorted(self.downstream)],
+            'edges': [[job, child] for job in sorted(self.downstream)
+                      for child in sorted(self.downstream[job])],
+        }, indent=1)
+
+
+def fetch_graph(jenkins):
+    """
+    Read the dependencies and durations of all jobs in one request.
+    """
+    response = jenkins._build_get(LIST, params={'tree': GRAPH_TREE})
+    return JobGraph.from_jobs(parse(response).get('jobs', []))
@@ -0,0 +1,171 @@
+"""
+Search the console output of many builds concurrently.
+
+Console logs are streamed and matched line by line, so whole logs are
+never held in memory, and scanning stops as soon as enough matches have
+been found.
+"""
+import re
+import threading
+from collections import namedtuple
+
+from autojenkins.jobs import CONSOLE, HttpNotFoundError
+from autojenkins.parallel import DEFAULT_WORKERS, imap_unordered
+
+
+CHUNK_SIZE = 64 * 1024
+
+
+class ConsoleMatch(namedtuple('ConsoleMatch',
+                              'jobname build_number line_number offset line')):
+    """
+    A console line matching a search.
+
+    ``line_number`` starts at 1 and ``offset`` is the byte offset of the
+    start of the line within the console output.
+    """
+    __slots__ = ()
+
+
+def build_range(jobname, first, last):
+    """
+    Return ``(jobname, number)`` search targets for builds first to last.
+    """
+    return [(jobname, number) for number in range(first, last + 1)]
+
+
+def _iter_lines(chunks):
+    """
+    Yield ``(offset, line)`` for the lines in a stream of byte chunks.
+    """
+    offset = 0
+    tail = b''
+    for chunk in chunks:
+        lines = (tail + chunk).split(b'\n')
+        tail = lines.pop()
+        for line in lines:
+            yield offset, line
+            offset += len(line) + 1
+    if tail:
+        yield offset, tail
+
+
+def scan_console(jenkins, jobname, build_number, regex, limit=None,
+                 stop=None, chunk_size=CHUNK_SIZE):
+    """
+    Return the lines of a build's console output that match ``regex``.
+
+    Scanning ends after ``limit`` matches, or as soon as ``stop()`` returns
+    a true value.
+    """
+    matches = []
+    response = jenkins._build_get(CONSOLE, jobname, build_number,
+                                  stream=True)
+    try:
+        lines = _iter_lines(response.iter_content(chunk_size))
+        for line_number, (offset, line) in enumerate(lines, 1):
+            if stop is not None and line_number % 1000 == 0 and stop():
+                break
+            text = line.decode('utf-8', 'replace').rstrip('\r')
+            if regex.search(text):
+                matches.append(ConsoleMatch(jobname, build_number,
+                                            line_number, offset, text))
+                if limit is not None and len(matches) >= limit:
+                    break
+                if stop is not None and stop():
+                    break
+    finally:
+        response.close()
+    return matches
+
+
+def _scan_existing(jenkins, target, regex, limit, stop):
+    """
+    Scan a build's console, treating deleted builds as having no matches.
+    """
+    jobname, build_number = target
+    try:
+        return scan_console(jenkins, jobname, build_number, regex, limit,
+                            stop)
+    except HttpNotFoundError:
+        return []
+
+
+def grep_console(jenkins, pattern, targets, first=False, limit=None,
+                 workers=DEFAULT_WORKERS):
+    """
+    Search the console output of builds for a regular expression.
+
+    :param targets:
+        ``(jobname, build_number)`` pairs, e.g. from :func:`build_range`
+    :param first:
+        Only return the first matching line of the first target (in the
+        order given) that has a match. Later targets are abandoned as soon
+        as an earlier one matches.
+    :param limit:
+        Stop after this many matches overall.
+    :returns:
+        An iterator of :class:`ConsoleMatch`, yielded as each build
+        finishes scanning.
+    """
+    regex = re.compile(pattern) if not hasattr(pattern, 'search') else pattern
+    targets = list(targets)
+    if first:
+        return _grep_first(jenkins, regex, targets, workers)
+    return _grep_all(jenkins, regex, targets, limit, workers)
+
+
+def _grep_all(jenkins, regex, targets, limit, workers):
+    stop = threading.Event()
+
+    def scan(target):
+        return _scan_existing(jenkins, target, regex, limit, stop.is_set)
+
+    count = 0
+    try:
+        for target, matches, error in imap_unordered(scan, targets, workers):
+            if error is not None:
+                raise error
+            for match in matches:
+                yield match
+                count += 1
+                if limit is not None and count >= limit:
+                    return
+    finally:
+        stop.set()
+
+
+def _grep_first(jenkins, regex, targets, workers):
+    cutoff = [len(targets)]
+    lock = threading.Lock()
+
+    def abandoned(index):
+        return index > cutoff[0]
+
+    def scan(index):
+        if abandoned(index):
+            return []
+        matches = _scan_existing(jenkins, targets[index], regex, 1,
+                                 lambda: abandoned(index))
+        if matches:
+            with lock:
+                cutoff[0] = min(cutoff[0], index)
+        return matches
+
+    done = set()
+    unfinished = 0
+    best = None
+    results = imap_unordered(scan, range(len(targets)), workers)
+    for index, matches, error in results:
+        if error is not None:
+            raise error
+        done.add(index)
+        while unfinished in done:
+            unfinished += 1
+        if matches and (best is None or index < best[0]):
+            best = index, matches[0]
+        if best is not None and unfinished >= best[0]:
+            results.close()
+            break
+    if best is not None:
+        yield best[1]
@@ -0,0 +1,249 @@
+"""
+Local, searchable index of job configurations.
+
+The ``config.xml`` of every job is stored in a SQLite database together
+with the fields most often searched for, so questions such as "which jobs
+build this repository" or "which jobs run on this label" are answered
+without contacting the server::
+
+    index = ConfigIndex('jenkins.sqlite', jenkins)
+    index.update()
+    index.search(scm='github.com/acme/app', label='linux')
+
+:meth:`ConfigIndex.update` only re-reads what changed: configurations are
+requested with the ``ETag`` and ``Last-Modified`` validators of the last
+fetch, so servers that honour them answer ``304 Not Modified``, and a
+configuration whose SHA-256 did not change is not parsed nor written again.
+"""
+import sqlite3
+import time
+import xml.etree.ElementTree as ET
+
+from autojenkins.archive import config_hash
+from autojenkins.jobs import CONFIG
+from autojenkins.parallel import DEFAULT_WORKERS, imap_unordered
+
+
+#: Fields extracted from each configuration
+FIELDS = ('scm', 'branch', 'label', 'trigger', 'parameter')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS jobs (
+    name TEXT PRIMARY KEY,
+    sha256 TEXT,
+    etag TEXT,
+    last_modified TEXT,
+    indexed REAL,
+    config TEXT
+);
+CREATE TABLE IF NOT EXISTS fields (job TEXT, field TEXT, value TEXT);
+CREATE INDEX IF NOT EXISTS fields_by_value ON fields (field, value);
+CREATE INDEX IF NOT EXISTS fields_by_job ON fields (job);
+'''
+
+
+class ConfigIndexError(Exception):
+    pass
+
+
+def _texts(elements):
+    return [element.text.strip() for element in elements
+            if element is not None and element.text and element.text.strip()]
+
+
+def extract_fields(config):
+    """
+    Return the ``(field, value)`` pairs of a job configuration.
+
+    * ``scm``: repository URLs of any SCM, including pipeline definitions
+    * ``branch``: branch specifications
+    * ``label``: the label expression the job is restricted to
+    * ``trigger``: trigger class names, followed by their schedule if any
+    * ``parameter``: build parameter names
+    """
+    if not isinstance(config, bytes):
+        config = config.encode('utf-8')
+    root = ET.fromstring(config)
+    fields = []
+    for scm in root.iter('scm'):
+        for tag in ('url', 'remote'):
+            fields.extend(('scm', url) for url in _texts(scm.iter(tag)))
+        for branches in scm.iter('branches'):
+            fields.extend(('branch', name)
+                          for name in _texts(branches.iter('name')))
+    fields.extend(('label', label)
+                  for label in _texts(root.findall('assignedNode')))
+    for triggers in root.iter('triggers'):
+        for trigger in triggers:
+            spec = _texts([trigger.find('spec')])
+            fields.append(('trigger', ' '.join([trigger.tag] + spec)))
+    for definitions in root.iter('parameterDefinitions'):
+        for definition in definitions:
+            fields.extend(('parameter', name)
+                          for name in _texts([definition.find('name')]))
+    return sorted(set(fields))
+
+
+def _like(value):
+    escaped = (value.replace('\\', '\\\\').replace('%', '\\%')
+               .replace('_', '\\_'))
+    return '%' + escaped + '%'
+
+
+class ConfigIndex(object):
+    """
+    SQLite index of the job configurations of one server.
+
+    :param path: database file, created if missing (``:memory:`` works too)
+    :param jenkins: the :class:`autojenkins.jobs.Jenkins` to index, only
+        needed to update the index
+    """
+
+    def __init__(self, path, jenkins=None):
+        self.path = path
+        self.jenkins = jenkins
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+        if jenkins is not None:
+            self._check_root(jenkins.ROOT)
+
+    def _check_root(self, root):
+        row = self.db.execute(
+            "SELECT value FROM meta WHERE key = 'root'").fetchone()
+        if row is None:
+            with self.db:
+                self.db.execute(
+                    "INSERT INTO meta (key, value) VALUES ('root', ?)",
+                    (root,))
+        elif row[0] != root:
+            raise ConfigIndexError("Index '{0}' belongs to {1}, not {2}"
+                                   .format(self.path, row[0], root))
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _fetch(self, job):
+        """
+        Fetch a configuration unless the server says it is unchanged.
+
+        :returns: ``None`` if unchanged, else ``(config, etag,
+            last_modified)``
+        """
+        name, etag, last_modified = job
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        response = self.jenkins._build_get(CONFIG, name, headers=headers)
+        if response.status_code == 304:
+            return None
+        return (response.text, response.headers.get('ETag'),
+                response.headers.get('Last-Modified'))
+
+    def update(self, workers=DEFAULT_WORKERS):
+        """
+        Bring the index up to date with the server.
+
+        :returns: a dict of job name to ``'added'``, ``'updated'``,
+            ``'removed'`` or the exception raised while fetching it; jobs
+            that did not change are left out
+        """
+        names = set(name for name, _ in
+                    self.jenkins.all_jobs(include_colorless=True))
+        known = dict((row[0], row[1:]) for row in self.db.execute(
+            'SELECT name, sha256, etag, last_modified FROM jobs'))
+        changes = {}
+        with self.db:
+            for name in set(known) - names:
+                self._remove(name)
+                changes[name] = 'removed'
+        jobs = [(name,) + tuple(known.get(name, (None, None, None))[1:])
+                for name in sorted(names)]
+        for job, result, error in imap_unordered(self._fetch, jobs, workers):
+            name = job[0]
+            if error is not None:
+                changes[name] = error
+                continue
+            if result is None:
+                continue
+            config, etag, last_modified = result
+            sha256 = config_hash(config)
+            with self.db:
+                if name in known and known[name][0] == sha256:
+                    self.db.execute(
+                        'UPDATE jobs SET etag = ?, last_modified = ? '
+                        'WHERE name = ?', (etag, last_modified, name))
+                    continue
+                self._remove(name)
+                self.db.execute(
+                    'INSERT INTO jobs (name, sha256, etag, last_modified, '
+                    'indexed, config) VALUES (?, ?, ?, ?, ?, ?)',
+                    (name, sha256, etag, last_modified, time.time(), config))
+                try:
+                    fields = extract_fields(config)
+                except ET.ParseError:
+                    fields = []
+                self.db.executemany(
+                    'INSERT INTO fields (job, field, value) VALUES (?, ?, ?)',
+                    [(name, field, value) for field, value in fields])
+            changes[name] = 'updated' if name in known else 'added'
+        return changes
+
+    def _remove(self, name):
+        self.db.execute('DELETE FROM jobs WHERE name = ?', (name,))
+        self.db.execute('DELETE FROM fields WHERE job = ?', (name,))
+
+    def jobs(self):
+        """
+        Return the sorted names of the indexed jobs.
+        """
+        return [row[0] for row in
+                self.db.execute('SELECT name FROM jobs ORDER BY name')]
+
+    def fields(self, jobname):
+        """
+        Return the extracted fields of a job, as a dict of field name to
+        list of values.
+        """
+        fields = dict((field, []) for field in FIELDS)
+        for field, value in self.db.execute(
+                'SELECT field, value FROM fields WHERE job = ? '
+                'ORDER BY field, value', (jobname,)):
+            fields[field].append(value)
+        return fields
+
+    def search(self, text=None, exact=False, **criteria):
+        """
+        Return the sorted names of the jobs matching all criteria.
+
+        Each keyword of :data:`FIELDS` matches jobs with a value of that
+        field containing the given string (or equal to it, if ``exact``).
+        ``any`` matches any field and ``text`` the whole configuration.
+        """
+        unknown = set(criteria) - set(FIELDS) - set(['any'])
+        if unknown:
+            raise ConfigIndexError('Unknown fields: {0}'.format(
+                ', '.join(sorted(unknown))))
+        query = ['SELECT name FROM jobs WHERE 1']
+        args = []
+        if text is not None:
+            query.append("AND config LIKE ? ESCAPE '\\'")
+            args.append(_like(text))
+        for field, value in sorted(criteria.items()):
+            condition = 'value = ?' if exact else "value LIKE ? ESCAPE '\\'"
+            if field != 'any':
+                condition = 'field = ? AND ' + condition
+                args.append(field)
+            query.append('AND name IN (SELECT job FROM fields WHERE {0})'
+                         .format(condition))
+            args.append(value if exact else _like(value))
+        query.append('ORDER BY name')
+        return [row[0] for row in self.db.execute(' '.join(query), args)]
@@ -1,8 +1,14 @@
 import sys
+import threading
 import time
-import requests
+from contextlib import contextmanager
 from jinja2 import Template
 
+from autojenkins import profiling
+from autojenkins.deadline import Deadline, DeadlineExceeded
+from autojenkins.parallel import DEFAULT_WORKERS
+from autojenkins.transport import SessionTransport
+
 
 class AutojenkinsError(Exception):
     pass
@@ -49,6 +55,8 @@ CONSOLE_TEXT = '{0}/job/{1}/{2}/consoleText'
 ENABLE = '{0}/job/{1}/enable'
 DISABLE = '{0}/job/{1}/disable'
 CONSOLE = '{0}/job/{1}/{2}/consoleText'
+CRUMB = '{0}/crumbIssuer/' + API
+QUEUE = '{0}/queue/' + API
 
 
 class HttpStatusError(Exception):
@@ -86,14 +94,85 @@ def _validate(response):
     return response
 
 
+def parse(response):
+    """
+    Parse the body of a response from the Python remote API.
+    """
+    with profiling.phase('parse'):
+        return eval(response.text)
+
+
+def _is_crumb_rejection(response):
+    """
+    Tell whether a response is a 403 caused by a missing or expired crumb.
+    """
+    if response.status_code != 403:
+        return False
+    try:
+        return 'crumb' in response.text.lower()
+    except (AttributeError, TypeError):
+        return False
+
+
+def render_copy(config, context, enable=True):
+    """
+    Render the ``config.xml`` of a template job with ``context``, enabling
+    the result unless ``enable`` is ``False``.
+    """
+    # remove stupid quotes added by Jenkins
+    config = config.replace('>&quot;{{', '>{{')
+    config = config.replace('}}&quot;<', '}}<')
+
+    with profiling.phase('render'):
+        template_config = Template(config)
+        config = template_config.render(**context)
+    if enable:
+        config = config.replace('<disabled>true</disabled>',
+                                '<disabled>false</disabled>')
+    return config
+
+
+def _sleep(seconds, deadline=None, progress=None):
+    """
+    Sleep, unless ``deadline`` passes first.
+    """
+    if deadline is None:
+        time.sleep(seconds)
+    else:
+        deadline.sleep(seconds, progress)
+
+
 class Jenkins(object):
-    """Main class to interact with a Jenkins server."""
+    """
+    Main class to interact with a Jenkins server.
+
+    All HTTP requests go through ``transport``, by default a
+    :class:`autojenkins.transport.SessionTransport` that keeps connections
+    open between requests.
+
+    A client can be shared by many threads: its settings are not changed
+    after construction, the CSRF crumb and the queue snapshot are replaced
+    under locks, and the default transport gives each thread its own
+    session on top of a shared connection pool.
 
-    def __init__(self, base_url, auth=None, verify_ssl_cert=True, proxies={}):
+    ``timeout`` is passed on to every request: a number of seconds, or a
+    ``(connect, read)`` pair. See :meth:`limits` to override it for some
+    calls only.
+    """
+
+    def __init__(self, base_url, auth=None, verify_ssl_cert=True, proxies={},
+                 transport=None, timeout=None):
         self.ROOT = base_url
         self.auth = auth
         self.verify_ssl_cert = verify_ssl_cert
         self.proxies = proxies
+        self.transport = transport or SessionTransport()
+        self.timeout = timeout
+        self._limits = threading.local()
+        self._crumb = None
+        self._crumb_lock = threading.Lock()
+        self._queue_snapshot = None
+        self._snapshot_lock = threading.Lock()
 
     def _url(self, command, *args):
         """
@@ -113,26 +192,117 @@ class Jenkins(object):
 
         This will add required authentication and SSL verification arguments.
         """
-        response = requests.get(url,
-                                auth=self.auth,
-                                verify=self.verify_ssl_cert,
-                                proxies=self.proxies,
-                                **kwargs)
-        return _validate(response)
+        return _validate(self._request('GET', url, **kwargs))
 
     def _http_post(self, url, **kwargs):
         """
         Perform an HTTP POST request.
 
         This will add required authentication and SSL verification arguments.
+
+        If the server has CSRF protection enabled, a crumb is fetched the
+        first time a POST is rejected for lack of one, and then sent with
+        every following POST. It is only fetched again when rejected.
         """
-        response = requests.post(url,
-                                 auth=self.auth,
-                                 verify=self.verify_ssl_cert,
-                                 proxies=self.proxies,
-                                 **kwargs)
+        crumb = self._crumb
+        response = self._post(url, crumb, **kwargs)
+        if _is_crumb_rejection(response):
+            crumb = self._refresh_crumb(crumb)
+            if crumb is not None:
+                response = self._post(url, crumb, **kwargs)
         return _validate(response)
 
+    def _post(self, url, crumb, **kwargs):
+        """
+        Send a POST request, including the crumb header and cookies if any.
+        """
+        if crumb is not None:
+            headers, cookies = crumb
+            kwargs['headers'] = dict(kwargs.get('headers') or {})
+            kwargs['headers'].update(headers)
+            if cookies:
+                kwargs['cookies'] = cookies
+        return self._request('POST', url, **kwargs)
+
+    def _request(self, method, url, **kwargs):
+        """
+        Send a request through the transport, adding authentication, SSL
+        verification and proxy arguments, and the timeout if any.
+        """
+        timeout = kwargs.pop('timeout', None)
+        if timeout is None:
+            timeout = getattr(self._limits, 'timeout', None)
+        if timeout is None:
+            timeout = self.timeout
+        deadline = getattr(self._limits, 'deadline', None)
+        if deadline is not None:
+            timeout = deadline.timeout(timeout)
+        if timeout is not None:
+            kwargs['timeout'] = timeout
+        try:
+            with profiling.request(method, url) as timing:
+                response = self.transport.request(method, url,
+                                                  auth=self.auth,
+                                                  verify=self.verify_ssl_cert,
+                                                  proxies=self.proxies,
+                                                  **kwargs)
+                profiling.record_response(timing, response)
+        except Exception:
+            if deadline is not None:
+                deadline.check()
+            raise
+        return response
+
+    @contextmanager
+    def limits(self, timeout=None, deadline=None):
+        """
+        Limit the requests made by this thread in the ``with`` block.
+
+        :param timeout:
+            Seconds, or a ``(connect, read)`` pair, replacing the timeout of
+            the client
+        :param deadline:
+            A :class:`autojenkins.deadline.Deadline` or a number of seconds
+            from now. Requests time out when it passes, and raise
+            :class:`autojenkins.deadline.DeadlineExceeded` once it has.
+        """
+        previous = (getattr(self._limits, 'timeout', None),
+                    getattr(self._limits, 'deadline', None))
+        deadline = Deadline.start(deadline)
+        if deadline is None or (previous[1] is not None and
+                                previous[1].expires < deadline.expires):
+            deadline = previous[1]
+        self._limits.timeout = timeout if timeout is not None else previous[0]
+        self._limits.deadline = deadline
+        try:
+            yield deadline
+        finally:
+            self._limits.timeout, self._limits.deadline = previous
+
+    def close(self):
+        """
+        Close the connections kept open by the transport.
+        """
+        self.transport.close()
+
+    def _refresh_crumb(self, stale):
+        """
+        Fetch a new CSRF crumb unless another thread already replaced
+        ``stale``.
+
+        Returns ``None`` if the server does not issue crumbs.
+        """
+        with self._crumb_lock:
+            if self._crumb is stale:
+                try:
+                    response = self._build_get(CRUMB)
+                except HttpNotFoundError:
+                    return None
+                data = parse(response)
+                headers = {data['crumbRequestField']: data['crumb']}
+                self._crumb = (headers, getattr(response, 'cookies', None))
+            return self._crumb
+
     def _build_get(self, url_pattern, *args, **kwargs):
         """
         Build proper URL from pattern and args, and perform an HTTP GET.
@@ -153,10 +323,20 @@ class Jenkins(object):
         (SUCCESS, UNSTABLE or FAILED).
         """
         response = self._build_get(LIST)
-        jobs = eval(response.text).get('jobs', [])
+        jobs = parse(response).get('jobs', [])
         return [(job['name'], job.get('color', None)) 
                 for job in jobs if 'color' in job or include_colorless]
 
+    def iter_jobs(self, include_colorless=False):
+        """
+        Yield the ``(name, color)`` tuples of :meth:`all_jobs` while the
+        list downloads, in constant memory.
+
+        See :func:`autojenkins.streaming.iter_all_jobs`.
+        """
+        from autojenkins import streaming
+        return streaming.iter_all_jobs(self, include_colorless)
+
     def job_exists(self, jobname):
         jobs = self.all_jobs()
         for (name, color) in jobs:
@@ -174,7 +354,7 @@ class Jenkins(object):
         Get all information for a job as a Python object (dicts & lists).
         """
         response = self._build_get(JOBINFO, jobname)
-        return eval(response.text)
+        return parse(response)
 
     def build_info(self, jobname, build_number=None):
         """
@@ -187,7 +367,7 @@ class Jenkins(object):
         else:
             args = (LAST_BUILD, jobname)
         response = self._build_get(*args)
-        return eval(response.text)
+        return parse(response)
 
     def build_console(self, jobname, build_number=None):
         """
@@ -202,6 +382,90 @@ class Jenkins(object):
         response = self._build_get(*args)
         return response.text
 
+    def grep_console(self, pattern, targets, first=False, limit=None,
+                     workers=DEFAULT_WORKERS):
+        """
+        Search the console output of several builds for a regex.
+
+        :param targets: ``(jobname, build_number)`` pairs
+        :returns: an iterator of :class:`autojenkins.grep.ConsoleMatch`
+
+        See :func:`autojenkins.grep.grep_console`.
+        """
+        from autojenkins import grep
+        return grep.grep_console(self, pattern, targets, first=first,
+                                 limit=limit, workers=workers)
+
+    def build_history(self, jobnames=None, limit=100,
+                      workers=DEFAULT_WORKERS):
+        """
+        Get the last ``limit`` builds of some (or all) jobs for analytics.
+
+        :returns: a :class:`autojenkins.stats.History`
+
+        See :func:`autojenkins.stats.fetch_history`.
+        """
+        from autojenkins import stats
+        return stats.fetch_history(self, jobnames, limit=limit,
+                                   workers=workers)
+
+    def stage_history(self, jobnames, limit=100, workers=DEFAULT_WORKERS):
+        """
+        Get the Pipeline stage timings of the last ``limit`` builds of some
+        jobs.
+
+        :returns: a :class:`autojenkins.stages.StageHistory`
+
+        See :func:`autojenkins.stages.fetch_stage_history`.
+        """
+        from autojenkins import stages
+        return stages.fetch_stage_history(self, jobnames, limit=limit,
+                                          workers=workers)
+
+    def test_history(self, jobname, limit=20, workers=DEFAULT_WORKERS):
+        """
+        Get the test durations and statuses of the last ``limit`` completed
+        builds of a job.
+
+        :returns: a :class:`autojenkins.reports.ReportHistory`
+
+        See :func:`autojenkins.reports.fetch_test_history`.
+        """
+        from autojenkins import reports
+        return reports.fetch_test_history(self, jobname, limit=limit,
+                                          workers=workers)
+
+    def list_artifacts(self, jobname, build_number=None):
+        """
+        Get the artifacts of a build of a job.
+
+        If no build number is specified, defaults to the most recent build.
+
+        :returns: a list of :class:`autojenkins.artifacts.Artifact`
+        """
+        from autojenkins import artifacts
+        return artifacts.list_artifacts(self, jobname, build_number)
+
+    def download_artifacts(self, jobname, directory, build_number=None,
+                           workers=DEFAULT_WORKERS):
+        """
+        Download all artifacts of a build of a job into a directory.
+
+        See :func:`autojenkins.artifacts.download_artifacts`.
+        """
+        from autojenkins import artifacts
+        return artifacts.download_artifacts(self, jobname, directory,
+                                            build_number, workers=workers)
+
+    def dependency_graph(self):
+        """
+        Get the upstream/downstream graph of all jobs, in one request.
+
+        :returns: a :class:`autojenkins.graph.JobGraph`
+        """
+        from autojenkins import graph
+        return graph.fetch_graph(self)
+
     def last_build_console(self, jobname):
         """
         Get the console output for the last build of a job.
@@ -219,7 +483,28 @@ class Jenkins(object):
         Get full report of last build.
         """
         response = self._build_get(LAST_REPORT, jobname)
-        return eval(response.text)
+        return parse(response)
+
+    def iter_builds(self, jobname, tree='number,result,duration,timestamp'):
+        """
+        Yield the builds of a job while they download, newest first, as
+        dicts of the fields in ``tree``.
+
+        See :func:`autojenkins.streaming.iter_builds`.
+        """
+        from autojenkins import streaming
+        return streaming.iter_builds(self, jobname, tree)
+
+    def iter_test_cases(self, jobname, build_number='lastBuild',
+                        tree='className,name,duration,status'):
+        """
+        Yield the test cases of a build while its report downloads, as
+        dicts of the fields in ``tree``.
+
+        See :func:`autojenkins.streaming.iter_test_cases`.
+        """
+        from autojenkins import streaming
+        return streaming.iter_test_cases(self, jobname, build_number, tree)
 
     def console_text(self, jobname, build_number='lastBuild'):
         """
@@ -234,14 +519,14 @@ class Jenkins(object):
         """
         last_result_url = self.job_info(jobname)['lastBuild']['url']
         response = self._http_get(last_result_url + API)
-        return eval(response.text)
+        return parse(response)
 
     def last_success(self, jobname):
         """
         Return information about the last successful build.
         """
         response = self._build_get(LAST_SUCCESS, jobname)
-        return eval(response.text)
+        return parse(response)
 
     def get_config_xml(self, jobname):
         """
@@ -262,21 +547,26 @@ class Jenkins(object):
         """
         Create a job from a configuration file.
         """
-        params = {'name': jobname}
         with open(config_file) as file:
             content = file.read()
 
-        template = Template(content)
-        content = template.render(**context)
+        with profiling.phase('render'):
+            template = Template(content)
+            content = template.render(**context)
 
         if self.job_exists(jobname):
             raise Exception("Job already exists")
         else:
-            return self._build_post(NEWJOB,
-                                    data=content,
-                                    params=params,
-                                    headers={'Content-Type': 'application/xml'}
-                                    )
+            return self.create_from_xml(jobname, content)
+
+    def create_from_xml(self, jobname, config):
+        """
+        Create a job from the contents of a ``config.xml``.
+        """
+        return self._build_post(NEWJOB,
+                                data=config,
+                                params={'name': jobname},
+                                headers={'Content-Type': 'application/xml'})
 
     def create_copy(self, jobname, template_job, enable=True, _force=False, **context):
         """
@@ -291,26 +581,13 @@ class Jenkins(object):
             raise JobExists("Another job with the name '%s'already exists"
                             % jobname)
 
-        config = self.get_config_xml(template_job)
-
-        # remove stupid quotes added by Jenkins
-        config = config.replace('>&quot;{{', '>{{')
-        config = config.replace('}}&quot;<', '}}<')
-
-        template_config = Template(config)
-
-        config = template_config.render(**context)
-        if enable:
-            config = config.replace('<disabled>true</disabled>',
-                                    '<disabled>false</disabled>')
+        config = render_copy(self.get_config_xml(template_job), context,
+                             enable)
 
         if target_job_exists:
             return self.set_config_xml(jobname, config)
         else:
-            return self._build_post(NEWJOB,
-                                    data=config,
-                                    params={'name': jobname},
-                                    headers={'Content-Type': 'application/xml'})
+            return self.create_from_xml(jobname, config)
 
     def transfer(self, jobname, to_server):
         """
@@ -322,6 +599,24 @@ class Jenkins(object):
                                params={'name': jobname},
                                headers={'Content-Type': 'application/xml'})
 
+    def export_jobs(self, path, workers=DEFAULT_WORKERS):
+        """
+        Save the ``config.xml`` of every job into a compressed archive.
+
+        See :func:`autojenkins.archive.export_jobs`.
+        """
+        from autojenkins import archive
+        return archive.export_jobs(self, path, workers=workers)
+
+    def import_jobs(self, path, workers=DEFAULT_WORKERS):
+        """
+        Create or update jobs from an archive written by :meth:`export_jobs`.
+
+        See :func:`autojenkins.archive.import_jobs`.
+        """
+        from autojenkins import archive
+        return archive.import_jobs(self, path, workers=workers)
+
     def copy(self, jobname, copy_from='template'):
         """
         Copy a job from another one (by default from one called ``template``).
@@ -329,7 +624,8 @@ class Jenkins(object):
         params = {'name': jobname, 'mode': 'copy', 'from': copy_from}
         return self._build_post(NEWJOB, params=params)
 
-    def build(self, jobname, params=None, wait=False, grace=10):
+    def build(self, jobname, params=None, wait=False, grace=10,
+              listener=None, dedupe=False, deadline=None):
         """
         Trigger Jenkins to build a job.
 
@@ -337,20 +633,89 @@ class Jenkins(object):
             If params are provided, use the "buildWithParameters" endpoint
         :param wait:
             If ``True``, wait until job completes building before returning
-        """
+        :param listener:
+            Optional :class:`autojenkins.notify.NotificationListener` used
+            to learn about build completion when waiting
+        :param dedupe:
+            If ``True``, do not trigger the job when a build with the same
+            parameters is already queued or running, and return it as a
+            :class:`autojenkins.dedupe.PendingBuild` instead. See
+            :attr:`queue_snapshot`.
+        :param deadline:
+            Seconds (or a :class:`autojenkins.deadline.Deadline`) within
+            which the build must be triggered and, when waiting, finished.
+            :class:`autojenkins.deadline.DeadlineExceeded` is raised after
+            that, with the trigger response as ``progress`` if the build
+            was triggered.
+        """
+        with self.limits(deadline=deadline) as deadline:
+            return self._build(jobname, params, wait, grace, listener, dedupe,
+                               deadline)
+
+    def _build(self, jobname, params, wait, grace, listener, dedupe,
+               deadline):
         if not self.job_exists(jobname):
             raise JobInexistent("Job '%s' doesn't exists" % jobname)
         if not self.job_info(jobname)['buildable']:
             raise JobNotBuildable("Job '%s' is not buildable (deactivated)."
                                   % jobname)
-        url_pattern = BUILD if params is None else BUILD_WITH_PARAMS
-        response = self._build_post(url_pattern, jobname, params=params)
-        if not wait:
-            return response
+        pending = None
+        if dedupe:
+            pending, response = self.queue_snapshot.find_or_trigger(
+                jobname, params)
         else:
-            time.sleep(grace)
-            self.wait_for_build(jobname)
-            return self.last_result(jobname)
+            response = self._trigger(jobname, params)
+        progress = response if pending is None else pending
+        if not wait:
+            return progress
+        try:
+            if pending is None:
+                _sleep(grace, deadline, progress)
+            self.wait_for_build(jobname, listener=listener, deadline=deadline)
+        except DeadlineExceeded as error:
+            if error.progress is None:
+                error.progress = progress
+            raise
+        return self.last_result(jobname)
+
+    @property
+    def queue_snapshot(self):
+        """
+        The :class:`autojenkins.dedupe.QueueSnapshot` used by
+        ``build(..., dedupe=True)``, created on first use.
+        """
+        with self._snapshot_lock:
+            if self._queue_snapshot is None:
+                from autojenkins.dedupe import QueueSnapshot
+                self._queue_snapshot = QueueSnapshot(self)
+            return self._queue_snapshot
+
+    def _trigger(self, jobname, params=None):
+        """
+        Post a build request for a job, without any checks.
+        """
+        url_pattern = BUILD if params is None else BUILD_WITH_PARAMS
+        return self._build_post(url_pattern, jobname, params=params)
+
+    def build_many(self, builds, wait=False, workers=DEFAULT_WORKERS,
+                   poll_interval=10, deadline=None):
+        """
+        Trigger many builds concurrently.
+
+        :param builds:
+            Job names, or ``(jobname, params)`` pairs to build one job with
+            several parameter sets
+        :param wait:
+            If ``True``, wait until all builds complete before returning
+        :returns:
+            A list of :class:`autojenkins.batch.BuildOutcome`, one per build
+
+        See :func:`autojenkins.batch.build_many`.
+        """
+        from autojenkins import batch
+        return batch.build_many(self, builds, wait=wait, workers=workers,
+                                poll_interval=poll_interval,
+                                deadline=deadline)
 
     def delete(self, jobname):
         """
@@ -373,18 +738,78 @@ class Jenkins(object):
         """
         return self._build_post(DISABLE, jobname)
 
+    def enable_many(self, names=None, globs=None, pattern=None, colors=None,
+                    workers=DEFAULT_WORKERS, dry_run=False):
+        """
+        Enable the jobs selected by name, glob, regex or color, skipping
+        those already enabled.
+
+        :returns: a list of :class:`autojenkins.bulk.ToggleOutcome`
+
+        See :func:`autojenkins.bulk.set_enabled`.
+        """
+        from autojenkins import bulk
+        return bulk.set_enabled(self, True, names, globs, pattern, colors,
+                                workers, dry_run)
+
+    def disable_many(self, names=None, globs=None, pattern=None, colors=None,
+                     workers=DEFAULT_WORKERS, dry_run=False):
+        """
+        Disable the jobs selected by name, glob, regex or color, skipping
+        those already disabled.
+
+        :returns: a list of :class:`autojenkins.bulk.ToggleOutcome`
+
+        See :func:`autojenkins.bulk.set_enabled`.
+        """
+        from autojenkins import bulk
+        return bulk.set_enabled(self, False, names, globs, pattern, colors,
+                                workers, dry_run)
+
     def is_building(self, jobname):
         """
         Check if a job is building
         """
         return self.last_result(jobname).get('building', True)
 
-    def wait_for_build(self, jobname, poll_interval=3):
+    def wait_for_build(self, jobname, poll_interval=3, listener=None,
+                       fallback_interval=60, deadline=None):
         """
         Wait until job has finished building
-        """
-        while (self.is_building(jobname)):
-            time.sleep(poll_interval)
-            sys.stdout.write('.')
-            sys.stdout.flush()
-        print('')
+
+        :param listener:
+            A started :class:`autojenkins.notify.NotificationListener`. When
+            given, return as soon as the build completion is notified, and
+            only poll the server every ``fallback_interval`` seconds in case
+            a notification is lost.
+        :param deadline:
+            Seconds (or a :class:`autojenkins.deadline.Deadline`) after
+            which to stop waiting and raise
+            :class:`autojenkins.deadline.DeadlineExceeded`
+        """
+        with self.limits(deadline=deadline) as deadline:
+            if listener is not None:
+                return self._wait_for_notification(jobname, listener,
+                                                   fallback_interval,
+                                                   deadline)
+            while (self.is_building(jobname)):
+                _sleep(poll_interval, deadline)
+                sys.stdout.write('.')
+                sys.stdout.flush()
+            print('')
+
+    def _wait_for_notification(self, jobname, listener, fallback_interval,
+                               deadline=None):
+        """
+        Wait for the last build of a job using completion notifications.
+        """
+        while True:
+            build = self.last_result(jobname)
+            if not build.get('building', True):
+                return
+            timeout = fallback_interval
+            if deadline is not None:
+                deadline.check(build)
+                timeout = min(timeout, max(0, deadline.remaining()))
+            if listener.wait(jobname, build['number'], timeout):
+                return
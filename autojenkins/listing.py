@@ -0,0 +1,184 @@
+"""
+Filtered, paged and streamed job listings.
+
+Jobs are read a page at a time with ``tree=jobs[name,color]{start,end}``
+ranges, so only names and colors of one page are transferred and held in
+memory at once, and the first jobs are available before the last ones have
+been requested. Jenkins cannot filter jobs itself, so filters apply to each
+page as it arrives::
+
+    for name, color in iter_jobs(jenkins, pattern='^deploy-',
+                                 statuses=['FAILED']):
+        print(name)
+"""
+import json
+import re
+
+from autojenkins.jobs import LIST, parse
+
+
+PAGE_SIZE = 1000
+PAGE_TREE = 'jobs[name,color]{{{0},{1}}}'
+
+COLOR_STATUS = {
+    'blue': 'SUCCESS',
+    'green': 'SUCCESS',
+    'red': 'FAILED',
+    'yellow': 'UNSTABLE',
+    'aborted': 'ABORTED',
+    'disabled': 'DISABLED',
+    'grey': 'NOT BUILT',
+    'notbuilt': 'NOT BUILT',
+}
+
+
+def split_color(color):
+    """
+    Return the base color and whether a build is running, e.g.
+    ``('blue', True)`` for ``blue_anime``.
+    """
+    base, _, suffix = (color or '').partition('_')
+    return base, suffix == 'anime'
+
+
+def job_status(color):
+    """
+    Return the status of a job from its color, e.g. ``FAILED`` for ``red``.
+
+    Unknown colors are returned upper-cased.
+    """
+    base = split_color(color)[0]
+    return COLOR_STATUS.get(base, base.upper())
+
+
+def _normalize_status(status):
+    return status.upper().replace('_', ' ')
+
+
+def job_filter(pattern=None, colors=None, statuses=None):
+    """
+    Return a predicate on ``(name, color)`` for jobs whose name matches the
+    regex ``pattern`` (searched, not anchored), whose base color is one of
+    ``colors`` and whose status is one of ``statuses``. ``BUILDING`` is
+    accepted as a status for jobs with a running build.
+
+    Returns ``None`` when nothing is filtered.
+    """
+    if not (pattern or colors or statuses):
+        return None
+    regex = re.compile(pattern) if pattern else None
+    colors = set(colors or [])
+    statuses = set(_normalize_status(status) for status in statuses or [])
+
+    def accept(job):
+        name, color = job
+        if regex is not None and not regex.search(name):
+            return False
+        base, building = split_color(color)
+        if colors and base not in colors:
+            return False
+        if statuses and job_status(color) not in statuses and not (
+                building and 'BUILDING' in statuses):
+            return False
+        return True
+    return accept
+
+
+def iter_pages(jenkins, page_size=PAGE_SIZE, start=0, stop=None):
+    """
+    Yield the ``(name, color)`` pairs of the jobs from position ``start``
+    to ``stop`` (excluded, default: all), one page per request.
+    """
+    while stop is None or start < stop:
+        end = start + page_size
+        if stop is not None:
+            end = min(end, stop)
+        tree = PAGE_TREE.format(start, end)
+        response = jenkins._build_get(LIST, params={'tree': tree})
+        jobs = parse(response).get('jobs', [])
+        for job in jobs:
+            yield job['name'], job.get('color')
+        if len(jobs) < end - start:
+            return
+        start = end
+
+
+def iter_jobs(jenkins, pattern=None, colors=None, statuses=None, offset=0,
+              limit=None, page_size=PAGE_SIZE, include_colorless=False):
+    """
+    Yield the ``(name, color)`` pairs of the jobs selected by
+    :func:`job_filter`, skipping the first ``offset`` ones and stopping
+    after ``limit``.
+
+    ``offset`` and ``limit`` only go into the requested range when every
+    job is wanted, that is without filters and with ``include_colorless``.
+    Otherwise jobs are read from the first one, as the server cannot skip
+    colorless jobs such as folders, and those before ``offset`` dropped.
+    """
+    accept = job_filter(pattern, colors, statuses)
+    if accept is None and include_colorless:
+        stop = offset + limit if limit is not None else None
+        for job in iter_pages(jenkins, page_size, offset, stop):
+            yield job
+        return
+    if limit is not None and limit <= 0:
+        return
+    skipped = produced = 0
+    for job in iter_pages(jenkins, page_size):
+        if job[1] is None and not include_colorless:
+            continue
+        if accept is not None and not accept(job):
+            continue
+        if skipped < offset:
+            skipped += 1
+            continue
+        produced += 1
+        yield job
+        if limit is not None and produced >= limit:
+            return
+
+
+def _controller_job(job):
+    """
+    Return a ``(name, color)`` pair, or a ``(controller, name, color)``
+    triple of a federated listing, as a triple.
+    """
+    return (None,) + tuple(job) if len(job) == 2 else tuple(job)
+
+
+def job_record(name, color, controller=None):
+    """
+    Return a job as a dict of name, color, status and building flag, and
+    controller if given.
+    """
+    record = {'name': name, 'color': color, 'status': job_status(color),
+              'building': split_color(color)[1]}
+    if controller is not None:
+        record['controller'] = controller
+    return record
+
+
+def write_jsonl(jobs, stream):
+    """
+    Write each ``(name, color)`` pair, or ``(controller, name, color)``
+    triple, as a JSON object on its own line.
+    """
+    for job in jobs:
+        controller, name, color = _controller_job(job)
+        stream.write(json.dumps(job_record(name, color, controller),
+                                sort_keys=True))
+        stream.write('\n')
+
+
+def write_tsv(jobs, stream):
+    """
+    Write each ``(name, color)`` pair as a tab-separated line of name,
+    status and color, preceded by the controller for ``(controller, name,
+    color)`` triples.
+    """
+    for job in jobs:
+        controller, name, color = _controller_job(job)
+        if controller is not None:
+            stream.write('{0}\t'.format(controller))
+        stream.write('{0}\t{1}\t{2}\n'.format(name, job_status(color),
+                                              color or ''))
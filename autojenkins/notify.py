@@ -0,0 +1,181 @@
+"""
+Embedded HTTP listener for build completion notifications.
+
+Jenkins can push a notification whenever a build changes phase, e.g. with
+the Notification plugin configured to send JSON over HTTP::
+
+    {"name": "myjob",
+     "build": {"number": 18, "phase": "COMPLETED", "status": "SUCCESS"}}
+
+A :class:`NotificationListener` receives these and wakes up any thread
+waiting for that build, so :meth:`autojenkins.jobs.Jenkins.wait_for_build`
+does not need to poll the server every few seconds.
+"""
+import json
+import threading
+import time
+
+import requests
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:  # Python 2
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+
+COMPLETION_PHASES = ('COMPLETED', 'FINALIZED')
+
+
+def parse_notification(payload):
+    """
+    Extract ``(jobname, build)`` from a notification payload.
+
+    ``build`` is a dict with at least ``number``, ``phase`` and ``status``.
+    """
+    build = dict(payload.get('build') or {})
+    build.setdefault('phase', 'COMPLETED')
+    build.setdefault('status', None)
+    build['number'] = int(build['number'])
+    return payload['name'], build
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _NotificationHandler(BaseHTTPRequestHandler):
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length)
+        try:
+            jobname, build = parse_notification(
+                json.loads(body.decode('utf-8')))
+        except (ValueError, KeyError, TypeError):
+            self.send_response(400)
+        else:
+            self.server.listener.notify(jobname, build)
+            self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class NotificationListener(object):
+    """
+    Local HTTP server that receives build notifications from Jenkins.
+
+    Use it as a context manager, or call :meth:`start` and :meth:`stop`::
+
+        with NotificationListener(port=8765) as listener:
+            jenkins.build('myjob', wait=True, listener=listener)
+    """
+
+    def __init__(self, host='127.0.0.1', port=0):
+        self.host = host
+        self.port = port
+        self._server = None
+        self._thread = None
+        self._latest = {}
+        self._condition = threading.Condition()
+
+    @property
+    def url(self):
+        """
+        URL that Jenkins should send notifications to.
+        """
+        return 'http://{0}:{1}/'.format(self.host, self.port)
+
+    def start(self):
+        """
+        Start serving notifications in a background thread.
+        """
+        self._server = _ThreadingHTTPServer((self.host, self.port),
+                                            _NotificationHandler)
+        self._server.listener = self
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stop the server and wait for its thread to finish.
+        """
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def notify(self, jobname, build):
+        """
+        Record a notification and wake up threads waiting for it.
+
+        Notifications for phases other than completion are ignored.
+        """
+        if build['phase'] not in COMPLETION_PHASES:
+            return
+        with self._condition:
+            latest = self._latest.get(jobname)
+            if latest is None or build['number'] >= latest['number']:
+                self._latest[jobname] = build
+            self._condition.notify_all()
+
+    def completed(self, jobname, build_number):
+        """
+        Return the notified build if build ``build_number`` (or a later one)
+        of ``jobname`` has completed, ``None`` otherwise.
+        """
+        latest = self._latest.get(jobname)
+        if latest is not None and latest['number'] >= build_number:
+            return latest
+        return None
+
+    def wait(self, jobname, build_number, timeout=None):
+        """
+        Block until build ``build_number`` of ``jobname`` is notified as
+        completed, or ``timeout`` seconds have passed.
+
+        :returns: the notified build, or ``None`` on timeout
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._condition:
+            while True:
+                build = self.completed(jobname, build_number)
+                if build is not None:
+                    return build
+                if deadline is None:
+                    self._condition.wait()
+                else:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        return None
+                    self._condition.wait(remaining)
+
+
+def send_notification(url, jobname, build_number, status='SUCCESS',
+                      phase='COMPLETED'):
+    """
+    Send a build notification the way the Jenkins Notification plugin does.
+
+    This is a stand-in for a real server, useful for tests and demos.
+    """
+    payload = {'name': jobname,
+               'build': {'number': build_number,
+                         'phase': phase,
+                         'status': status}}
+    response = requests.post(url, data=json.dumps(payload),
+                             headers={'Content-Type': 'application/json'})
+    response.raise_for_status()
+    return response
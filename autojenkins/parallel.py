@@ -0,0 +1,45 @@
+"""
+Run Jenkins API calls concurrently with a bounded number of workers.
+"""
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+DEFAULT_WORKERS = 8
+
+
+def imap_unordered(func, items, workers=DEFAULT_WORKERS):
+    """
+    Apply ``func`` to every item using at most ``workers`` threads.
+
+    Yields ``(item, result, error)`` tuples in completion order. If the call
+    raised, ``error`` holds the exception and ``result`` is ``None``.
+
+    Items are consumed lazily: no more than ``2 * workers`` calls are queued
+    at any time, so memory use does not grow with the length of ``items``.
+    """
+    workers = max(1, int(workers))
+    window = 2 * workers
+    items = iter(items)
+    pending = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        try:
+            exhausted = False
+            while True:
+                while not exhausted and len(pending) < window:
+                    try:
+                        item = next(items)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    pending[executor.submit(func, item)] = item
+                if not pending:
+                    return
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    item = pending.pop(future)
+                    error = future.exception()
+                    result = None if error is not None else future.result()
+                    yield item, result, error
+        finally:
+            for future in pending:
+                future.cancel()
@@ -0,0 +1,190 @@
+"""
+Timing breakdown of where autojenkins spends its time.
+
+While a :class:`Profiler` is enabled, autojenkins records the time spent in
+each phase (HTTP requests, parsing API responses, rendering templates...)
+and, for every HTTP request, the time to connect (including DNS lookup),
+the time until the response headers arrived and the time to transfer the
+body. When disabled, which is the default, the hooks cost next to nothing.
+"""
+from __future__ import print_function
+
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    from urllib3.util import connection as urllib3_connection
+except ImportError:
+    urllib3_connection = None
+
+
+_active = None
+
+
+class RequestTiming(object):
+    """
+    Timings of one HTTP request, in seconds.
+    """
+
+    def __init__(self, method, url):
+        self.method = method
+        self.url = url
+        self.status = None
+        self.size = 0
+        self.elapsed = None
+        self.connect = 0.0
+        self.headers = 0.0
+        self.transfer = 0.0
+        self.total = 0.0
+
+
+class Profiler(object):
+    """
+    Accumulates time per phase and per HTTP request.
+    """
+
+    def __init__(self):
+        self.phases = {}
+        self.order = []
+        self.requests = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._create_connection = None
+
+    def add(self, name, elapsed):
+        """
+        Add ``elapsed`` seconds to phase ``name``.
+        """
+        with self._lock:
+            if name not in self.phases:
+                self.order.append(name)
+                self.phases[name] = [0, 0.0]
+            self.phases[name][0] += 1
+            self.phases[name][1] += elapsed
+
+    def enable(self):
+        """
+        Start recording, and time new connections made by ``urllib3``.
+        """
+        global _active
+        if urllib3_connection is not None:
+            self._create_connection = urllib3_connection.create_connection
+            urllib3_connection.create_connection = self._timed_connection
+        _active = self
+        return self
+
+    def disable(self):
+        """
+        Stop recording.
+        """
+        global _active
+        _active = None
+        if self._create_connection is not None:
+            urllib3_connection.create_connection = self._create_connection
+            self._create_connection = None
+
+    def _timed_connection(self, *args, **kwargs):
+        started = time.time()
+        try:
+            return self._create_connection(*args, **kwargs)
+        finally:
+            timing = getattr(self._local, 'request', None)
+            if timing is not None:
+                timing.connect += time.time() - started
+
+    @contextmanager
+    def request(self, method, url):
+        """
+        Time an HTTP request made by this thread in the ``with`` block.
+        """
+        timing = RequestTiming(method, url)
+        self._local.request = timing
+        started = time.time()
+        try:
+            yield timing
+        finally:
+            self._local.request = None
+            timing.total = time.time() - started
+            if timing.elapsed is not None:
+                timing.headers = max(0.0, timing.elapsed - timing.connect)
+                timing.transfer = max(0.0, timing.total - timing.elapsed)
+            self.add('http', timing.total)
+            with self._lock:
+                self.requests.append(timing)
+
+    def report(self, stream=None):
+        """
+        Print the per-phase and per-request breakdown.
+        """
+        stream = stream or sys.stderr
+        print('Phase            calls    seconds', file=stream)
+        for name in self.order:
+            calls, elapsed = self.phases[name]
+            print('{0:<14} {1:>7} {2:>10.3f}'.format(name, calls, elapsed),
+                  file=stream)
+        if self.requests:
+            print('', file=stream)
+            print('HTTP request     status  connect  headers transfer'
+                  '    total    bytes', file=stream)
+        for timing in self.requests:
+            print('{0:<6} {1}'.format(timing.method, timing.url),
+                  file=stream)
+            print('{0:>23} {1:>8.3f} {2:>8.3f} {3:>8.3f} {4:>8.3f} {5:>8}'
+                  .format(timing.status, timing.connect, timing.headers,
+                          timing.transfer, timing.total, timing.size),
+                  file=stream)
+
+
+def active():
+    """
+    Return the enabled :class:`Profiler`, or ``None``.
+    """
+    return _active
+
+
+@contextmanager
+def phase(name):
+    """
+    Attribute the time spent in the ``with`` block to phase ``name``.
+    """
+    profiler = _active
+    if profiler is None:
+        yield
+        return
+    started = time.time()
+    try:
+        yield
+    finally:
+        profiler.add(name, time.time() - started)
+
+
+@contextmanager
+def request(method, url):
+    """
+    Time an HTTP request made in the ``with`` block.
+
+    Call :func:`record_response` with the response before leaving the block
+    so that status, size and time to headers are recorded.
+    """
+    profiler = _active
+    if profiler is None:
+        yield None
+        return
+    with profiler.request(method, url) as timing:
+        yield timing
+
+
+def record_response(timing, response):
+    """
+    Copy status, size and time to headers of ``response`` into ``timing``.
+    """
+    if timing is None:
+        return
+    timing.status = response.status_code
+    elapsed = getattr(response, 'elapsed', None)
+    if elapsed is not None:
+        timing.elapsed = elapsed.total_seconds()
+    content = getattr(response, '_content', None)
+    timing.size = len(content) if isinstance(content, bytes) else 0
@@ -0,0 +1,250 @@
+"""
+Test report trends across many builds of a job.
+
+The test report of each build is read with a ``tree=`` query asking only
+for the class name, name, duration and status of its cases, and flattened
+into one compact column of durations and one of statuses per build,
+indexed by interned test names: about five bytes per test and build, so
+fifty thousand tests over a hundred builds take some 25 MB. At most
+``2 * workers`` reports are being parsed at any time.
+
+From that history, tests are ranked by duration, by duration regression
+and by how often they flip between passing and failing::
+
+    history = fetch_test_history(jenkins, 'myjob', limit=50)
+    for test in flaky(history):
+        print(test.name, test.flips)
+"""
+import heapq
+from array import array
+from collections import namedtuple
+
+from autojenkins.jobs import API, JOBINFO, HttpNotFoundError, parse
+from autojenkins.parallel import DEFAULT_WORKERS, imap_unordered
+from autojenkins.stats import percentile
+
+
+REPORT = '{0}/job/{1}/{2}/testReport/' + API
+REPORT_TREE = 'suites[cases[className,name,duration,status]]'
+BUILDS_TREE = 'builds[number,building]{{0,{0}}}'
+STATUSES = ('PASSED', 'FIXED', 'FAILED', 'REGRESSION', 'SKIPPED')
+FAILED = (STATUSES.index('FAILED'), STATUSES.index('REGRESSION'))
+SKIPPED = STATUSES.index('SKIPPED')
+#: Status of a test absent from a build
+ABSENT = -1
+
+
+class CaseTiming(namedtuple('CaseTiming', 'name runs median last')):
+    """
+    Durations of a test, in seconds, over the builds that ran it.
+    """
+    __slots__ = ()
+
+
+class CaseRegression(namedtuple('CaseRegression', 'name baseline recent')):
+    """
+    A test whose median duration over the recent builds is longer than
+    over the builds before them (seconds).
+    """
+    __slots__ = ()
+
+    @property
+    def delta(self):
+        return self.recent - self.baseline
+
+
+class FlakyCase(namedtuple('FlakyCase', 'name runs failures flips')):
+    """
+    A test that went from passing to failing or back ``flips`` times.
+    """
+    __slots__ = ()
+
+
+def _status_code(status):
+    return STATUSES.index(status) if status in STATUSES else ABSENT
+
+
+def flatten(report):
+    """
+    Return the ``(names, durations, statuses)`` columns of the cases of a
+    test report, as a list and two :class:`array.array`.
+    """
+    names = []
+    durations = array('f')
+    statuses = array('b')
+    for suite in report.get('suites') or []:
+        for case in suite.get('cases') or []:
+            names.append('{0}.{1}'.format(case.get('className'),
+                                          case.get('name')))
+            durations.append(case.get('duration') or 0)
+            statuses.append(_status_code(case.get('status')))
+    return names, durations, statuses
+
+
+class ReportHistory(object):
+    """
+    Test durations and statuses of many builds of a job.
+
+    :attr:`tests` holds the interned test names. :attr:`durations` and
+    :attr:`statuses` map each build number to an :class:`array.array`
+    indexed like :attr:`tests`, with :data:`ABSENT` as the status of tests
+    the build did not run. Builds can be added in any order.
+    """
+
+    def __init__(self, jobname=None):
+        self.jobname = jobname
+        self.tests = []
+        self._test_index = {}
+        self.durations = {}
+        self.statuses = {}
+
+    def __len__(self):
+        return len(self.durations)
+
+    @property
+    def builds(self):
+        """
+        Sorted numbers of the builds in the history.
+        """
+        return sorted(self.durations)
+
+    def add(self, number, names, durations, statuses):
+        """
+        Add the flattened report of a build, see :func:`flatten`.
+        """
+        column = array('f', [0]) * len(self.tests)
+        status = array('b', [ABSENT]) * len(self.tests)
+        for name, duration, code in zip(names, durations, statuses):
+            index = self._test_index.get(name)
+            if index is None:
+                index = self._test_index[name] = len(self.tests)
+                self.tests.append(name)
+                column.append(0)
+                status.append(ABSENT)
+            column[index] = duration
+            status[index] = code
+        self.durations[number] = column
+        self.statuses[number] = status
+
+    def runs(self, index, builds=None):
+        """
+        Return the ``(number, duration, status)`` of the builds that ran
+        test ``index``, in build order, skipped runs excluded.
+        """
+        runs = []
+        for number in builds or self.builds:
+            status = self.statuses[number]
+            if index < len(status) and status[index] not in (ABSENT,
+                                                             SKIPPED):
+                runs.append((number, self.durations[number][index],
+                             status[index]))
+        return runs
+
+    def iter_runs(self):
+        """
+        Yield the name and :meth:`runs` of every test.
+        """
+        builds = self.builds
+        for index, name in enumerate(self.tests):
+            yield name, self.runs(index, builds)
+
+
+def completed_builds(jenkins, jobname, limit):
+    """
+    Return the numbers of the last ``limit`` completed builds of a job.
+    """
+    response = jenkins._build_get(JOBINFO, jobname,
+                                  params={'tree': BUILDS_TREE.format(limit)})
+    return [build['number'] for build in parse(response).get('builds', [])
+            if not build.get('building')]
+
+
+def fetch_report(jenkins, jobname, number):
+    """
+    Return the flattened test report of a build, see :func:`flatten`.
+    """
+    response = jenkins._build_get(REPORT, jobname, number,
+                                  params={'tree': REPORT_TREE})
+    return flatten(parse(response))
+
+
+def fetch_test_history(jenkins, jobname, limit=20, workers=DEFAULT_WORKERS):
+    """
+    Fetch the test reports of the last ``limit`` completed builds of a job
+    into a :class:`ReportHistory`. Builds without a test report are skipped.
+    """
+    history = ReportHistory(jobname)
+    numbers = completed_builds(jenkins, jobname, limit)
+    reports = imap_unordered(
+        lambda number: fetch_report(jenkins, jobname, number),
+        numbers, workers)
+    for number, report, error in reports:
+        if isinstance(error, HttpNotFoundError):
+            continue
+        elif error is not None:
+            raise error
+        history.add(number, *report)
+    return history
+
+
+def _timings(history):
+    for name, runs in history.iter_runs():
+        if runs:
+            durations = [duration for _, duration, _ in runs]
+            yield CaseTiming(name, len(runs), percentile(durations, 50),
+                             durations[-1])
+
+
+def slowest(history, count=10):
+    """
+    Return the ``count`` tests with the longest median duration, as
+    :class:`CaseTiming`.
+    """
+    return heapq.nsmallest(count, _timings(history),
+                           key=lambda timing: (-timing.median, timing.name))
+
+
+def _regressions(history, window, min_delta):
+    for name, runs in history.iter_runs():
+        if len(runs) < 2 * window:
+            continue
+        durations = [duration for _, duration, _ in runs]
+        regression = CaseRegression(name,
+                                    percentile(durations[:-window], 50),
+                                    percentile(durations[-window:], 50))
+        if regression.delta > min_delta:
+            yield regression
+
+
+def regressions(history, window=5, count=10, min_delta=1.0):
+    """
+    Return the ``count`` tests whose median duration over their last
+    ``window`` runs grew the most over the median of their runs before, by
+    more than ``min_delta`` seconds, as :class:`CaseRegression`.
+
+    Tests with fewer than ``2 * window`` runs are not considered.
+    """
+    return heapq.nsmallest(
+        count, _regressions(history, window, min_delta),
+        key=lambda regression: (-regression.delta, regression.name))
+
+
+def _flips(history, min_flips):
+    for name, runs in history.iter_runs():
+        outcomes = [status in FAILED for _, _, status in runs]
+        flips = sum(1 for previous, current in zip(outcomes, outcomes[1:])
+                    if previous != current)
+        if flips >= min_flips:
+            yield FlakyCase(name, len(runs), sum(outcomes), flips)
+
+
+def flaky(history, count=10, min_flips=2):
+    """
+    Return the ``count`` tests that flipped between passing and failing
+    the most, at least ``min_flips`` times, as :class:`FlakyCase`.
+
+    A test that broke once and stayed broken flipped only once.
+    """
+    return heapq.nsmallest(
+        count, _flips(history, min_flips),
+        key=lambda case: (-case.flips, -case.failures, case.name))
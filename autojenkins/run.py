@@ -1,14 +1,59 @@
 """Autojenkins CLI
 
 Usage:
-  autojenkins list <host> [(--user=<USER> --password=<PASSWORD>)]
-            [--proxy=<PROXY>][-nr]
+  autojenkins list <host>... [(--user=<USER> --password=<PASSWORD>)]
+            [--proxy=<PROXY>][-nr] [--match=<REGEX>] [--color=<COLOR>]...
+            [--status=<STATUS>]... [--offset=<N>] [--limit=<N>]
+            [--page-size=<N>] [--format=<FORMAT>]
+            [--profile [--profile-output=<FILE>]]
   autojenkins create <host> <jobname> <template> [-D=<VAR=VALUE>]... [--build]
+            [--track [--registry=<FILE>]]
             [(--user=<USER> --password=<PASSWORD>)] [--proxy=<PROXY>]
-  autojenkins build <host> <jobname> [--wait]
+            [--profile [--profile-output=<FILE>]]
+  autojenkins regenerate <host> [--registry=<FILE>] [--parallel=<N>]
+            [--dry-run] [--force]
+            [(--user=<USER> --password=<PASSWORD>)] [--proxy=<PROXY>]
+            [--profile [--profile-output=<FILE>]]
+  autojenkins build <host> <jobname>... [--wait] [--parallel=<N>]
             [(--user=<USER> --password=<PASSWORD>)][--proxy=<PROXY>]
+            [--profile [--profile-output=<FILE>]]
   autojenkins delete <host> <jobname>...
             [(--user=<USER> --password=<PASSWORD>)][--proxy=<PROXY>]
+            [--profile [--profile-output=<FILE>]]
+  autojenkins (enable | disable) <host> [<jobname>...] [--match=<REGEX>]
+            [--color=<COLOR>]... [--parallel=<N>] [--dry-run]
+            [(--user=<USER> --password=<PASSWORD>)][--proxy=<PROXY>]
+            [--profile [--profile-output=<FILE>]]
+  autojenkins grep <host> <pattern> <jobname>... [--builds=<RANGE>]
+            [--first | --limit=<N>] [--parallel=<N>]
+            [(--user=<USER> --password=<PASSWORD>)][--proxy=<PROXY>]
+            [--profile [--profile-output=<FILE>]]
+  autojenkins stats <host> [<jobname>...] [--history=<N>] [--window=<N>]
+            [--parallel=<N>]
+            [(--user=<USER> --password=<PASSWORD>)][--proxy=<PROXY>]
+            [--profile [--profile-output=<FILE>]]
+  autojenkins stages <host> <jobname>... [--history=<N>] [--window=<N>]
+            [--threshold=<PCT>] [--parallel=<N>]
+            [(--user=<USER> --password=<PASSWORD>)][--proxy=<PROXY>]
+            [--profile [--profile-output=<FILE>]]
+  autojenkins tests <host> <jobname> [--history=<N>] [--window=<N>]
+            [--top=<N>] [--parallel=<N>]
+            [(--user=<USER> --password=<PASSWORD>)][--proxy=<PROXY>]
+            [--profile [--profile-output=<FILE>]]
+  autojenkins graph <host> [<jobname>] [--format=<FORMAT>]
+            [(--user=<USER> --password=<PASSWORD>)][--proxy=<PROXY>]
+            [--profile [--profile-output=<FILE>]]
+  autojenkins export <host> <archive> [--parallel=<N>]
+            [(--user=<USER> --password=<PASSWORD>)][--proxy=<PROXY>]
+            [--profile [--profile-output=<FILE>]]
+  autojenkins import <host> <archive> [--parallel=<N>]
+            [(--user=<USER> --password=<PASSWORD>)][--proxy=<PROXY>]
+            [--profile [--profile-output=<FILE>]]
+  autojenkins search <host> [<query>...] [--index=<FILE>] [--update]
+            [--parallel=<N>]
+            [(--user=<USER> --password=<PASSWORD>)][--proxy=<PROXY>]
+            [--profile [--profile-output=<FILE>]]
+  autojenkins serve [--socket=<PATH>] [--ttl=<SECONDS>]
   autojenkins --version
   autojenkins -h | --help
 
@@ -21,30 +66,85 @@ Options:
   -D VAR=VALUE             substitution variables to be used in the template
   -x, --proxy=PROXY        Proxyserver (Host:Port)
   -b, --build              start build after creation
+  --track                  record the template and variables of the new job
+                           to regenerate it when the template changes
+  --registry=<FILE>        registry of jobs created from templates
+                           [default: autojenkins-templates.json]
+  --force                  render the jobs of unchanged templates too
   -w, --wait               wait until the build completes
   -n, --no-color           do not use colored output
   -r, --raw                print raw list of jobs
+  --parallel=<N>           number of concurrent requests [default: 8]
+  --builds=<RANGE>         builds to search, as FIRST-LAST or a single build
+                           [default: lastBuild]
+  --first                  only show the first match of the earliest build
+  --limit=<N>              stop after N matches or jobs
+  --offset=<N>             skip the first N jobs [default: 0]
+  --match=<REGEX>          only select jobs whose name matches REGEX
+  --color=<COLOR>          only select jobs of this color (blue, red...)
+  --dry-run                only show which jobs would change
+  --status=<STATUS>        only list jobs with this status (SUCCESS, FAILED,
+                           UNSTABLE, BUILDING...)
+  --page-size=<N>          jobs fetched per request [default: 1000]
+  --history=<N>            number of recent builds per job [default: 100]
+  --window=<N>             builds in the moving average of durations, the
+                           rolling baseline of a stage, or recent builds
+                           compared to older ones for tests [default: 10]
+  --top=<N>                number of tests in each ranking [default: 10]
+  --threshold=<PCT>        slowdown over the baseline that is a regression
+                           [default: 50]
+  --format=<FORMAT>        output format: dot or json for graph,
+                           jsonl or tsv for list
+  --index=<FILE>           job configuration index
+                           [default: autojenkins-index.sqlite]
+  --update                 update the index before searching
+  --socket=<PATH>          Unix socket of the caching daemon, by default
+                           $AUTOJENKINS_SOCKET or ~/.autojenkins.sock
+  --ttl=<SECONDS>          how long the daemon caches job lists and job
+                           information [default: 10]
+  --profile                print a timing breakdown per phase and request
+  --profile-output=<FILE>  also save cProfile statistics to FILE
+
+Search queries are FIELD:VALUE terms, where FIELD is scm, branch, label,
+trigger, parameter or text (the whole config.xml); a bare VALUE matches any
+field. Jobs must match all terms.
+
+Jobs to enable or disable are given by name or glob (e.g. 'release-*'),
+and narrowed down with --match and --color.
+
+Commands go through the caching daemon started with ``serve`` when it is
+running (on the socket in $AUTOJENKINS_SOCKET, or the default one), and
+directly to the server otherwise.
 
 """
 
 from __future__ import print_function
 
+import cProfile
 import sys
+import time
 from docopt import docopt
 
 from ajk_version import __version__
-from autojenkins import Jenkins, jobs
-
-COLOR_MEANING = {
-    'blue': ('1;32', 'SUCCESS'),
-    'green': ('1;32', 'SUCCESS'),
-    'red': ('1;31', 'FAILED'),
-    'yellow': ('1;33', 'UNSTABLE'),
-    'aborted': ('1;37', 'ABORTED'),
-    'disabled': ('0;37', 'DISABLED'),
-    'grey': ('1;37', 'NOT BUILT'),
-    'notbuilt': ('1;37', 'NOT BUILT'),
+from autojenkins import (IMPORT_STARTED, Jenkins, archive, batch, bulk,
+                         daemon, federation, grep, index, jobs, listing,
+                         profiling, reports, stages, stats, templates)
+from autojenkins.federation import FederatedJenkins
+
+IMPORTED = time.time()
+
+COLOR_CODES = {
+    'blue': '1;32',
+    'green': '1;32',
+    'red': '1;31',
+    'yellow': '1;33',
+    'aborted': '1;37',
+    'disabled': '0;37',
+    'grey': '1;37',
+    'notbuilt': '1;37',
 }
+COLOR_MEANING = dict((color, (code, listing.COLOR_STATUS[color]))
+                     for color, code in COLOR_CODES.items())
 
 
 def get_variables(options):
@@ -76,6 +176,15 @@ def get_auth(args):
         return (args['--user'], args['--password'])
 
 
+def get_client(host, options, **kwargs):
+    """
+    Return a client of ``host``, going through the caching daemon when it
+    is running
+    """
+    return Jenkins(host, proxies=get_proxy(options), auth=get_auth(options),
+                   transport=daemon.DaemonTransport(), **kwargs)
+
+
 def create_job(host, jobname, options):
     """
     Create a new job
@@ -87,17 +196,58 @@ def create_job(host, jobname, options):
       {2}
     """.format(jobname, options['<template>'], data))
 
-    jenkins = Jenkins(host, proxies=get_proxy(options), auth=get_auth(options))
+    jenkins = get_client(host, options)
     try:
-        response = jenkins.create_copy(jobname, options['<template>'], **data)
+        if options['--track']:
+            registry = templates.TemplateRegistry(options['--registry'],
+                                                  jenkins)
+            response = registry.create_copy(jobname, options['<template>'],
+                                            **data)
+        else:
+            response = jenkins.create_copy(jobname, options['<template>'],
+                                           **data)
         if response.status_code == 200 and options['--build']:
             print('Triggering build.')
             jenkins.build(jobname)
         print ('Job URL: {0}'.format(jenkins.job_url(jobname)))
         return response.status_code < 400
-    except jobs.JobExists as error:
+    except (jobs.JobExists, jobs.JobInexistent) as error:
         print("Error:", error.msg)
         return False
+    except templates.TemplateRegistryError as error:
+        print("Error:", error)
+        return False
+
+
+def regenerate_jobs(host, options):
+    """
+    Render again the tracked jobs of the templates that changed, and push
+    those whose configuration changed.
+
+    :returns: ``True`` if all jobs were regenerated without errors
+    """
+    jenkins = get_client(host, options)
+    try:
+        registry = templates.TemplateRegistry(options['--registry'], jenkins)
+    except templates.TemplateRegistryError as error:
+        print("Error:", error)
+        return False
+    outcome = registry.regenerate(workers=int(options['--parallel']),
+                                  force=options['--force'],
+                                  dry_run=options['--dry-run'])
+    if not outcome:
+        print("No template changed")
+    for jobname in sorted(outcome):
+        status = outcome[jobname]
+        if isinstance(status, Exception):
+            print("Error: {0}: {1}".format(jobname,
+                                           getattr(status, 'msg', status)))
+        elif options['--dry-run'] and status == archive.UPDATED:
+            print("Job '{0}' would be updated".format(jobname))
+        else:
+            print("Job '{0}' {1}".format(jobname, status))
+    return not any(isinstance(status, Exception)
+                   for status in outcome.values())
 
 
 def build_job(host, jobname, options):
@@ -114,7 +264,7 @@ def build_job(host, jobname, options):
          * If not wait: ``True`` if HTTP status code is not an error code
     """
     print ("Start building job '{0}'".format(jobname))
-    jenkins = Jenkins(host, proxies=get_proxy(options), auth=get_auth(options))
+    jenkins = get_client(host, options)
     try:
         response = jenkins.build(jobname, wait=options['--wait'])
         if options['--wait']:
@@ -129,11 +279,34 @@ def build_job(host, jobname, options):
         return False
 
 
+def build_jobs(host, jobnames, options):
+    """
+    Trigger builds for several jobs concurrently.
+
+    :returns:
+        ``True`` if all builds were triggered (and succeeded, if waiting),
+        ``False`` otherwise
+    """
+    wait = options['--wait']
+    jenkins = get_client(host, options)
+    outcomes = jenkins.build_many(jobnames, wait=wait,
+                                  workers=int(options['--parallel']))
+    for outcome in outcomes:
+        if outcome.error is not None:
+            print("Error:", getattr(outcome.error, 'msg', outcome.error))
+        elif wait:
+            print("{0:<10} {1} #{2}".format(outcome.result, outcome.jobname,
+                                            outcome.number))
+        else:
+            print("Build '%s' started" % outcome.jobname)
+    return batch.succeeded(outcomes, wait=wait)
+
+
 def delete_jobs(host, jobnames, options):
     """
     Delete existing jobs.
     """
-    jenkins = Jenkins(host, proxies=get_proxy(options), auth=get_auth(options))
+    jenkins = get_client(host, options)
     for jobname in jobnames:
         print ("Deleting job '{0}'".format(jobname))
         try:
@@ -147,48 +320,470 @@ def delete_jobs(host, jobnames, options):
             pass
 
 
-def list_jobs(host, options, color=True, raw=False):
+def get_format(color=True, raw=False):
     """
-    List all jobs
+    Return the format string and ``COLOR_MEANING`` position to list jobs.
     """
     if raw:
-        FORMAT = "{1}"
-        position = 0
+        return "{1}", 0
     elif color:
-        FORMAT = "\033[{0}m{1}\033[0m"
-        position = 0
+        return "\033[{0}m{1}\033[0m", 0
     else:
-        FORMAT = "{0:<10} {1}"
-        position = 1
+        return "{0:<10} {1}", 1
+
+
+def print_job(name, color, FORMAT, position, raw=False):
+    """
+    Print one line of a job listing.
+    """
+    if '_' in color:
+        color = color.split('_')[0]
+        building = True
+    else:
+        building = False
+    prefix = '' if raw else '* ' if building else '  '
+    meaning = COLOR_MEANING.get(color, ('0;37', listing.job_status(color)))
+    print(prefix + FORMAT.format(meaning[position], name))
+
+
+def toggle_jobs(host, enabled, jobnames, options):
+    """
+    Enable or disable jobs by name, glob, regex or color.
+
+    :returns: ``True`` if all selected jobs are in the requested state
+    """
+    jenkins = get_client(host, options)
+    globs = [name for name in jobnames if any(c in name for c in '*?[')]
+    names = [name for name in jobnames if name not in globs]
+    state = 'enabled' if enabled else 'disabled'
+    try:
+        outcomes = bulk.set_enabled(jenkins, enabled, names, globs,
+                                    options['--match'], options['--color'],
+                                    int(options['--parallel']),
+                                    options['--dry-run'])
+    except jobs.AutojenkinsError as error:
+        print("Error:", error)
+        return False
+    for outcome in outcomes:
+        if outcome.error is not None:
+            print("Error:", getattr(outcome.error, 'msg', outcome.error))
+        elif not outcome.changed:
+            print("Job '{0}' already {1}".format(outcome.jobname, state))
+        elif options['--dry-run']:
+            print("Job '{0}' would be {1}".format(outcome.jobname, state))
+        else:
+            print("Job '{0}' {1}".format(outcome.jobname, state))
+    return all(outcome.error is None for outcome in outcomes)
+
+
+def get_job_filter(options):
+    """
+    Return the keyword arguments of :func:`autojenkins.listing.iter_jobs`
+    from the ``list`` options.
+    """
+    limit = options['--limit']
+    return dict(pattern=options['--match'], colors=options['--color'],
+                statuses=options['--status'],
+                offset=int(options['--offset']),
+                limit=int(limit) if limit is not None else None,
+                page_size=int(options['--page-size']))
+
+
+def list_jobs(host, options, color=True, raw=False):
+    """
+    List all jobs, or those selected by the filter options.
+
+    Jobs are printed as each page arrives; with ``--format=jsonl`` or
+    ``--format=tsv`` one machine-readable line is written per job.
+    """
+    jenkins = get_client(host, options)
+    joblist = listing.iter_jobs(jenkins, **get_job_filter(options))
+    if options['--format'] == 'jsonl':
+        listing.write_jsonl(joblist, sys.stdout)
+        return
+    elif options['--format'] == 'tsv':
+        listing.write_tsv(joblist, sys.stdout)
+        return
+    FORMAT, position = get_format(color, raw)
     if not raw:
         print ("All jobs in {0}".format(host))
-    jenkins = Jenkins(host, proxies=get_proxy(options), auth=get_auth(options))
-    joblist = jenkins.all_jobs()
     for name, color in joblist:
-        if '_' in color:
-            color = color.split('_')[0]
-            building = True
+        print_job(name, color, FORMAT, position, raw)
+
+
+def list_federated_jobs(hosts, options, color=True, raw=False):
+    """
+    List all jobs in several hosts, querying them concurrently.
+
+    Every host gets the federation timeout; the filter, ``--offset`` and
+    ``--limit`` options apply to the merged list.
+
+    :returns: ``True`` if all hosts answered, ``False`` otherwise
+    """
+    timeout = federation.DEFAULT_TIMEOUT
+    controllers = FederatedJenkins(
+        [get_client(host, options, timeout=timeout) for host in hosts],
+        timeout)
+    joblist, errors = controllers.all_jobs()
+    accept = listing.job_filter(options['--match'], options['--color'],
+                                options['--status'])
+    if accept is not None:
+        joblist = [job for job in joblist if accept(job[1:])]
+    offset, limit = int(options['--offset']), options['--limit']
+    stop = offset + int(limit) if limit is not None else None
+    joblist = joblist[offset:stop]
+    if options['--format'] == 'jsonl':
+        listing.write_jsonl(joblist, sys.stdout)
+    elif options['--format'] == 'tsv':
+        listing.write_tsv(joblist, sys.stdout)
+    else:
+        FORMAT, position = get_format(color, raw)
+        if not raw:
+            print ("All jobs in {0}".format(', '.join(hosts)))
+        for host, name, color in joblist:
+            label = '{0}/job/{1}' if raw else '{1}  ({0})'
+            print_job(label.format(host, name), color, FORMAT, position, raw)
+    for host in sorted(errors):
+        print("Error: {0}: {1}".format(host, errors[host]), file=sys.stderr)
+    return not errors
+
+
+def get_targets(jobnames, builds):
+    """
+    Return ``(jobname, build)`` pairs from a ``--builds`` option: a
+    FIRST-LAST range, or a single build number or permalink.
+
+    :raises ValueError: if a range is not made of two build numbers
+    """
+    if '-' not in builds:
+        return [(jobname, builds) for jobname in jobnames]
+    try:
+        first, last = [int(number) for number in builds.split('-')]
+    except ValueError:
+        raise ValueError("Invalid build range '{0}', expected FIRST-LAST"
+                         .format(builds))
+    targets = []
+    for jobname in jobnames:
+        targets.extend(grep.build_range(jobname, first, last))
+    return targets
+
+
+def grep_builds(host, pattern, jobnames, options):
+    """
+    Search console output of builds and print matching lines.
+
+    :returns: ``True`` if anything matched, ``False`` otherwise
+    """
+    try:
+        targets = get_targets(jobnames, options['--builds'])
+    except ValueError as error:
+        print("Error:", error)
+        return False
+    jenkins = get_client(host, options)
+    limit = options['--limit']
+    matches = jenkins.grep_console(
+        pattern, targets,
+        first=options['--first'],
+        limit=int(limit) if limit is not None else None,
+        workers=int(options['--parallel']))
+    found = False
+    for match in matches:
+        found = True
+        print("{0}#{1}:{2}: {3}".format(match.jobname, match.build_number,
+                                        match.line_number, match.line))
+    return found
+
+
+def build_stats(host, jobnames, options):
+    """
+    Print duration, failure and queue statistics for recent builds.
+    """
+    jenkins = get_client(host, options)
+    history = jenkins.build_history(jobnames or None,
+                                    limit=int(options['--history']),
+                                    workers=int(options['--parallel']))
+    window = int(options['--window'])
+    FORMAT = "{0:>7} {1:>6} {2:>9} {3:>9} {4:>9} {5:>9} {6:>10}  {7}"
+    print(FORMAT.format('BUILDS', 'FAIL%', 'P50(s)', 'P95(s)', 'AVG(s)',
+                        'QUEUE(s)', 'TREND(s/d)', 'JOB'))
+    summaries = stats.summarize_jobs(history, window)
+    summaries[''] = stats.summarize(history, window=window)
+    for jobname in sorted(summaries):
+        summary = summaries[jobname]
+        average = (summary['duration_average'] or [float('nan')])[-1]
+        print(FORMAT.format(
+            summary['builds'],
+            '{0:.1f}'.format(100 * summary['failure_rate']),
+            '{0:.1f}'.format(summary['duration_p50'] / 1000),
+            '{0:.1f}'.format(summary['duration_p95'] / 1000),
+            '{0:.1f}'.format(average / 1000),
+            '{0:.1f}'.format(summary['queue_p50'] / 1000),
+            '{0:+.1f}'.format(summary['duration_trend'] / 1000),
+            jobname or '(all jobs)'))
+
+
+def stage_report(host, jobnames, options):
+    """
+    Print Pipeline stage durations, then the stage runs that regressed
+    against their rolling baseline.
+
+    :returns: ``True`` if stage timings were found without any regression,
+        ``False`` otherwise
+    """
+    jenkins = get_client(host, options)
+    history = jenkins.stage_history(jobnames,
+                                    limit=int(options['--history']),
+                                    workers=int(options['--parallel']))
+    if not len(history):
+        print("Error: no stage timings found; are the jobs Pipelines, with "
+              "the stage view (wfapi) available?")
+        return False
+    FORMAT = "{0:>5} {1:>9} {2:>9} {3:>9}  {4}"
+    print(FORMAT.format('RUNS', 'P50(s)', 'P95(s)', 'LAST(s)', 'STAGE'))
+    summary = stages.summarize_stages(history)
+    for jobname, stage in sorted(summary):
+        values = summary[(jobname, stage)]
+        print(FORMAT.format(
+            values['runs'],
+            '{0:.1f}'.format(values['duration_p50'] / 1000),
+            '{0:.1f}'.format(values['duration_p95'] / 1000),
+            '{0:.1f}'.format(values['last'] / 1000),
+            '{0} / {1}'.format(jobname, stage)))
+    found = stages.regressions(history, window=int(options['--window']),
+                               threshold=int(options['--threshold']) / 100.0)
+    for regression in found:
+        print("Regression: {0} #{1} / {2}: {3:.1f}s, baseline {4:.1f}s"
+              .format(regression.jobname, regression.number,
+                      regression.stage, regression.duration / 1000,
+                      regression.baseline / 1000))
+    return not found
+
+
+def report_tests(host, jobname, options):
+    """
+    Print the slowest tests of a job, the tests that slowed down the most
+    and those that flip between passing and failing.
+
+    :returns: ``True`` if no flaky test was found, ``False`` otherwise
+    """
+    jenkins = get_client(host, options)
+    history = jenkins.test_history(jobname, limit=int(options['--history']),
+                                   workers=int(options['--parallel']))
+    top = int(options['--top'])
+    print("{0} tests in {1} builds".format(len(history.tests), len(history)))
+    print("\nSlowest tests:")
+    for timing in reports.slowest(history, top):
+        print("{0:>9.2f}s {1}".format(timing.median, timing.name))
+    print("\nSlowed down:")
+    for regression in reports.regressions(history, int(options['--window']),
+                                          top):
+        print("{0:>+9.2f}s {1} ({2:.2f}s -> {3:.2f}s)".format(
+            regression.delta, regression.name, regression.baseline,
+            regression.recent))
+    print("\nFlaky tests:")
+    found = reports.flaky(history, top)
+    for case in found:
+        print("{0:>4} flips {1} ({2}/{3} failed)".format(
+            case.flips, case.name, case.failures, case.runs))
+    return not found
+
+
+def export_graph(host, jobname, options):
+    """
+    Print the job dependency graph, and its critical path to stderr.
+
+    If a job name is given, only jobs downstream of it are included.
+
+    :returns: ``True`` if the graph was printed, ``False`` otherwise
+    """
+    jenkins = get_client(host, options)
+    graph = jenkins.dependency_graph()
+    if jobname is not None:
+        try:
+            graph = graph.subgraph(jobname)
+        except jobs.JobInexistent as error:
+            print("Error:", error.msg)
+            return False
+    if options['--format'] == 'json':
+        print(graph.to_json())
+    else:
+        print(graph.to_dot())
+    cycles = graph.cycles()
+    for cycle in cycles:
+        print("Cycle:", ' -> '.join(cycle), file=sys.stderr)
+    if not cycles:
+        path, duration = graph.critical_path(jobname)
+        print("Critical path ({0:.0f}s): {1}".format(
+            duration / 1000.0, ' -> '.join(path)), file=sys.stderr)
+    return True
+
+
+def export_jobs(host, archive, options):
+    """
+    Save the configuration of all jobs into an archive.
+    """
+    jenkins = get_client(host, options)
+    manifest = jenkins.export_jobs(archive, workers=int(options['--parallel']))
+    print("Exported {0} jobs to '{1}'".format(len(manifest), archive))
+
+
+def import_jobs(host, archive, options):
+    """
+    Restore jobs from an archive.
+
+    :returns: ``True`` if every job was restored, ``False`` otherwise
+    """
+    jenkins = get_client(host, options)
+    outcome = jenkins.import_jobs(archive, workers=int(options['--parallel']))
+    success = True
+    for jobname in sorted(outcome):
+        status = outcome[jobname]
+        if isinstance(status, Exception):
+            print("Error: job '{0}': {1}".format(jobname, status))
+            success = False
         else:
-            building = False
-        prefix = '' if raw else '* ' if building else '  '
-        out = COLOR_MEANING[color][position]
-        print(prefix + FORMAT.format(out, name))
+            print("{0:<10} {1}".format(status, jobname))
+    return success
+
+
+def parse_query(terms):
+    """
+    Return the keyword arguments of
+    :meth:`autojenkins.index.ConfigIndex.search` for ``FIELD:VALUE`` terms.
+    """
+    criteria = {}
+    for term in terms:
+        field, sep, value = term.partition(':')
+        if not sep or field not in index.FIELDS + ('text', 'any'):
+            field, value = 'any', term
+        criteria[field] = value
+    return criteria
+
+
+def search_jobs(host, terms, options):
+    """
+    Print the jobs whose configuration matches the query, updating the
+    local index first if asked to or if it is empty.
+
+    :returns: ``True`` if any job matched, ``False`` otherwise
+    """
+    jenkins = get_client(host, options)
+    with index.ConfigIndex(options['--index'], jenkins) as config_index:
+        if options['--update'] or not config_index.jobs():
+            changes = config_index.update(int(options['--parallel']))
+            for jobname in sorted(changes):
+                if isinstance(changes[jobname], Exception):
+                    print("Error: job '{0}': {1}".format(
+                        jobname, changes[jobname]), file=sys.stderr)
+        found = False
+        for jobname in config_index.search(**parse_query(terms)):
+            found = True
+            print(jobname)
+    return found
+
+
+def serve(options):
+    """
+    Run the caching daemon until interrupted.
+    """
+    cache = daemon.CacheDaemon(options['--socket'],
+                               ttl=float(options['--ttl']))
+    print('Serving on {0}'.format(cache.path))
+    try:
+        cache.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+def run_profiled(command, args):
+    """
+    Run a command printing a timing breakdown, and optionally saving
+    cProfile statistics.
+    """
+    profiler = profiling.Profiler().enable()
+    profiler.add('import', IMPORTED - IMPORT_STARTED)
+    cprofile = cProfile.Profile() if args['--profile-output'] else None
+    started = time.time()
+    try:
+        if cprofile is None:
+            command(args)
+        else:
+            cprofile.runcall(command, args)
+    finally:
+        profiler.disable()
+        profiler.add('total', time.time() - started)
+        if cprofile is not None:
+            cprofile.dump_stats(args['--profile-output'])
+        profiler.report()
 
 
 class Commands:
     @staticmethod
     def main():
         args = docopt(__doc__, version=__version__)
+        if args['serve']:
+            return serve(args)
+        if args['--profile']:
+            run_profiled(Commands.run, args)
+        else:
+            Commands.run(args)
+
+    @staticmethod
+    def run(args):
         if args['list']:
-            list_jobs(args['<host>'], args, not args['--no-color'],
-                      args['--raw'])
+            if len(args['<host>']) == 1:
+                list_jobs(args['<host>'][0], args, not args['--no-color'],
+                          args['--raw'])
+            elif not list_federated_jobs(args['<host>'], args,
+                                         not args['--no-color'],
+                                         args['--raw']):
+                sys.exit(1)
         elif args['delete']:
-            delete_jobs(args['<host>'], args['<jobname>'], args)
+            delete_jobs(args['<host>'][0], args['<jobname>'], args)
         elif args['build']:
-            success = build_job(args['<host>'], args['<jobname>'][0], args)
+            if len(args['<jobname>']) == 1:
+                success = build_job(args['<host>'][0], args['<jobname>'][0],
+                                    args)
+            else:
+                success = build_jobs(args['<host>'][0], args['<jobname>'],
+                                     args)
             if not success:
                 sys.exit(1)
+        elif args['regenerate']:
+            if not regenerate_jobs(args['<host>'][0], args):
+                sys.exit(1)
         elif args['create']:
-            success = create_job(args['<host>'], args['<jobname>'][0], args)
+            success = create_job(args['<host>'][0], args['<jobname>'][0], args)
+            if not success:
+                sys.exit(1)
+        elif args['enable'] or args['disable']:
+            if not toggle_jobs(args['<host>'][0], args['enable'],
+                               args['<jobname>'], args):
+                sys.exit(1)
+        elif args['grep']:
+            found = grep_builds(args['<host>'][0], args['<pattern>'],
+                                args['<jobname>'], args)
+            if not found:
+                sys.exit(1)
+        elif args['stats']:
+            build_stats(args['<host>'][0], args['<jobname>'], args)
+        elif args['stages']:
+            if not stage_report(args['<host>'][0], args['<jobname>'], args):
+                sys.exit(1)
+        elif args['tests']:
+            if not report_tests(args['<host>'][0], args['<jobname>'][0],
+                                args):
+                sys.exit(1)
+        elif args['graph']:
+            if not export_graph(args['<host>'][0], args['<jobname>'][0]
+                                if args['<jobname>'] else None, args):
+                sys.exit(1)
+        elif args['export']:
+            export_jobs(args['<host>'][0], args['<archive>'], args)
+        elif args['search']:
+            if not search_jobs(args['<host>'][0], args['<query>'], args):
+                sys.exit(1)
+        elif args['import']:
+            success = import_jobs(args['<host>'][0], args['<archive>'], args)
             if not success:
                 sys.exit(1)
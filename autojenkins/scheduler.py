@@ -0,0 +1,225 @@
+"""
+Release build triggers only when the controller has executors for them.
+
+Triggering hundreds of builds at once floods the queue and makes executors
+thrash. A :class:`BuildScheduler` holds triggers back and, once per poll
+interval, reads the build queue and the executors of all nodes, then
+releases as many pending triggers as there are idle executors for them,
+highest priority first and within per-label limits::
+
+    scheduler = BuildScheduler(jenkins, label_limits={'windows': 4})
+    scheduler.submit('build-linux', label='linux')
+    scheduler.submit('release', priority=10)
+    outcomes = scheduler.run(deadline=3600)
+
+Only the scheduler's own queue items count against the idle executors, and
+one trigger is released whenever none of them is queued, so that agents
+provisioned on demand get a build to start for.
+"""
+import heapq
+import itertools
+import time
+
+from autojenkins.batch import (BuildOutcome, buildable_jobs, parse_queue_id,
+                               preflight_error, wait_for_all)
+from autojenkins.deadline import Deadline, DeadlineExceeded, within
+from autojenkins.jobs import QUEUE, parse
+from autojenkins.parallel import DEFAULT_WORKERS, imap_unordered
+
+
+COMPUTERS = '{0}/computer/api/python'
+COMPUTER_TREE = 'computer[offline,assignedLabels[name],executors[idle]]'
+QUEUE_TREE = 'items[id]'
+
+
+class LabelUnavailable(Exception):
+    pass
+
+
+class Load(object):
+    """
+    Executor and queue state of the controller at one point in time.
+
+    Online nodes, and their idle and busy executors, are counted per label,
+    with ``None`` standing for any node.
+    """
+
+    def __init__(self, computers, queue, labels=()):
+        self.nodes = dict((label, 0) for label in labels)
+        self.idle = dict((label, 0) for label in labels)
+        self.busy = dict((label, 0) for label in labels)
+        self.nodes[None] = self.idle[None] = self.busy[None] = 0
+        for computer in computers:
+            if computer.get('offline'):
+                continue
+            executors = computer.get('executors') or []
+            idle = sum(1 for executor in executors if executor.get('idle'))
+            busy = len(executors) - idle
+            names = set(label['name'] for label in
+                        computer.get('assignedLabels') or [])
+            for label in [None] + [name for name in names
+                                   if name in self.idle]:
+                self.nodes[label] += 1
+                self.idle[label] += idle
+                self.busy[label] += busy
+        self.queued = set(item['id'] for item in queue)
+
+
+def read_load(jenkins, labels=()):
+    """
+    Read the executors of all nodes and the build queue.
+    """
+    computers = jenkins._build_get(COMPUTERS,
+                                   params={'tree': COMPUTER_TREE})
+    queue = jenkins._build_get(QUEUE, params={'tree': QUEUE_TREE})
+    return Load(parse(computers).get('computer', []),
+                parse(queue).get('items', []), labels)
+
+
+class BuildScheduler(object):
+    """
+    Queue of build triggers released according to executor availability.
+
+    :param label_limits:
+        Maximum number of builds running or waiting on nodes with a given
+        label, e.g. ``{'windows': 4}``
+    :param poll_interval:
+        Seconds between two reads of the controller load
+    """
+
+    def __init__(self, jenkins, label_limits=None, poll_interval=5,
+                 workers=DEFAULT_WORKERS):
+        self.jenkins = jenkins
+        self.label_limits = label_limits or {}
+        self.poll_interval = poll_interval
+        self.workers = workers
+        self._pending = []
+        self._counter = itertools.count()
+        self._outcomes = []
+        self._waiting = {}
+
+    def submit(self, jobname, params=None, priority=0, label=None):
+        """
+        Add a build trigger. Higher ``priority`` triggers are released
+        first; ``label`` is the node label the job runs on, if any.
+        """
+        index = len(self._outcomes)
+        self._outcomes.append(BuildOutcome(jobname, params, None, None, None,
+                                           None))
+        heapq.heappush(self._pending, (-priority, next(self._counter),
+                                       index, label))
+
+    def _admit(self, load):
+        """
+        Pop the pending triggers that can run now, given ``load``.
+        """
+        waiting = dict((label, 0) for label in load.idle)
+        for queue_id, label in list(self._waiting.items()):
+            if queue_id not in load.queued:
+                del self._waiting[queue_id]
+            else:
+                waiting[None] += 1
+                if label is not None:
+                    waiting[label] += 1
+        free = dict((label, load.idle[label] - waiting[label])
+                    for label in load.idle)
+        if not waiting[None]:
+            free[None] = max(free[None], 1)
+        for label, limit in self.label_limits.items():
+            if label in free:
+                in_use = load.busy[label] + waiting[label]
+                free[label] = min(free[label], limit - in_use)
+
+        admitted = []
+        deferred = []
+        while self._pending and free[None] > 0:
+            entry = heapq.heappop(self._pending)
+            label = entry[3]
+            if label is not None and free.get(label, 0) <= 0:
+                deferred.append(entry)
+                continue
+            free[None] -= 1
+            if label is not None:
+                free[label] -= 1
+            admitted.append(entry)
+        for entry in deferred:
+            heapq.heappush(self._pending, entry)
+        return admitted
+
+    def _fail(self, failed):
+        """
+        Drop pending triggers, given as ``(entry, error)`` pairs, recording
+        their error.
+        """
+        for entry, error in failed:
+            self._pending.remove(entry)
+            index = entry[2]
+            self._outcomes[index] = self._outcomes[index]._replace(
+                error=error)
+        heapq.heapify(self._pending)
+
+    def run(self, wait=False, deadline=None):
+        """
+        Release all submitted triggers, and optionally wait for the builds.
+
+        Triggers for a label that no online node has fail with
+        :class:`LabelUnavailable`.
+
+        :param deadline:
+            Seconds, or a :class:`autojenkins.deadline.Deadline`, to release
+            the triggers (and wait for the builds) in
+        :returns: a list of :class:`autojenkins.batch.BuildOutcome`, in the
+            order the triggers were submitted
+        :raises DeadlineExceeded: when the deadline passed, with the list of
+            outcomes as ``progress``; triggers not released yet have no
+            ``queue_id``
+        """
+        deadline = Deadline.start(deadline)
+        with within(self.jenkins, deadline):
+            buildable = buildable_jobs(self.jenkins)
+        failed = []
+        for entry in self._pending:
+            outcome = self._outcomes[entry[2]]
+            error = preflight_error(buildable, outcome.jobname)
+            if error is not None:
+                failed.append((entry, error))
+        self._fail(failed)
+
+        def trigger(entry):
+            outcome = self._outcomes[entry[2]]
+            with within(self.jenkins, deadline):
+                response = self.jenkins._trigger(outcome.jobname,
+                                                 outcome.params)
+            return parse_queue_id(response)
+
+        labels = set(entry[3] for entry in self._pending) - set([None])
+        try:
+            while self._pending:
+                with within(self.jenkins, deadline):
+                    load = read_load(self.jenkins, labels)
+                self._fail([(entry, LabelUnavailable(
+                    "No online node with label '{0}'".format(entry[3])))
+                    for entry in self._pending
+                    if entry[3] is not None and not load.nodes[entry[3]]])
+                admitted = self._admit(load)
+                results = imap_unordered(trigger, admitted, self.workers)
+                for entry, queue_id, error in results:
+                    index = entry[2]
+                    self._outcomes[index] = self._outcomes[index]._replace(
+                        queue_id=queue_id, error=error)
+                    if queue_id is not None:
+                        self._waiting[queue_id] = entry[3]
+                if not self._pending:
+                    break
+                if deadline is None:
+                    time.sleep(self.poll_interval)
+                else:
+                    deadline.sleep(self.poll_interval)
+        except DeadlineExceeded as error:
+            raise DeadlineExceeded(str(error), list(self._outcomes))
+        outcomes = list(self._outcomes)
+        if wait:
+            outcomes = wait_for_all(self.jenkins, outcomes,
+                                    self.poll_interval, self.workers,
+                                    deadline)
+        return outcomes
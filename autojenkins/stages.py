@@ -0,0 +1,232 @@
+"""
+Pipeline stage timings and stage duration regressions.
+
+Stage timings come from the stage view API (``wfapi``) of Pipeline jobs.
+The runs of a range of builds are read with one ``wfapi/runs?since=#N``
+request per job, and only builds missing from that answer are described
+one by one. Timings are kept in columnar arrays with stage names interned,
+one entry per stage of each build.
+"""
+import json
+from array import array
+from collections import namedtuple
+
+from autojenkins import profiling
+from autojenkins.jobs import LIST, HttpNotFoundError, parse
+from autojenkins.parallel import DEFAULT_WORKERS, imap_unordered
+from autojenkins.stats import percentile
+
+
+RUNS = '{0}/job/{1}/wfapi/runs'
+DESCRIBE = '{0}/job/{1}/{2}/wfapi/describe'
+LAST_BUILDS_TREE = 'jobs[name,lastBuild[number]]'
+STATUSES = ('SUCCESS', 'UNSTABLE', 'FAILED', 'ABORTED', 'NOT_EXECUTED',
+            None)
+RUNNING = ('IN_PROGRESS', 'PAUSED_PENDING_INPUT')
+
+
+class StageRegression(namedtuple('StageRegression',
+                                 'jobname stage number duration baseline')):
+    """
+    A stage of a build that took much longer than its baseline, the median
+    duration of the same stage in the previous builds (milliseconds).
+    """
+    __slots__ = ()
+
+    @property
+    def ratio(self):
+        return self.duration / self.baseline if self.baseline else None
+
+
+def _status_code(status):
+    return STATUSES.index(status) if status in STATUSES else len(STATUSES) - 1
+
+
+def _json(response):
+    with profiling.phase('parse'):
+        return json.loads(response.text)
+
+
+class StageHistory(object):
+    """
+    Columnar store of stage timings for many builds of many jobs.
+
+    Every column is an :class:`array.array` with one entry per stage run:
+    ``job`` (index into :attr:`jobs`), ``number``, ``stage`` (index into
+    :attr:`stages`), ``duration`` in milliseconds and ``status`` (index
+    into :data:`STATUSES`).
+    """
+
+    def __init__(self):
+        self.jobs = []
+        self.stages = []
+        self._job_index = {}
+        self._stage_index = {}
+        self.job = array('l')
+        self.number = array('l')
+        self.stage = array('l')
+        self.duration = array('d')
+        self.status = array('b')
+
+    def __len__(self):
+        return len(self.number)
+
+    @staticmethod
+    def _intern(names, index, value):
+        if value not in index:
+            index[value] = len(names)
+            names.append(value)
+        return index[value]
+
+    def add(self, jobname, run):
+        """
+        Append the stages of a completed run, as returned by ``wfapi``.
+        Runs still in progress and stages not executed are skipped.
+        """
+        if run.get('status') in RUNNING:
+            return False
+        job = self._intern(self.jobs, self._job_index, jobname)
+        number = int(run['id'])
+        for stage in run.get('stages') or []:
+            if stage.get('status') in RUNNING + ('NOT_EXECUTED',):
+                continue
+            self.job.append(job)
+            self.number.append(number)
+            self.stage.append(self._intern(self.stages, self._stage_index,
+                                           stage['name']))
+            self.duration.append(stage.get('durationMillis') or 0)
+            self.status.append(_status_code(stage.get('status')))
+        return True
+
+    def series(self):
+        """
+        Return a dict of ``(jobname, stage)`` to the list of
+        ``(number, duration)`` of successful runs of that stage, in build
+        order.
+        """
+        success = STATUSES.index('SUCCESS')
+        series = {}
+        for i in range(len(self.number)):
+            if self.status[i] != success:
+                continue
+            key = (self.jobs[self.job[i]], self.stages[self.stage[i]])
+            series.setdefault(key, []).append(
+                (self.number[i], self.duration[i]))
+        for values in series.values():
+            values.sort()
+        return series
+
+
+def fetch_runs(jenkins, jobname, since=None):
+    """
+    Return the ``wfapi`` runs of a job, newest first, optionally only those
+    after build number ``since``.
+    """
+    params = {'fullStages': 'true'}
+    if since is not None:
+        params['since'] = '#{0}'.format(since)
+    return _json(jenkins._build_get(RUNS, jobname, params=params))
+
+
+def describe_build(jenkins, jobname, number):
+    """
+    Return the ``wfapi`` description of one build.
+    """
+    return _json(jenkins._build_get(DESCRIBE, jobname, number))
+
+
+def last_builds(jenkins):
+    """
+    Return a dict of job name to last build number, in one request.
+    """
+    response = jenkins._build_get(LIST, params={'tree': LAST_BUILDS_TREE})
+    return dict((job['name'], job['lastBuild']['number'])
+                for job in parse(response).get('jobs', [])
+                if job.get('lastBuild'))
+
+
+def fetch_stage_history(jenkins, jobnames, limit=100,
+                        workers=DEFAULT_WORKERS):
+    """
+    Fetch the stage timings of the last ``limit`` builds of Pipeline jobs
+    into a :class:`StageHistory`.
+
+    Jobs that have no build or are not Pipelines (``wfapi`` answers 404),
+    and builds deleted meanwhile, are skipped; any other error is raised.
+    """
+    last = last_builds(jenkins)
+    ranges = dict((jobname, (max(1, last[jobname] - limit + 1),
+                             last[jobname]))
+                  for jobname in jobnames if jobname in last)
+    history = StageHistory()
+    missing = []
+
+    def runs(jobname):
+        return fetch_runs(jenkins, jobname, ranges[jobname][0] - 1)
+
+    for jobname, result, error in imap_unordered(runs, sorted(ranges),
+                                                 workers):
+        if isinstance(error, HttpNotFoundError):
+            continue
+        elif error is not None:
+            raise error
+        first, last_number = ranges[jobname]
+        seen = set()
+        for run in reversed(result):
+            if first <= int(run['id']) <= last_number:
+                seen.add(int(run['id']))
+                history.add(jobname, run)
+        missing.extend((jobname, number)
+                       for number in range(first, last_number + 1)
+                       if number not in seen)
+
+    described = imap_unordered(lambda build: describe_build(jenkins, *build),
+                               missing, workers)
+    for (jobname, _), run, error in described:
+        if error is None:
+            history.add(jobname, run)
+        elif not isinstance(error, HttpNotFoundError):
+            raise error
+    return history
+
+
+def regressions(history, window=10, threshold=0.5, min_delta=5000):
+    """
+    Find stage runs that regressed against a rolling baseline.
+
+    The baseline of a run is the median duration of the same stage in the
+    ``window`` previous successful runs. A run regressed when it took more
+    than ``threshold`` (a fraction) and ``min_delta`` milliseconds longer
+    than its baseline.
+
+    :returns: a list of :class:`StageRegression`, sorted by job, stage and
+        build number
+    """
+    found = []
+    for (jobname, stage), runs in sorted(history.series().items()):
+        durations = [duration for _, duration in runs]
+        for i in range(window, len(runs)):
+            baseline = percentile(durations[i - window:i], 50)
+            number, duration = runs[i]
+            if (duration > baseline * (1 + threshold) and
+                    duration - baseline > min_delta):
+                found.append(StageRegression(jobname, stage, number,
+                                             duration, baseline))
+    return found
+
+
+def summarize_stages(history):
+    """
+    Return a dict of ``(jobname, stage)`` to the number of successful runs,
+    the median and 95th percentile durations and the last duration.
+    """
+    summary = {}
+    for key, runs in history.series().items():
+        durations = [duration for _, duration in runs]
+        summary[key] = {
+            'runs': len(durations),
+            'duration_p50': percentile(durations, 50),
+            'duration_p95': percentile(durations, 95),
+            'last': durations[-1],
+        }
+    return summary
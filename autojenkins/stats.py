@@ -0,0 +1,274 @@
+"""
+Build duration and result analytics over job history.
+
+History is fetched with minimal ``tree=`` queries and kept in columnar
+arrays, one entry per build. When ``numpy`` is installed, statistics are
+computed with vectorized operations on those arrays, and builds are
+selected with index arrays and masks; otherwise a pure Python fallback
+gives the same results.
+"""
+from array import array
+
+from autojenkins.jobs import JOBINFO, LIST, parse
+from autojenkins.parallel import DEFAULT_WORKERS, imap_unordered
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+BUILD_FIELDS = ('number,duration,result,timestamp,'
+                'actions[queuingDurationMillis]')
+RESULTS = ('SUCCESS', 'UNSTABLE', 'FAILURE', 'ABORTED', 'NOT_BUILT', None)
+FAILED = ('FAILURE',)
+MS_PER_DAY = 24 * 3600 * 1000.0
+NAN = float('nan')
+#: Builds in the moving average of durations
+WINDOW = 10
+
+
+def _queue_wait(build):
+    for action in build.get('actions') or []:
+        if action and 'queuingDurationMillis' in action:
+            return float(action['queuingDurationMillis'])
+    return NAN
+
+
+def _result_code(result):
+    return RESULTS.index(result) if result in RESULTS else len(RESULTS) - 1
+
+
+class History(object):
+    """
+    Columnar store of build history for many jobs.
+
+    Every column is an :class:`array.array` with one entry per build:
+    ``job`` (index into :attr:`jobs`), ``number``, ``timestamp``,
+    ``duration`` and ``queue_wait`` (milliseconds, NaN when unknown) and
+    ``result`` (index into :data:`RESULTS`). Running builds are skipped.
+    """
+
+    def __init__(self):
+        self.jobs = []
+        self._job_index = {}
+        self.job = array('l')
+        self.number = array('l')
+        self.timestamp = array('d')
+        self.duration = array('d')
+        self.queue_wait = array('d')
+        self.result = array('b')
+
+    def __len__(self):
+        return len(self.number)
+
+    def add(self, jobname, builds):
+        """
+        Append the builds of a job, as returned by the remote API.
+        """
+        if jobname not in self._job_index:
+            self._job_index[jobname] = len(self.jobs)
+            self.jobs.append(jobname)
+        index = self._job_index[jobname]
+        for build in builds:
+            if build.get('building') or build.get('result') is None:
+                continue
+            self.job.append(index)
+            self.number.append(build['number'])
+            self.timestamp.append(build['timestamp'])
+            self.duration.append(build['duration'])
+            self.queue_wait.append(_queue_wait(build))
+            self.result.append(_result_code(build['result']))
+
+    def groups(self):
+        """
+        Return a dict of job name to the positions of its builds, as index
+        arrays when ``numpy`` is installed.
+        """
+        if numpy is not None:
+            job = numpy.asarray(self.job)
+            order = numpy.argsort(job, kind='stable')
+            counts = numpy.bincount(job, minlength=len(self.jobs))
+            groups = numpy.split(order, numpy.cumsum(counts)[:-1])
+            return dict(zip(self.jobs, groups))
+        positions = dict((index, []) for index in range(len(self.jobs)))
+        for position, index in enumerate(self.job):
+            positions[index].append(position)
+        return dict((self.jobs[index], group)
+                    for index, group in positions.items())
+
+    def column(self, name, positions=None):
+        """
+        Return a column, optionally restricted to some positions: a
+        ``numpy`` array when ``numpy`` is installed, an
+        :class:`array.array` otherwise.
+        """
+        values = getattr(self, name)
+        if numpy is not None:
+            values = numpy.asarray(values)
+            if positions is None:
+                return values
+            return values[numpy.asarray(positions, dtype=int)]
+        if positions is None:
+            return values
+        return array(values.typecode, (values[i] for i in positions))
+
+
+def _without_nan(values):
+    return [value for value in values if value == value]
+
+
+def percentile(values, q):
+    """
+    Return the ``q``-th percentile (0-100) with linear interpolation,
+    ignoring NaN values. Returns NaN for an empty input.
+    """
+    if numpy is not None:
+        data = numpy.asarray(values, dtype=float)
+        data = data[~numpy.isnan(data)]
+        return float(numpy.percentile(data, q)) if len(data) else NAN
+    data = sorted(_without_nan(values))
+    if not data:
+        return NAN
+    rank = (len(data) - 1) * q / 100.0
+    low = int(rank)
+    high = min(low + 1, len(data) - 1)
+    return data[low] + (data[high] - data[low]) * (rank - low)
+
+
+def moving_average(values, window):
+    """
+    Return the moving averages of ``values`` over ``window`` entries.
+    """
+    if len(values) < window:
+        return []
+    if numpy is not None:
+        cumsum = numpy.cumsum(numpy.insert(numpy.asarray(values, float),
+                                           0, 0.0))
+        return list((cumsum[window:] - cumsum[:-window]) / window)
+    averages = []
+    total = sum(values[:window])
+    averages.append(total / float(window))
+    for i in range(window, len(values)):
+        total += values[i] - values[i - window]
+        averages.append(total / float(window))
+    return averages
+
+
+def slope(xs, ys):
+    """
+    Return the least-squares slope of ``ys`` over ``xs``, ignoring pairs
+    where ``y`` is NaN. Returns NaN if it cannot be computed.
+    """
+    if numpy is not None:
+        x = numpy.asarray(xs, dtype=float)
+        y = numpy.asarray(ys, dtype=float)
+        known = ~numpy.isnan(y)
+        x, y = x[known], y[known]
+        if len(y) < 2:
+            return NAN
+        x = x - x.mean()
+        denominator = (x * x).sum()
+        return float((x * (y - y.mean())).sum() / denominator) \
+            if denominator else NAN
+    pairs = [(x, y) for x, y in zip(xs, ys) if y == y]
+    if len(pairs) < 2:
+        return NAN
+    mean_x = sum(x for x, _ in pairs) / float(len(pairs))
+    mean_y = sum(y for _, y in pairs) / float(len(pairs))
+    denominator = sum((x - mean_x) ** 2 for x, _ in pairs)
+    if not denominator:
+        return NAN
+    return sum((x - mean_x) * (y - mean_y) for x, y in pairs) / denominator
+
+
+def failure_rate(results):
+    """
+    Return the fraction of failed builds among result codes.
+    """
+    if not len(results):
+        return NAN
+    failed = [RESULTS.index(result) for result in FAILED]
+    if numpy is not None:
+        return float(numpy.isin(results, failed).mean())
+    return sum(1 for code in results if code in failed) / float(len(results))
+
+
+def _chronological(timestamp, values):
+    """
+    Return ``values`` ordered by their ``timestamp``.
+    """
+    if numpy is not None:
+        return values[numpy.argsort(timestamp, kind='stable')]
+    return [value for _, value in sorted(zip(timestamp, values),
+                                         key=lambda pair: pair[0])]
+
+
+def summarize(history, positions=None, window=WINDOW):
+    """
+    Summarize the builds at ``positions``, or all builds in ``history``.
+
+    Durations and queue waits are in milliseconds; trends are the change
+    in duration and queue wait per day. ``duration_average`` holds the
+    moving averages of durations over ``window`` builds (or all of them if
+    there are fewer), oldest first.
+    """
+    timestamp = history.column('timestamp', positions)
+    duration = history.column('duration', positions)
+    queue_wait = history.column('queue_wait', positions)
+    if numpy is not None:
+        days = timestamp / MS_PER_DAY
+    else:
+        days = [t / MS_PER_DAY for t in timestamp]
+    averages = moving_average(_chronological(timestamp, duration),
+                              min(window, len(duration)) or 1)
+    return {
+        'builds': len(duration),
+        'failure_rate': failure_rate(history.column('result', positions)),
+        'duration_p50': percentile(duration, 50),
+        'duration_p95': percentile(duration, 95),
+        'queue_p50': percentile(queue_wait, 50),
+        'queue_p95': percentile(queue_wait, 95),
+        'duration_trend': slope(days, duration),
+        'queue_trend': slope(days, queue_wait),
+        'duration_average': [float(average) for average in averages],
+    }
+
+
+def summarize_jobs(history, window=WINDOW):
+    """
+    Return a dict of job name to :func:`summarize` of its builds.
+    """
+    return dict((jobname, summarize(history, positions, window))
+                for jobname, positions in history.groups().items())
+
+
+def _job_builds(jenkins, jobname, limit):
+    tree = 'builds[{0}]{{0,{1}}}'.format(BUILD_FIELDS, limit)
+    response = jenkins._build_get(JOBINFO, jobname, params={'tree': tree})
+    return parse(response).get('builds', [])
+
+
+def fetch_history(jenkins, jobnames=None, limit=100,
+                  workers=DEFAULT_WORKERS):
+    """
+    Fetch the last ``limit`` builds of several jobs into a :class:`History`.
+
+    Without ``jobnames``, the history of all jobs is read in one request.
+    Otherwise each job is read with its own request, concurrently.
+    """
+    history = History()
+    if jobnames is None:
+        tree = 'jobs[name,builds[{0}]{{0,{1}}}]'.format(BUILD_FIELDS, limit)
+        response = jenkins._build_get(LIST, params={'tree': tree})
+        for job in parse(response).get('jobs', []):
+            history.add(job['name'], job.get('builds') or [])
+        return history
+    results = imap_unordered(
+        lambda jobname: _job_builds(jenkins, jobname, limit),
+        jobnames, workers)
+    for jobname, builds, error in results:
+        if error is not None:
+            raise error
+        history.add(jobname, builds)
+    return history
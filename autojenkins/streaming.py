@@ -0,0 +1,239 @@
+"""
+Incremental parsing of large JSON API responses.
+
+The usual methods of :class:`autojenkins.jobs.Jenkins` read a whole
+response and parse it at once, so memory peaks at several times the size
+of the body. The functions here read the JSON remote API as it downloads
+and yield the items of one array at a time, such as the jobs of the
+server, the builds of a job or the cases of a test report, keeping only
+the item being parsed in memory::
+
+    for case in iter_test_cases(jenkins, 'myjob'):
+        if case['status'] == 'FAILED':
+            print(case['className'], case['name'])
+
+Items are decoded with the C accelerated :mod:`json` decoder; the
+structure around them is walked one token at a time, and values that are
+not wanted are skipped without being built.
+"""
+import codecs
+import json
+import re
+
+
+JSON_API = 'api/json'
+LIST = '{0}/' + JSON_API
+JOBINFO = '{0}/job/{1}/' + JSON_API
+REPORT = '{0}/job/{1}/{2}/testReport/' + JSON_API
+
+#: Size of the chunks read from the response, in bytes
+CHUNK_SIZE = 64 * 1024
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+NUMBER_CHARS = '0123456789.eE+-'
+DECODER = json.JSONDecoder()
+
+
+class StreamError(ValueError):
+    pass
+
+
+class _Reader(object):
+    """
+    JSON text decoded from chunks of bytes, consumed from :attr:`pos`.
+
+    The consumed part of the buffer is dropped as more text is read, so
+    only the value being decoded is held in memory.
+    """
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = u''
+        self.pos = 0
+        self.eof = False
+
+    def _read(self):
+        """
+        Append the next chunk of text; return ``False`` at the end.
+        """
+        if self.eof:
+            return False
+        text = u''
+        for chunk in self._chunks:
+            text = self._decoder.decode(chunk)
+            if text:
+                break
+        else:
+            self.eof = True
+            text = self._decoder.decode(b'', True)
+        self.buffer = self.buffer[self.pos:] + text
+        self.pos = 0
+        return bool(text)
+
+    def peek(self):
+        """
+        Return the next character that is not whitespace, without
+        consuming it, or ``None`` at the end.
+        """
+        while True:
+            self.pos = WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._read():
+                return None
+
+    def expect(self, chars):
+        char = self.peek()
+        if char is None or char not in chars:
+            raise StreamError('Expected one of {0!r} at {1!r}'.format(
+                chars, self.buffer[self.pos:self.pos + 20]))
+        self.pos += 1
+        return char
+
+    def value(self):
+        """
+        Decode and consume the next value.
+        """
+        if self.peek() is None:
+            raise StreamError('Unexpected end of document')
+        while True:
+            try:
+                value, end = DECODER.raw_decode(self.buffer, self.pos)
+            except ValueError as error:
+                if not self._read():
+                    raise StreamError(str(error))
+                continue
+            # A number cut by the end of the buffer may continue in the
+            # next chunk
+            if (end == len(self.buffer) or
+                    self.buffer[end] in NUMBER_CHARS) and self._read():
+                continue
+            self.pos = end
+            return value
+
+    def skip(self):
+        """
+        Consume the next value without building containers.
+        """
+        char = self.peek()
+        if char == '[':
+            for _ in self.elements():
+                self.skip()
+        elif char == '{':
+            for _ in self.members():
+                self.skip()
+        else:
+            self.value()
+
+    def elements(self):
+        """
+        Consume an array, yielding before each element, which the caller
+        must consume.
+        """
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield
+            if self.expect(',]') == ']':
+                return
+
+    def members(self):
+        """
+        Consume an object, yielding each key before its value, which the
+        caller must consume.
+        """
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(':')
+            yield key
+            if self.expect(',}') == '}':
+                return
+
+
+def _walk(reader, path):
+    char = reader.peek()
+    if char == '[':
+        for _ in reader.elements():
+            if path:
+                for item in _walk(reader, path):
+                    yield item
+            else:
+                yield reader.value()
+    elif char == '{' and path:
+        for key in reader.members():
+            if key == path[0]:
+                for item in _walk(reader, path[1:]):
+                    yield item
+            else:
+                reader.skip()
+    else:
+        reader.skip()
+
+
+def iter_json(chunks, path):
+    """
+    Yield the items of the arrays at ``path`` in a JSON document read from
+    ``chunks`` of bytes.
+
+    ``path`` is a sequence of keys; arrays met along the way are walked
+    element by element, so ``('suites', 'cases')`` yields the cases of all
+    suites of a test report.
+    """
+    reader = _Reader(chunks)
+    for item in _walk(reader, tuple(path)):
+        yield item
+    if reader.peek() is not None:
+        raise StreamError('Unexpected data after the document')
+
+
+def stream(jenkins, url_pattern, *args, **kwargs):
+    """
+    GET a JSON API URL and yield the items at ``path`` as they download.
+
+    :param path: keyword argument, see :func:`iter_json`
+    :param params: keyword argument, query parameters such as ``tree``
+    """
+    path = kwargs.pop('path')
+    response = jenkins._build_get(url_pattern, *args, stream=True, **kwargs)
+    try:
+        for item in iter_json(response.iter_content(CHUNK_SIZE), path):
+            yield item
+    finally:
+        response.close()
+
+
+def iter_all_jobs(jenkins, include_colorless=False):
+    """
+    Yield the ``(name, color)`` of the jobs of the server, like
+    :meth:`autojenkins.jobs.Jenkins.all_jobs`.
+    """
+    for job in stream(jenkins, LIST, path=('jobs',),
+                      params={'tree': 'jobs[name,color]'}):
+        if 'color' in job or include_colorless:
+            yield job['name'], job.get('color')
+
+
+def iter_builds(jenkins, jobname, tree='number,result,duration,timestamp'):
+    """
+    Yield the builds of a job, newest first, with the fields in ``tree``.
+    """
+    return stream(jenkins, JOBINFO, jobname, path=('builds',),
+                  params={'tree': 'builds[{0}]'.format(tree)})
+
+
+def iter_test_cases(jenkins, jobname, build_number='lastBuild',
+                    tree='className,name,duration,status'):
+    """
+    Yield the cases of the test report of a build, with the fields in
+    ``tree``.
+    """
+    return stream(jenkins, REPORT, jobname, build_number,
+                  path=('suites', 'cases'),
+                  params={'tree': 'suites[cases[{0}]]'.format(tree)})
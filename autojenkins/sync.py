@@ -0,0 +1,123 @@
+"""
+Keep a local copy of the state of all jobs, fetching only what changed.
+
+Each :meth:`JobSync.sync` cycle reads a summary of every job (name, color
+and last build number) in one ``tree=`` query, compares it with the local
+snapshot and fetches the last build of the jobs that changed only, by the
+number the summary gave, so that both describe the same build. The
+steady-state cost of a cycle is one request plus one per changed job::
+
+    sync = JobSync(jenkins)
+    sync.watch(print, interval=30)
+"""
+import time
+from collections import namedtuple
+
+from autojenkins.jobs import LIST, parse
+from autojenkins.parallel import DEFAULT_WORKERS, imap_unordered
+
+
+SUMMARY_TREE = 'jobs[name,color,lastBuild[number]]'
+
+ADDED = 'added'
+CHANGED = 'changed'
+REMOVED = 'removed'
+
+
+class JobState(namedtuple('JobState', 'name color last_build')):
+    """
+    Summary of a job: its color and the number of its last build, if any.
+    """
+    __slots__ = ()
+
+
+class JobChange(namedtuple('JobChange', 'kind name old new build')):
+    """
+    A job that appeared, changed or disappeared since the previous cycle.
+
+    ``old`` and ``new`` are :class:`JobState` (``None`` for added and
+    removed jobs respectively); ``build`` is the last build information of
+    added and changed jobs that have one.
+    """
+    __slots__ = ()
+
+
+def fetch_summary(jenkins):
+    """
+    Return a dict of job name to :class:`JobState`, in a single request.
+    """
+    response = jenkins._build_get(LIST, params={'tree': SUMMARY_TREE})
+    states = {}
+    for job in parse(response).get('jobs', []):
+        last_build = (job.get('lastBuild') or {}).get('number')
+        states[job['name']] = JobState(job['name'], job.get('color'),
+                                       last_build)
+    return states
+
+
+class JobSync(object):
+    """
+    Local snapshot of job states and last builds, updated incrementally.
+
+    ``jobs`` maps job names to :class:`JobState` and ``builds`` maps them
+    to the information of their last build.
+    """
+
+    def __init__(self, jenkins, workers=DEFAULT_WORKERS):
+        self.jenkins = jenkins
+        self.workers = workers
+        self.jobs = {}
+        self.builds = {}
+
+    def sync(self):
+        """
+        Bring the snapshot up to date.
+
+        A job whose last build could not be fetched keeps its previous
+        state, so that it is fetched again at the next cycle.
+
+        :returns: a list of :class:`JobChange`, sorted by job name
+        """
+        current = fetch_summary(self.jenkins)
+        changes = []
+        for name in set(self.jobs) - set(current):
+            changes.append(JobChange(REMOVED, name, self.jobs.pop(name),
+                                     None, None))
+            self.builds.pop(name, None)
+
+        changed = [state for name, state in current.items()
+                   if self.jobs.get(name) != state]
+        without_builds = [state for state in changed
+                          if state.last_build is None]
+        with_builds = [state for state in changed
+                       if state.last_build is not None]
+        fetched = [(state, None, None) for state in without_builds]
+        fetched.extend(imap_unordered(
+            lambda state: self.jenkins.build_info(state.name,
+                                                  state.last_build),
+            with_builds, self.workers))
+        for state, build, error in fetched:
+            if error is not None:
+                continue
+            old = self.jobs.get(state.name)
+            self.jobs[state.name] = state
+            if build is None:
+                self.builds.pop(state.name, None)
+            else:
+                self.builds[state.name] = build
+            changes.append(JobChange(ADDED if old is None else CHANGED,
+                                     state.name, old, state, build))
+        return sorted(changes, key=lambda change: change.name)
+
+    def watch(self, callback, interval=30, cycles=None):
+        """
+        Call ``callback`` with every :class:`JobChange`, syncing every
+        ``interval`` seconds, forever or for ``cycles`` cycles.
+        """
+        count = 0
+        while cycles is None or count < cycles:
+            if count:
+                time.sleep(interval)
+            for change in self.sync():
+                callback(change)
+            count += 1
@@ -0,0 +1,228 @@
+"""
+Track jobs rendered from template jobs, and regenerate them incrementally.
+
+A :class:`TemplateRegistry` remembers, for every job created from a
+template job, the template, the context it was rendered with, and the
+SHA-256 of both the template ``config.xml`` and the rendered result. It is
+kept in a JSON file::
+
+    {"format": 1, "root": "<server URL>",
+     "jobs": {"<name>": {"template": "...", "context": {...},
+                         "template_sha256": "...", "sha256": "..."}}}
+
+:meth:`TemplateRegistry.regenerate` then reads each template once, and only
+for templates whose configuration changed, renders their jobs again and
+pushes those whose rendered configuration changed, concurrently::
+
+    registry = TemplateRegistry('templates.json', jenkins)
+    registry.create_copy('app-deploy', 'deploy-template', app='app')
+    ...
+    registry.regenerate()
+"""
+import json
+import os
+import time
+from collections import namedtuple
+
+from autojenkins.archive import UNCHANGED, UPDATED, config_hash
+from autojenkins.jobs import (HttpNotFoundError, JobExists, JobInexistent,
+                              render_copy)
+from autojenkins.parallel import DEFAULT_WORKERS, imap_unordered
+
+
+FORMAT_VERSION = 1
+
+
+class TemplateRegistryError(Exception):
+    pass
+
+
+class DerivedJob(namedtuple('DerivedJob', 'name template context enable '
+                                          'template_sha256 sha256')):
+    """
+    A job rendered from ``template`` with ``context``, and the hashes of
+    the template and rendered configurations when it was last pushed.
+    """
+    __slots__ = ()
+
+
+class TemplateRegistry(object):
+    """
+    Registry of the jobs derived from template jobs on one server.
+
+    :param path: JSON file, created on the first change
+    :param jenkins: the :class:`autojenkins.jobs.Jenkins` the jobs live on
+    """
+
+    def __init__(self, path, jenkins):
+        self.path = path
+        self.jenkins = jenkins
+        self.jobs = {}
+        if os.path.exists(path):
+            self._load()
+
+    def _load(self):
+        with open(self.path) as registry:
+            data = json.load(registry)
+        if data.get('format') != FORMAT_VERSION:
+            raise TemplateRegistryError(
+                'Unsupported registry format: {0}'.format(data.get('format')))
+        if data.get('root') != self.jenkins.ROOT:
+            raise TemplateRegistryError(
+                "Registry '{0}' belongs to {1}, not {2}".format(
+                    self.path, data.get('root'), self.jenkins.ROOT))
+        self.jobs = dict((name, DerivedJob(name=name, **job))
+                         for name, job in data['jobs'].items())
+
+    def save(self):
+        """
+        Write the registry, replacing the file atomically.
+        """
+        jobs = dict((name, dict(job._asdict()))
+                    for name, job in self.jobs.items())
+        for job in jobs.values():
+            del job['name']
+        data = {'format': FORMAT_VERSION, 'root': self.jenkins.ROOT,
+                'jobs': jobs}
+        partial = self.path + '.tmp'
+        with open(partial, 'w') as registry:
+            json.dump(data, registry, indent=2, sort_keys=True)
+        os.rename(partial, self.path)
+
+    def derived(self, template=None):
+        """
+        Return the tracked jobs, sorted by name, optionally only those of
+        one template.
+        """
+        return sorted((job for job in self.jobs.values()
+                       if template is None or job.template == template),
+                      key=lambda job: job.name)
+
+    def track(self, jobname, template_job, enable=True, **context):
+        """
+        Start tracking an existing job as rendered from ``template_job``
+        with ``context``; it is pushed at the next :meth:`regenerate`.
+        """
+        self.jobs[jobname] = DerivedJob(jobname, template_job, context,
+                                        enable, None, None)
+        self.save()
+
+    def forget(self, jobname):
+        """
+        Stop tracking a job.
+        """
+        self.jobs.pop(jobname, None)
+        self.save()
+
+    def create_copy(self, jobname, template_job, enable=True, force=False,
+                    **context):
+        """
+        Create (or with ``force``, replace) a job from a template job like
+        :meth:`autojenkins.jobs.Jenkins.create_copy`, and track it.
+        """
+        try:
+            template = self.jenkins.get_config_xml(template_job)
+        except HttpNotFoundError:
+            raise JobInexistent("Template job '%s' doesn't exists"
+                                % template_job)
+        exists = self.jenkins.job_exists(jobname)
+        if exists and not force:
+            raise JobExists("Another job with the name '%s'already exists"
+                            % jobname)
+        config = render_copy(template, context, enable)
+        if exists:
+            response = self.jenkins.set_config_xml(jobname, config)
+        else:
+            response = self.jenkins.create_from_xml(jobname, config)
+        self.jobs[jobname] = DerivedJob(jobname, template_job, context,
+                                        enable, config_hash(template),
+                                        config_hash(config))
+        self.save()
+        return response
+
+    def _changed_templates(self, force, workers):
+        """
+        Return a dict of template name to its current ``config.xml``, for
+        the templates that changed (all of them, if ``force``), and a dict
+        of template name to the error raised while reading it.
+        """
+        known = {}
+        for job in self.jobs.values():
+            known.setdefault(job.template, set()).add(job.template_sha256)
+        changed, errors = {}, {}
+        for template, config, error in imap_unordered(
+                self.jenkins.get_config_xml, sorted(known), workers):
+            if error is not None:
+                errors[template] = error
+            elif force or known[template] != set([config_hash(config)]):
+                changed[template] = config
+        return changed, errors
+
+    def regenerate(self, workers=DEFAULT_WORKERS, force=False,
+                   dry_run=False):
+        """
+        Render again the jobs of the templates that changed, and push those
+        whose rendered configuration changed.
+
+        :param force: render the jobs of all templates, changed or not
+        :param dry_run: only report which jobs would be pushed
+        :returns: a dict of job name to ``'updated'``, ``'unchanged'`` or
+            the exception raised while regenerating it; jobs of templates
+            that did not change are left out
+        """
+        changed, errors = self._changed_templates(force, workers)
+        outcome = dict((job.name, errors[job.template])
+                       for job in self.jobs.values()
+                       if job.template in errors)
+        to_push = []
+        for job in self.derived():
+            if job.template not in changed:
+                continue
+            template = changed[job.template]
+            try:
+                config = render_copy(template, job.context, job.enable)
+            except Exception as error:
+                outcome[job.name] = error
+                continue
+            rendered = job._replace(template_sha256=config_hash(template),
+                                    sha256=config_hash(config))
+            if rendered.sha256 == job.sha256:
+                outcome[job.name] = UNCHANGED
+                if not dry_run:
+                    self.jobs[job.name] = rendered
+            else:
+                to_push.append((rendered, config))
+
+        if dry_run:
+            outcome.update((job.name, UPDATED) for job, _ in to_push)
+            return outcome
+
+        def push(job):
+            rendered, config = job
+            self.jenkins.set_config_xml(rendered.name, config)
+
+        for (rendered, _), _, error in imap_unordered(push, to_push,
+                                                      workers):
+            if error is None:
+                self.jobs[rendered.name] = rendered
+                outcome[rendered.name] = UPDATED
+            else:
+                outcome[rendered.name] = error
+        if outcome:
+            self.save()
+        return outcome
+
+    def watch(self, callback=None, interval=60, cycles=None, **options):
+        """
+        Call :meth:`regenerate` every ``interval`` seconds, forever or for
+        ``cycles`` cycles, passing its result to ``callback`` when jobs were
+        regenerated.
+        """
+        count = 0
+        while cycles is None or count < cycles:
+            if count:
+                time.sleep(interval)
+            outcome = self.regenerate(**options)
+            if outcome and callback is not None:
+                callback(outcome)
+            count += 1
@@ -0,0 +1,80 @@
+"""
+A local HTTP server standing in for Jenkins in tests.
+"""
+import threading
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:  # Python 2
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def _respond(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        server = self.server.fake
+        with server.lock:
+            server.requests.append((self.command, self.path, body))
+            server.clients.add(self.client_address)
+        status, headers, content = server.handle(self.command, self.path,
+                                                 body)
+        if not isinstance(content, bytes):
+            content = content.encode('utf-8')
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    do_GET = do_POST = _respond
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeJenkinsServer(object):
+    """
+    Serve canned responses from ``routes``, a dict of ``(method, path)``
+    to ``(status, headers, body)`` or to a callable returning that tuple.
+
+    Use as a context manager; :attr:`url` is the root URL to connect to.
+    :attr:`clients` holds the address of every connection served.
+    """
+
+    def __init__(self, routes=None):
+        self.routes = routes or {}
+        self.requests = []
+        self.clients = set()
+        self.lock = threading.Lock()
+
+    def handle(self, method, path, body):
+        route = self.routes.get((method, path))
+        if route is None:
+            return 404, {}, 'Not found'
+        return route(body) if callable(route) else route
+
+    def __enter__(self):
+        self._server = _ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self._server.fake = self
+        self.url = 'http://127.0.0.1:{0}'.format(
+            self._server.server_address[1])
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
@@ -0,0 +1,103 @@
+import shutil
+import tarfile
+import tempfile
+from os import path
+from unittest import TestCase
+
+from mock import Mock
+
+from autojenkins import archive
+from autojenkins.jobs import HttpNotFoundError
+
+
+CONFIGS = {
+    'job1': '<project>1</project>',
+    'job2': '<project>2</project>',
+    'job3': '<project>3</project>',
+}
+
+
+def fake_jenkins(configs):
+    jenkins = Mock()
+    jenkins.all_jobs.return_value = [(name, 'blue') for name in configs]
+    jenkins.get_config_xml.side_effect = lambda name: configs[name]
+    return jenkins
+
+
+class TestArchive(TestCase):
+
+    def setUp(self):
+        super(TestArchive, self).setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = path.join(self.tmpdir, 'jobs.tar.gz')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+        super(TestArchive, self).tearDown()
+
+    def test_export_writes_configs_and_manifest(self):
+        manifest = archive.export_jobs(fake_jenkins(CONFIGS), self.path, 2)
+        self.assertEqual(sorted(CONFIGS), sorted(manifest))
+        with tarfile.open(self.path, 'r:gz') as tar:
+            self.assertEqual(manifest, archive.read_manifest(tar))
+            member = tar.extractfile('jobs/job2/config.xml')
+            self.assertEqual(b'<project>2</project>', member.read())
+        self.assertEqual(archive.config_hash(CONFIGS['job1']),
+                         manifest['job1']['sha256'])
+
+    def test_export_skips_deleted_jobs(self):
+        jenkins = fake_jenkins(CONFIGS)
+
+        def get_config_xml(name):
+            if name == 'job2':
+                raise HttpNotFoundError('HTTP Status: 404')
+            return CONFIGS[name]
+        jenkins.get_config_xml.side_effect = get_config_xml
+        manifest = archive.export_jobs(jenkins, self.path)
+        self.assertEqual(['job1', 'job3'], sorted(manifest))
+
+    def test_failed_export_keeps_previous_archive(self):
+        archive.export_jobs(fake_jenkins(CONFIGS), self.path)
+        jenkins = fake_jenkins(CONFIGS)
+        jenkins.get_config_xml.side_effect = ValueError('boom')
+        with self.assertRaises(ValueError):
+            archive.export_jobs(jenkins, self.path)
+        with tarfile.open(self.path, 'r:gz') as tar:
+            self.assertEqual(sorted(CONFIGS),
+                             sorted(archive.read_manifest(tar)))
+        self.assertFalse(path.exists(self.path + '.tmp'))
+
+    def test_import_creates_updates_and_skips(self):
+        archive.export_jobs(fake_jenkins(CONFIGS), self.path)
+        remote = {'job1': CONFIGS['job1'], 'job2': '<project>old</project>'}
+        jenkins = fake_jenkins(remote)
+        outcome = archive.import_jobs(jenkins, self.path, 2)
+        self.assertEqual({'job1': archive.UNCHANGED,
+                          'job2': archive.UPDATED,
+                          'job3': archive.CREATED}, outcome)
+        jenkins.set_config_xml.assert_called_once_with(
+            'job2', CONFIGS['job2'])
+        jenkins.create_from_xml.assert_called_once_with(
+            'job3', CONFIGS['job3'])
+
+    def test_import_reports_failures_per_job(self):
+        archive.export_jobs(fake_jenkins(CONFIGS), self.path)
+        jenkins = fake_jenkins({})
+        error = ValueError('boom')
+        jenkins.create_from_xml.side_effect = [None, error, None]
+        outcome = archive.import_jobs(jenkins, self.path, 1)
+        self.assertEqual(1, sum(1 for status in outcome.values()
+                                if status is error))
+
+    def test_import_rejects_corrupted_archive(self):
+        archive.export_jobs(fake_jenkins(CONFIGS), self.path)
+        tampered = path.join(self.tmpdir, 'tampered.tar.gz')
+        with tarfile.open(self.path, 'r:gz') as src:
+            with tarfile.open(tampered, 'w:gz') as dst:
+                for member in src:
+                    data = src.extractfile(member).read()
+                    if member.name == 'jobs/job1/config.xml':
+                        data = b'<project>X</project>'
+                    archive._add_member(dst, member.name, data)
+        with self.assertRaises(archive.ArchiveError):
+            archive.import_jobs(fake_jenkins({}), tampered)
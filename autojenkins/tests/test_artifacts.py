@@ -0,0 +1,164 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from mock import Mock
+
+from autojenkins import artifacts
+from autojenkins.artifacts import Artifact
+
+
+CONTENT = bytes(bytearray(range(256))) * 40
+
+
+class FakeServer(object):
+    """
+    Serve ``CONTENT``, honouring (or ignoring) Range headers, or only those
+    starting before ``ranges_until``.
+    """
+
+    def __init__(self, ranges=True, fail_at=None, content=CONTENT,
+                 ranges_until=None):
+        self.ranges = ranges
+        self.ranges_until = ranges_until
+        self.fail_at = fail_at
+        self.content = content
+        self.requested = []
+
+    def get(self, url, stream=False, headers=None):
+        response = Mock(status_code=200, headers={})
+        body = self.content
+        if headers is None:
+            self.requested.append(None)
+            response.iter_content.side_effect = lambda size: [body]
+            return response
+        start, end = map(int, headers['Range'][6:].split('-'))
+        self.requested.append(start)
+        if start == self.fail_at:
+            raise IOError('connection reset')
+        ranges = self.ranges and (self.ranges_until is None or
+                                  start < self.ranges_until)
+        if ranges and start >= len(body):
+            response.status_code = 416
+        elif ranges:
+            end = min(end, len(body) - 1)
+            body = body[start:end + 1]
+            response.status_code = 206
+            response.headers['Content-Range'] = 'bytes {0}-{1}/{2}'.format(
+                start, end, len(self.content))
+        response.iter_content.side_effect = lambda size: [
+            body[i:i + size] for i in range(0, len(body), size)]
+        return response
+
+
+def fake_jenkins(server):
+    jenkins = Mock()
+    jenkins._http_get.side_effect = server.get
+    jenkins._request.side_effect = lambda method, url, **kwargs: server.get(
+        url, **kwargs)
+    return jenkins
+
+
+class TestArtifacts(TestCase):
+
+    def setUp(self):
+        super(TestArtifacts, self).setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'file.bin')
+        self.artifact = Artifact('file.bin', 'dist/file.bin',
+                                 'http://j/job/x/1/artifact/dist/file.bin',
+                                 hashlib.md5(CONTENT).hexdigest())
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+        super(TestArtifacts, self).tearDown()
+
+    def read(self):
+        with open(self.path, 'rb') as fileobj:
+            return fileobj.read()
+
+    def test_list_artifacts(self):
+        jenkins = Mock()
+        jenkins._build_get.return_value = Mock(text=str({
+            'url': 'http://j/job/x/3/',
+            'artifacts': [{'fileName': 'a b.txt',
+                           'relativePath': 'out/a b.txt'}],
+            'fingerprint': [{'fileName': 'a b.txt', 'hash': 'abc'}]}))
+        result = artifacts.list_artifacts(jenkins, 'x', 3)
+        self.assertEqual(
+            [Artifact('a b.txt', 'out/a b.txt',
+                      'http://j/job/x/3/artifact/out/a%20b.txt', 'abc')],
+            result)
+
+    def test_list_artifacts_with_the_same_file_name(self):
+        jenkins = Mock()
+        jenkins._build_get.return_value = Mock(text=str({
+            'url': 'http://j/job/x/3/',
+            'artifacts': [
+                {'fileName': 'app.tgz', 'relativePath': 'linux/app.tgz'},
+                {'fileName': 'app.tgz', 'relativePath': 'mac/app.tgz'},
+                {'fileName': 'notes', 'relativePath': 'notes'}],
+            'fingerprint': [{'fileName': 'app.tgz', 'hash': 'abc'},
+                            {'fileName': 'app.tgz', 'hash': 'def'},
+                            {'fileName': 'notes', 'hash': '123'}]}))
+        self.assertEqual([None, None, '123'],
+                         [artifact.md5 for artifact in
+                          artifacts.list_artifacts(jenkins, 'x', 3)])
+
+    def test_download_empty_file(self):
+        server = FakeServer(content=b'')
+        artifact = self.artifact._replace(md5=hashlib.md5(b'').hexdigest())
+        artifacts.download_artifact(fake_jenkins(server), artifact,
+                                    self.path, part_size=1000)
+        self.assertEqual(b'', self.read())
+        self.assertEqual([0, None], server.requested)
+
+    def test_download_in_parallel_ranges(self):
+        server = FakeServer()
+        artifacts.download_artifact(fake_jenkins(server), self.artifact,
+                                    self.path, workers=3, part_size=1000,
+                                    chunk_size=100)
+        self.assertEqual(CONTENT, self.read())
+        self.assertEqual(list(range(0, len(CONTENT), 1000)),
+                         sorted(server.requested))
+        self.assertEqual([], [name for name in os.listdir(self.tmpdir)
+                              if name.endswith('.json')])
+
+    def test_download_without_range_support(self):
+        server = FakeServer(ranges=False)
+        artifacts.download_artifact(fake_jenkins(server), self.artifact,
+                                    self.path, part_size=1000)
+        self.assertEqual(CONTENT, self.read())
+        self.assertEqual([0], server.requested)
+
+    def test_download_when_later_ranges_are_ignored(self):
+        server = FakeServer(ranges_until=1000)
+        artifact = self.artifact._replace(md5=None)
+        artifacts.download_artifact(fake_jenkins(server), artifact,
+                                    self.path, workers=3, part_size=1000)
+        self.assertEqual(CONTENT, self.read())
+        self.assertEqual(None, server.requested[-1])
+        self.assertEqual([], [name for name in os.listdir(self.tmpdir)
+                              if name.endswith('.json')])
+
+    def test_download_resumes_missing_ranges(self):
+        server = FakeServer(fail_at=5000)
+        with self.assertRaises(IOError):
+            artifacts.download_artifact(fake_jenkins(server), self.artifact,
+                                        self.path, workers=1,
+                                        part_size=1000)
+        server = FakeServer()
+        artifacts.download_artifact(fake_jenkins(server), self.artifact,
+                                    self.path, workers=1, part_size=1000)
+        self.assertEqual(CONTENT, self.read())
+        self.assertNotIn(0, server.requested)
+        self.assertIn(5000, server.requested)
+
+    def test_checksum_mismatch(self):
+        artifact = self.artifact._replace(md5='0' * 32)
+        with self.assertRaises(artifacts.ArtifactChecksumError):
+            artifacts.download_artifact(fake_jenkins(FakeServer()),
+                                        artifact, self.path, part_size=4096)
+        self.assertFalse(os.path.exists(self.path))
@@ -0,0 +1,120 @@
+from unittest import TestCase
+
+from mock import Mock, patch
+
+from autojenkins import batch
+from autojenkins.jobs import (BUILDINFO, JOBINFO, HttpNotFoundError,
+                              JobInexistent, JobNotBuildable)
+
+
+def mock_response(data, location=None):
+    response = Mock(status_code=201)
+    response.text = str(data)
+    response.headers = {'Location': location} if location else {}
+    return response
+
+
+class TestBuildMany(TestCase):
+
+    def setUp(self):
+        super(TestBuildMany, self).setUp()
+        self.jenkins = Mock()
+        self.listing = {'jobs': [{'name': 'a', 'buildable': True},
+                                 {'name': 'b', 'buildable': True},
+                                 {'name': 'off', 'buildable': False}]}
+        self.queue_ids = iter(range(100, 200))
+        self.jenkins._trigger.side_effect = lambda name, params: (
+            mock_response('', 'http://j/queue/item/%d/' %
+                          next(self.queue_ids)))
+
+    def test_trigger_many_checks_all_jobs_in_one_request(self):
+        self.jenkins._build_get.return_value = mock_response(self.listing)
+        outcomes = batch.trigger_many(self.jenkins,
+                                      ['a', 'nope', 'off', 'b'], 1)
+        self.assertEqual(1, self.jenkins._build_get.call_count)
+        self.assertEqual(['a', 'nope', 'off', 'b'],
+                         [outcome.jobname for outcome in outcomes])
+        self.assertEqual([100, None, None, 101],
+                         [outcome.queue_id for outcome in outcomes])
+        self.assertIsInstance(outcomes[1].error, JobInexistent)
+        self.assertIsInstance(outcomes[2].error, JobNotBuildable)
+        self.assertEqual(2, self.jenkins._trigger.call_count)
+
+    def test_trigger_many_with_parameter_sets(self):
+        self.jenkins._build_get.return_value = mock_response(self.listing)
+        outcomes = batch.trigger_many(self.jenkins,
+                                      [('a', {'x': 1}), ('a', {'x': 2})])
+        self.assertEqual([{'x': 1}, {'x': 2}],
+                         [outcome.params for outcome in outcomes])
+        self.assertEqual(2, self.jenkins._trigger.call_count)
+
+    @patch('autojenkins.batch.time')
+    def test_build_many_waits_for_all_builds(self, time):
+        running = {'builds': [
+            {'number': 8, 'queueId': 101, 'building': True, 'result': None},
+            {'number': 7, 'queueId': 100, 'building': False,
+             'result': 'SUCCESS'}]}
+        finished = {'builds': [
+            {'number': 8, 'queueId': 101, 'building': False,
+             'result': 'FAILURE'},
+            {'number': 7, 'queueId': 100, 'building': False,
+             'result': 'SUCCESS'}]}
+        self.jenkins._build_get.side_effect = [
+            mock_response(self.listing),
+            mock_response(running),
+            mock_response(finished)]
+        outcomes = batch.build_many(self.jenkins,
+                                    [('a', {'x': 1}), ('a', {'x': 2})],
+                                    wait=True)
+        self.assertEqual([(7, 'SUCCESS'), (8, 'FAILURE')],
+                         [(o.number, o.result) for o in outcomes])
+        self.assertEqual(1, time.sleep.call_count)
+        self.assertFalse(batch.succeeded(outcomes))
+        self.assertTrue(batch.succeeded(outcomes[:1]))
+
+
+class TestWaitForAll(TestCase):
+
+    def outcome(self, jobname, queue_id):
+        return batch.BuildOutcome(jobname, None, queue_id, None, None, None)
+
+    @patch('autojenkins.batch.time')
+    def test_cancelled_and_out_of_window_builds(self, time):
+        jenkins = Mock()
+        queue = {
+            1: [{'cancelled': True}],
+            2: [{'executable': None}, {'executable': {'number': 3}}],
+        }
+
+        def get(pattern, *args, **kwargs):
+            if pattern == JOBINFO:
+                return mock_response({'builds': []})
+            elif pattern == batch.QUEUE_ITEM_INFO:
+                return mock_response(queue[args[0]].pop(0))
+            self.assertEqual(BUILDINFO, pattern)
+            return mock_response({'number': 3, 'building': False,
+                                  'result': 'SUCCESS'})
+        jenkins._build_get.side_effect = get
+        outcomes = batch.wait_for_all(jenkins, [self.outcome('a', 1),
+                                                self.outcome('a', 2)])
+        self.assertIsInstance(outcomes[0].error, batch.BuildCancelled)
+        self.assertEqual((3, 'SUCCESS'),
+                         (outcomes[1].number, outcomes[1].result))
+        self.assertEqual(1, time.sleep.call_count)
+
+    def test_merged_queue_items_and_errors(self):
+        jenkins = Mock()
+        error = HttpNotFoundError('HTTP Status: 404')
+
+        def get(pattern, jobname, **kwargs):
+            if jobname == 'gone':
+                raise error
+            return mock_response({'builds': [
+                {'number': 4, 'queueId': 7, 'building': False,
+                 'result': 'SUCCESS'}]})
+        jenkins._build_get.side_effect = get
+        outcomes = batch.wait_for_all(jenkins, [self.outcome('a', 7),
+                                                self.outcome('a', 7),
+                                                self.outcome('gone', 8)])
+        self.assertEqual([4, 4, None], [o.number for o in outcomes])
+        self.assertIs(error, outcomes[2].error)
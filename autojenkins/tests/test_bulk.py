@@ -0,0 +1,88 @@
+from unittest import TestCase
+
+from mock import Mock
+
+from autojenkins.bulk import ToggleOutcome, select_jobs, set_enabled
+from autojenkins.jobs import AutojenkinsError, Jenkins, JobInexistent
+from autojenkins.tests.server import FakeJenkinsServer
+from autojenkins.transport import RequestsTransport
+
+
+JOBS = [('release-app', 'blue'), ('release-db', 'disabled'),
+        ('release-web', 'red_anime'), ('nightly', 'blue'),
+        ('folder', None)]
+
+
+class TestSelectJobs(TestCase):
+
+    def test_names_and_globs(self):
+        selected, missing = select_jobs(JOBS, names=['nightly', 'gone'],
+                                        globs=['release-[ad]*'])
+        self.assertEqual([('nightly', 'blue'), ('release-app', 'blue'),
+                          ('release-db', 'disabled')], selected)
+        self.assertEqual(['gone'], missing)
+
+    def test_pattern_and_colors_narrow_down(self):
+        selected, _ = select_jobs(JOBS, globs=['release-*'], colors=['red'])
+        self.assertEqual([('release-web', 'red_anime')], selected)
+        selected, _ = select_jobs(JOBS, pattern='app|night')
+        self.assertEqual([('nightly', 'blue'), ('release-app', 'blue')],
+                         selected)
+
+    def test_nothing_selected(self):
+        self.assertRaises(AutojenkinsError, select_jobs, JOBS)
+
+
+class TestSetEnabled(TestCase):
+
+    def setUp(self):
+        super(TestSetEnabled, self).setUp()
+        self.jenkins = Mock()
+        self.jenkins.all_jobs.return_value = JOBS
+
+    def test_skips_jobs_in_target_state(self):
+        outcomes = set_enabled(self.jenkins, False, globs=['release-*'])
+        self.assertEqual([ToggleOutcome('release-app', True, None),
+                          ToggleOutcome('release-db', False, None),
+                          ToggleOutcome('release-web', True, None)],
+                         outcomes)
+        self.assertEqual(set(['release-app', 'release-web']),
+                         set(call[0][0] for call in
+                             self.jenkins.disable.call_args_list))
+        self.assertFalse(self.jenkins.enable.called)
+
+    def test_dry_run(self):
+        outcomes = set_enabled(self.jenkins, True, globs=['release-*'],
+                               dry_run=True)
+        self.assertEqual([False, True, False],
+                         [outcome.changed for outcome in outcomes])
+        self.assertFalse(self.jenkins.enable.called)
+
+    def test_errors(self):
+        self.jenkins.disable.side_effect = ValueError('boom')
+        outcomes = set_enabled(self.jenkins, False, names=['nightly', 'gone'])
+        self.assertIsInstance(outcomes[0].error, JobInexistent)
+        self.assertIsInstance(outcomes[1].error, ValueError)
+        self.assertEqual([False, False],
+                         [outcome.changed for outcome in outcomes])
+
+
+class TestDisableMany(TestCase):
+
+    def test_posts_once_per_job(self):
+        jobs = {'jobs': [{'name': 'job{0}'.format(i),
+                          'color': 'disabled' if i % 2 else 'blue'}
+                         for i in range(20)]}
+        routes = {('GET', '/api/python'): (200, {}, str(jobs))}
+        for i in range(20):
+            routes[('POST', '/job/job{0}/disable'.format(i))] = (200, {}, '')
+        with FakeJenkinsServer(routes) as server:
+            jenkins = Jenkins(server.url, transport=RequestsTransport())
+            outcomes = jenkins.disable_many(globs=['job*'], workers=4)
+        posts = [path for method, path, _ in server.requests
+                 if method == 'POST']
+        self.assertEqual(10, len(posts))
+        self.assertEqual(10, len([outcome for outcome in outcomes
+                                  if outcome.changed]))
+        self.assertEqual(1, len([request for request in server.requests
+                                 if request[0] == 'GET']))
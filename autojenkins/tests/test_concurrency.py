@@ -0,0 +1,106 @@
+import threading
+import time
+from unittest import TestCase
+
+from autojenkins.jobs import Jenkins
+from autojenkins.parallel import imap_unordered
+from autojenkins.tests.server import FakeJenkinsServer
+from autojenkins.transport import SessionTransport
+
+
+JOBS = 64
+LATENCY = 0.01
+
+
+class ConfigStore(object):
+    """
+    Routes of a server holding one config.xml per job, answering after a
+    fixed latency.
+    """
+
+    def __init__(self):
+        self.configs = {}
+        self.lock = threading.Lock()
+
+    def routes(self):
+        routes = {}
+        for index in range(JOBS):
+            name = 'job{0}'.format(index)
+            path = '/job/{0}/'.format(name)
+            routes[('GET', path + 'config.xml')] = self.reader(name)
+            routes[('POST', path + 'config.xml')] = self.writer(name)
+            routes[('GET', path + 'api/python')] = (
+                200, {}, str({'name': name, 'buildable': True}))
+        return routes
+
+    def reader(self, name):
+        def read(body):
+            time.sleep(LATENCY)
+            with self.lock:
+                return 200, {}, self.configs.get(name, '')
+        return read
+
+    def writer(self, name):
+        def write(body):
+            time.sleep(LATENCY)
+            with self.lock:
+                self.configs[name] = body.decode('utf-8')
+            return 200, {}, ''
+        return write
+
+
+def mixed_operations(jenkins, count, workers):
+    """
+    Write, read back and inspect a job ``count`` times, from ``workers``
+    threads; return the failures.
+    """
+    def operate(index):
+        name = 'job{0}'.format(index % JOBS)
+        config = '<project><v>{0}</v></project>'.format(index)
+        jenkins.set_config_xml(name, config)
+        if jenkins.get_config_xml(name) != config:
+            raise AssertionError('Lost write {0}'.format(index))
+        if jenkins.job_info(name)['name'] != name:
+            raise AssertionError('Wrong job info {0}'.format(index))
+
+    return [error for _, _, error in
+            imap_unordered(operate, range(count), workers)
+            if error is not None]
+
+
+class TestSharedClient(TestCase):
+
+    def test_concurrent_reads_and_writes(self):
+        with FakeJenkinsServer(ConfigStore().routes()) as server:
+            transport = SessionTransport(pool_size=16)
+            jenkins = Jenkins(server.url, transport=transport)
+            failures = mixed_operations(jenkins, 640, 16)
+            transport.close()
+        self.assertEqual([], failures)
+        self.assertEqual(3 * 640, len(server.requests))
+        self.assertLessEqual(len(server.clients), 16)
+
+    def test_threads_do_not_share_sessions(self):
+        transport = SessionTransport()
+        sessions = []
+        threads = [threading.Thread(
+            target=lambda: sessions.append(transport.session))
+            for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(4, len(set(map(id, sessions))))
+        self.assertEqual(1, len(set(id(session.get_adapter('http://x'))
+                                    for session in sessions)))
+
+    def test_per_thread_pools(self):
+        transport = SessionTransport(per_thread_pool=True)
+        adapters = []
+        threads = [threading.Thread(target=lambda: adapters.append(
+            transport.session.get_adapter('http://x'))) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(3, len(set(map(id, adapters))))
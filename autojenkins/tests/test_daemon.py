@@ -0,0 +1,152 @@
+import os
+import shutil
+import stat
+import tempfile
+from unittest import TestCase
+
+import requests
+from mock import Mock
+
+from autojenkins.daemon import CacheDaemon, DaemonTransport, lifetime
+from autojenkins.jobs import Jenkins
+from autojenkins.tests.server import FakeJenkinsServer
+
+
+JOBS = str({'jobs': [{'name': 'job1', 'color': 'blue'},
+                     {'name': 'job2', 'color': 'red'}]})
+
+
+def response(text, status=200):
+    return Mock(status_code=status, text=text)
+
+
+class TestLifetime(TestCase):
+
+    def test_job_lists_and_job_info_expire(self):
+        for url in ['http://j/api/python', 'http://j/ci/api/python',
+                    'http://j/job/a/api/python']:
+            self.assertEqual('ttl', lifetime('GET', url, response('{}')))
+
+    def test_completed_builds_are_kept(self):
+        url = 'http://j/job/a/3/api/python'
+        # compact output of the Jenkins Python API
+        self.assertEqual('forever', lifetime('GET', url, response(
+            '{"_class":"hudson.model.FreeStyleBuild","building":False,'
+            '"number":3,"result":"SUCCESS"}')))
+        self.assertIsNone(lifetime('GET', url, response(
+            '{"_class":"hudson.model.FreeStyleBuild","building":True,'
+            '"number":3,"result":None}')))
+        self.assertIsNone(lifetime('GET', url, response('<html>')))
+
+    def test_other_responses_are_not_cached(self):
+        for method, url, status in [
+                ('GET', 'http://j/queue/api/python', 200),
+                ('GET', 'http://j/crumbIssuer/api/python', 200),
+                ('GET', 'http://j/job/a/lastBuild/api/python', 200),
+                ('GET', 'http://j/job/a/config.xml', 200),
+                ('GET', 'http://j/job/a/api/python', 404),
+                ('POST', 'http://j/job/a/api/python', 200)]:
+            self.assertIsNone(lifetime(method, url, response(
+                '{"building":False}', status)), url)
+
+
+class TestCacheDaemon(TestCase):
+
+    def setUp(self):
+        super(TestCacheDaemon, self).setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'ajk.sock')
+        routes = {
+            ('GET', '/api/python'): (200, {}, JOBS),
+            ('GET', '/job/job1/api/python'):
+                (200, {}, str({'name': 'job1', 'buildable': True})),
+            ('GET', '/job/job1/1/api/python'):
+                (200, {}, '{"building":False,"number":1}'),
+            ('GET', '/job/job1/2/api/python'):
+                (200, {}, '{"building":True,"number":2}'),
+            ('GET', '/job/job1/1/consoleText'): (200, {}, b'\xff\x00log'),
+            ('POST', '/job/job1/enable'): (200, {}, ''),
+        }
+        self.server = FakeJenkinsServer(routes).__enter__()
+        self.daemon = CacheDaemon(self.path, ttl=60).start()
+        self.transport = DaemonTransport(self.path)
+        self.jenkins = Jenkins(self.server.url, transport=self.transport)
+
+    def tearDown(self):
+        self.transport.close()
+        self.daemon.stop()
+        self.server.__exit__(None, None, None)
+        shutil.rmtree(self.tmpdir)
+        super(TestCacheDaemon, self).tearDown()
+
+    def gets(self, path):
+        return len([request for request in self.server.requests
+                    if request[:2] == ('GET', path)])
+
+    def test_socket_is_private(self):
+        mode = stat.S_IMODE(os.stat(self.path).st_mode)
+        self.assertEqual(0, mode & 0o077)
+
+    def test_job_list_is_cached(self):
+        for _ in range(3):
+            self.assertEqual([('job1', 'blue'), ('job2', 'red')],
+                             self.jenkins.all_jobs())
+        self.assertEqual(1, self.gets('/api/python'))
+        self.assertEqual(2, self.daemon.hits)
+
+    def test_only_completed_builds_are_cached(self):
+        for _ in range(2):
+            self.jenkins.build_info('job1', 1)
+            self.jenkins.build_info('job1', 2)
+        self.assertEqual(1, self.gets('/job/job1/1/api/python'))
+        self.assertEqual(2, self.gets('/job/job1/2/api/python'))
+
+    def test_write_invalidates_job(self):
+        self.jenkins.all_jobs()
+        self.jenkins.job_info('job1')
+        self.jenkins.build_info('job1', 1)
+        self.jenkins.enable('job1')
+        self.jenkins.all_jobs()
+        self.jenkins.job_info('job1')
+        self.jenkins.build_info('job1', 1)
+        self.assertEqual(2, self.gets('/api/python'))
+        self.assertEqual(2, self.gets('/job/job1/api/python'))
+        self.assertEqual(2, self.gets('/job/job1/1/api/python'))
+
+    def test_cache_is_per_credentials(self):
+        other = Jenkins(self.server.url, auth=('user', 'token'),
+                        transport=self.transport)
+        self.jenkins.all_jobs()
+        other.all_jobs()
+        other.all_jobs()
+        self.assertEqual(2, self.gets('/api/python'))
+
+    def test_binary_body(self):
+        self.assertEqual(b'\xff\x00log',
+                         self.jenkins.console_text('job1', 1))
+
+    def test_logs_and_streams_bypass_the_daemon(self):
+        self.jenkins.console_text('job1', 1)
+        response = self.transport.request(
+            'GET', self.server.url + '/api/python', stream=True)
+        self.assertEqual(JOBS, response.text)
+        self.assertEqual(0, self.daemon.hits + self.daemon.misses)
+        self.assertEqual(1, self.gets('/job/job1/1/consoleText'))
+
+    def test_upstream_errors_are_raised(self):
+        jenkins = Jenkins('http://127.0.0.1:1', transport=self.transport)
+        self.assertRaises(requests.ConnectionError, jenkins.all_jobs)
+
+    def test_falls_back_when_daemon_stops(self):
+        self.jenkins.all_jobs()
+        self.daemon.stop()
+        self.assertEqual([('job1', 'blue'), ('job2', 'red')],
+                         self.jenkins.all_jobs())
+        self.assertEqual(2, self.gets('/api/python'))
+
+    def test_direct_without_daemon(self):
+        transport = DaemonTransport(os.path.join(self.tmpdir, 'none.sock'))
+        jenkins = Jenkins(self.server.url, transport=transport)
+        self.assertEqual([('job1', 'blue'), ('job2', 'red')],
+                         jenkins.all_jobs())
+        transport.close()
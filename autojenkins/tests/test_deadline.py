@@ -0,0 +1,135 @@
+from unittest import TestCase
+
+from mock import MagicMock, Mock, patch
+
+from autojenkins import batch
+from autojenkins.deadline import Deadline, DeadlineExceeded
+from autojenkins.jobs import Jenkins
+
+
+def mock_response(data='', location=None):
+    response = Mock(status_code=201)
+    response.text = str(data)
+    response.headers = {'Location': location} if location else {}
+    return response
+
+
+@patch('autojenkins.deadline.time')
+class TestDeadline(TestCase):
+
+    def test_caps_timeouts_to_remaining_time(self, time):
+        time.time.return_value = 100
+        deadline = Deadline(30)
+        time.time.return_value = 110
+        self.assertEqual(20, deadline.timeout())
+        self.assertEqual(5, deadline.timeout(5))
+        self.assertEqual((3, 20), deadline.timeout((3, 60)))
+        time.time.return_value = 130
+        self.assertRaises(DeadlineExceeded, deadline.timeout, 5)
+
+    def test_sleep_raises_with_progress_when_deadline_passes(self, time):
+        time.time.return_value = 100
+        deadline = Deadline(4)
+        deadline.sleep(3)
+        with self.assertRaises(DeadlineExceeded) as context:
+            deadline.sleep(10, progress=['partial'])
+        self.assertEqual(['partial'], context.exception.progress)
+        self.assertEqual([((3,),), ((4,),)], time.sleep.call_args_list)
+
+
+class TestTimeouts(TestCase):
+
+    def setUp(self):
+        self.transport = Mock()
+        self.transport.request.return_value = mock_response({'jobs': []})
+
+    def timeout(self):
+        return self.transport.request.call_args[1].get('timeout')
+
+    def test_no_timeout_by_default(self):
+        Jenkins('http://jenkins', transport=self.transport).all_jobs()
+        self.assertIsNone(self.timeout())
+
+    def test_client_call_and_block_timeouts(self):
+        jenkins = Jenkins('http://jenkins', transport=self.transport,
+                          timeout=(5, 30))
+        jenkins.all_jobs()
+        self.assertEqual((5, 30), self.timeout())
+        with jenkins.limits(timeout=2):
+            jenkins.all_jobs()
+            self.assertEqual(2, self.timeout())
+            jenkins._build_get('{0}/api/python', timeout=1)
+            self.assertEqual(1, self.timeout())
+        jenkins.all_jobs()
+        self.assertEqual((5, 30), self.timeout())
+
+    def test_deadline_caps_request_timeouts(self):
+        jenkins = Jenkins('http://jenkins', transport=self.transport,
+                          timeout=(5, 300))
+        with jenkins.limits(deadline=60):
+            jenkins.all_jobs()
+        connect, read = self.timeout()
+        self.assertEqual(5, connect)
+        self.assertTrue(59 < read <= 60)
+
+    def test_request_failing_past_deadline_raises_deadline_exceeded(self):
+        jenkins = Jenkins('http://jenkins', transport=self.transport)
+        deadline = Deadline(60)
+        self.transport.request.side_effect = IOError('read timed out')
+        with jenkins.limits(deadline=deadline):
+            self.assertRaises(IOError, jenkins.all_jobs)
+            deadline.expires = 0
+            self.assertRaises(DeadlineExceeded, jenkins.all_jobs)
+
+
+@patch('autojenkins.jobs.Jenkins.is_building', return_value=True)
+@patch('autojenkins.jobs.Jenkins.job_info', return_value={'buildable': True})
+@patch('autojenkins.jobs.Jenkins.job_exists', return_value=True)
+@patch('autojenkins.jobs.Jenkins._trigger')
+@patch('autojenkins.deadline.time')
+class TestBuildDeadline(TestCase):
+
+    def test_build_and_wait_raises_with_trigger_response(
+            self, time, trigger, job_exists, job_info, is_building):
+        clock = [100]
+        time.time.side_effect = lambda: clock[0]
+        time.sleep.side_effect = lambda seconds: clock.__setitem__(
+            0, clock[0] + seconds)
+        jenkins = Jenkins('http://jenkins', transport=Mock())
+        with patch('autojenkins.jobs.sys'):
+            with self.assertRaises(DeadlineExceeded) as context:
+                jenkins.build('job', wait=True, grace=10, deadline=15)
+        self.assertIs(trigger.return_value, context.exception.progress)
+        self.assertEqual([10, 3, 2],
+                         [args[0] for args, _ in time.sleep.call_args_list])
+
+
+@patch('autojenkins.batch.time')
+@patch('autojenkins.deadline.time')
+class TestBatchDeadline(TestCase):
+
+    def test_wait_for_all_raises_with_partial_outcomes(self, time,
+                                                       batch_time):
+        time.time.return_value = 100
+        jenkins = MagicMock()
+        queue_ids = iter([100, 101])
+        jenkins._trigger.side_effect = lambda name, params: mock_response(
+            '', '/queue/item/%d/' % next(queue_ids))
+        jenkins._build_get.side_effect = [
+            mock_response({'jobs': [{'name': 'a', 'buildable': True},
+                                    {'name': 'b', 'buildable': True}]}),
+            mock_response({'builds': [
+                {'number': 1, 'queueId': 100, 'building': False,
+                 'result': 'SUCCESS'}]}),
+            mock_response({'builds': [
+                {'number': 4, 'queueId': 101, 'building': True,
+                 'result': None}]}),
+        ]
+        with self.assertRaises(DeadlineExceeded) as context:
+            batch.build_many(jenkins, ['a', 'b'], wait=True, workers=1,
+                             poll_interval=10, deadline=5)
+        outcomes = context.exception.progress
+        self.assertEqual([('a', 'SUCCESS'), ('b', None)],
+                         [(o.jobname, o.result) for o in outcomes])
+        time.sleep.assert_called_once_with(5)
+        self.assertFalse(batch_time.sleep.called)
@@ -0,0 +1,151 @@
+import threading
+from unittest import TestCase
+
+from mock import Mock, patch
+
+from autojenkins.dedupe import PendingBuild, QueueSnapshot, matches
+from autojenkins.jobs import JOBINFO, LIST, QUEUE, Jenkins
+
+
+QUEUED = {'items': [
+    {'id': 12, 'task': {'name': 'deploy'},
+     'actions': [{}, {'parameters': [{'name': 'COMMIT', 'value': 'abc'},
+                                     {'name': 'DRY_RUN', 'value': False}]}]},
+]}
+RUNNING = {'jobs': [
+    {'name': 'deploy', 'builds': [
+        {'number': 8, 'building': True, 'queueId': 10,
+         'actions': [{'parameters': [{'name': 'COMMIT', 'value': 'def'},
+                                     {'name': 'DRY_RUN', 'value': False}]}]},
+        {'number': 7, 'building': False, 'queueId': 9,
+         'actions': [{'parameters': [{'name': 'COMMIT', 'value': 'ghi'}]}]},
+    ]},
+    {'name': 'test', 'builds': []},
+]}
+PARAMETERS = {'property': [{}, {'parameterDefinitions': [
+    {'name': 'COMMIT', 'defaultParameterValue': {'value': ''}},
+    {'name': 'DRY_RUN', 'defaultParameterValue': {'value': False}},
+    {'name': 'TOKEN'}]}]}
+
+
+def response(data, location=None):
+    result = Mock()
+    result.text = str(data)
+    result.headers = {'Location': location} if location else {}
+    return result
+
+
+def fake_get(pattern, *args, **kwargs):
+    return response({QUEUE: QUEUED, LIST: RUNNING,
+                     JOBINFO: PARAMETERS}[pattern])
+
+
+class TestMatches(TestCase):
+
+    def test_compares_all_parameters(self):
+        pending = {'COMMIT': 'abc', 'DRY_RUN': 'false'}
+        defaults = {'COMMIT': '', 'DRY_RUN': 'false'}
+        self.assertTrue(matches({'COMMIT': 'abc'}, pending, defaults))
+        self.assertTrue(matches({'COMMIT': 'abc', 'DRY_RUN': False},
+                                pending))
+        self.assertFalse(matches({'COMMIT': 'abc'}, pending))
+        self.assertFalse(matches(None, pending, defaults))
+        self.assertFalse(matches({'COMMIT': 'abc', 'DRY_RUN': True},
+                                 pending, defaults))
+        self.assertFalse(matches({'COMMIT': 'abc', 'BRANCH': 'master'},
+                                 pending, defaults))
+
+    def test_omitted_parameters_take_their_default(self):
+        pending = {'COMMIT': 'a', 'BRANCH': 'release'}
+        self.assertFalse(matches({'COMMIT': 'a'}, pending,
+                                 {'COMMIT': '', 'BRANCH': 'main'}))
+
+
+@patch('autojenkins.dedupe.time')
+class TestQueueSnapshot(TestCase):
+
+    def setUp(self):
+        self.jenkins = Mock()
+        self.jenkins._build_get.side_effect = fake_get
+        self.snapshot = QueueSnapshot(self.jenkins, interval=10)
+
+    def test_finds_queued_and_running_builds(self, time):
+        time.time.return_value = 100
+        self.assertEqual(
+            PendingBuild('deploy', {'COMMIT': 'abc', 'DRY_RUN': 'false'},
+                         12, None),
+            self.snapshot.find('deploy', {'COMMIT': 'abc'}))
+        self.assertEqual(8, self.snapshot.find('deploy',
+                                               {'COMMIT': 'def'}).number)
+        self.assertIsNone(self.snapshot.find('deploy', {'COMMIT': 'ghi'}))
+        self.assertIsNone(self.snapshot.find('test'))
+
+    def test_refreshes_at_most_once_per_interval(self, time):
+        time.time.side_effect = [100, 105, 111]
+        for _ in range(3):
+            self.snapshot.find('deploy', {'COMMIT': 'abc'})
+        self.assertEqual(5, self.jenkins._build_get.call_count)
+        self.jenkins._build_get.assert_any_call(JOBINFO, 'deploy', params={
+            'tree': 'property[parameterDefinitions[name,'
+                    'defaultParameterValue[value]]]'})
+        self.jenkins._build_get.assert_any_call(LIST, params={
+            'tree': 'jobs[name,builds[number,building,queueId,'
+                    'actions[parameters[name,value]]]{0,5}]'})
+
+    def test_added_builds_are_found_until_refresh(self, time):
+        time.time.side_effect = [100, 105, 111]
+        self.snapshot.find('test')
+        self.snapshot.add('test', {'COMMIT': 1}, 13)
+        self.assertEqual({'COMMIT': '1', 'DRY_RUN': 'false'},
+                         self.snapshot.find('test', {'COMMIT': 1}).params)
+        self.assertIsNone(self.snapshot.find('test', {'COMMIT': 1}))
+
+    def test_concurrent_callers_trigger_once(self, time):
+        time.time.return_value = 100
+        started = threading.Event()
+
+        def trigger(jobname, params):
+            started.set()
+            # let the other thread try to trigger meanwhile
+            threading.Event().wait(0.1)
+            return response('', '/queue/item/13/')
+        self.jenkins._trigger.side_effect = trigger
+        results = []
+
+        def build(params):
+            results.append(self.snapshot.find_or_trigger('test', params))
+        threads = [threading.Thread(target=build, args=(params,))
+                   for params in ({'COMMIT': 'a'},
+                                  {'COMMIT': 'a', 'DRY_RUN': False})]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertTrue(started.is_set())
+        self.assertEqual(1, self.jenkins._trigger.call_count)
+        self.assertEqual([13], [pending.queue_id for pending, _ in results
+                                if pending is not None])
+        self.assertEqual({}, self.snapshot._trigger_locks)
+
+
+@patch('autojenkins.dedupe.time')
+@patch('autojenkins.jobs.Jenkins._build_get')
+@patch('autojenkins.jobs.Jenkins._trigger')
+@patch('autojenkins.jobs.Jenkins.job_info')
+@patch('autojenkins.jobs.Jenkins.job_exists')
+class TestBuildDedupe(TestCase):
+
+    def test_triggers_once_per_interval(self, job_exists, job_info, trigger,
+                                        build_get, time):
+        time.time.return_value = 100
+        job_info.return_value = {'buildable': True}
+        build_get.side_effect = fake_get
+        trigger.return_value = response('', '/queue/item/13/')
+        jenkins = Jenkins('http://jenkins')
+        first = jenkins.build('test', {'COMMIT': 'abc'}, dedupe=True)
+        second = jenkins.build('test', {'COMMIT': 'abc'}, dedupe=True)
+        queued = jenkins.build('deploy', {'COMMIT': 'abc'}, dedupe=True)
+        self.assertIs(trigger.return_value, first)
+        self.assertEqual(13, second.queue_id)
+        self.assertEqual(12, queued.queue_id)
+        trigger.assert_called_once_with('test', {'COMMIT': 'abc'})
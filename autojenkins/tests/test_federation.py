@@ -0,0 +1,83 @@
+import socket
+import threading
+from unittest import TestCase
+
+from mock import MagicMock
+
+from autojenkins.federation import ControllerTimeout, FederatedJenkins
+from autojenkins.jobs import HttpUnauthorized, Jenkins
+
+
+def controller(root, jobs=None, error=None, block=None):
+    client = MagicMock(ROOT=root)
+
+    def all_jobs(include_colorless=False):
+        if block is not None:
+            block.wait()
+        if error is not None:
+            raise error
+        return jobs
+
+    client.all_jobs.side_effect = all_jobs
+    client.job_exists.side_effect = lambda name: any(
+        job == name for job, _ in jobs or [])
+    return client
+
+
+class TestFederatedJenkins(TestCase):
+
+    def test_all_jobs_merges_and_tags_results(self):
+        federation = FederatedJenkins([
+            controller('http://b', [('x', 'red')]),
+            controller('http://a', [('x', 'blue'), ('y', 'blue')])])
+        jobs, errors = federation.all_jobs()
+        self.assertEqual([('http://a', 'x', 'blue'), ('http://a', 'y', 'blue'),
+                          ('http://b', 'x', 'red')], jobs)
+        self.assertEqual({}, errors)
+
+    def test_failing_and_slow_controllers_are_reported(self):
+        block = threading.Event()
+        federation = FederatedJenkins([
+            controller('http://ok', [('x', 'blue')]),
+            controller('http://down', error=HttpUnauthorized('401')),
+            controller('http://slow', [('z', 'blue')], block=block)],
+            timeout=0.2)
+        try:
+            jobs, errors = federation.all_jobs()
+        finally:
+            block.set()
+        self.assertEqual([('http://ok', 'x', 'blue')], jobs)
+        self.assertIsInstance(errors['http://down'], HttpUnauthorized)
+        self.assertIsInstance(errors['http://slow'], ControllerTimeout)
+
+    def test_find_job(self):
+        federation = FederatedJenkins([
+            controller('http://b', [('x', 'red')]),
+            controller('http://a', [('y', 'blue')]),
+            controller('http://c', [('x', 'blue')])])
+        self.assertEqual((['http://b', 'http://c'], {}),
+                         federation.find_job('x'))
+
+    def test_requests_do_not_outlive_the_timeout(self):
+        finished = threading.Event()
+
+        class Client(Jenkins):
+            def all_jobs(self, include_colorless=False):
+                try:
+                    return super(Client, self).all_jobs(include_colorless)
+                finally:
+                    finished.set()
+
+        # Accepts connections, but never answers
+        server = socket.socket()
+        server.bind(('127.0.0.1', 0))
+        server.listen(1)
+        try:
+            client = Client('http://127.0.0.1:{0}'.format(
+                server.getsockname()[1]))
+            federation = FederatedJenkins([client], timeout=0.3)
+            jobs, errors = federation.all_jobs()
+            self.assertIsInstance(errors[client.ROOT], ControllerTimeout)
+            self.assertTrue(finished.wait(5))
+        finally:
+            server.close()
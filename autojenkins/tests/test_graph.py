@@ -0,0 +1,74 @@
+import json
+from unittest import TestCase
+
+from mock import Mock
+
+from autojenkins.graph import GraphCycleError, JobGraph, fetch_graph
+from autojenkins.jobs import JobInexistent
+
+
+def job(name, duration, *downstream):
+    return {'name': name,
+            'lastSuccessfulBuild': {'duration': duration},
+            'downstreamProjects': [{'name': child} for child in downstream]}
+
+
+PIPELINE = [
+    job('build', 100, 'unit', 'lint'),
+    job('unit', 300, 'deploy'),
+    job('lint', 50, 'deploy'),
+    job('deploy', 200, 'smoke'),
+    job('smoke', 10),
+    job('other', 1000),
+]
+
+
+class TestJobGraph(TestCase):
+
+    def setUp(self):
+        super(TestJobGraph, self).setUp()
+        self.graph = JobGraph.from_jobs(PIPELINE)
+
+    def test_fetch_graph_in_one_request(self):
+        jenkins = Mock()
+        jenkins._build_get.return_value = Mock(text=str({'jobs': PIPELINE}))
+        graph = fetch_graph(jenkins)
+        self.assertEqual(1, jenkins._build_get.call_count)
+        self.assertEqual(set(['unit', 'lint']), graph.downstream['build'])
+        self.assertEqual(set(['unit', 'lint']), graph.upstream['deploy'])
+
+    def test_transitive_downstream(self):
+        self.assertEqual(set(['unit', 'lint', 'deploy', 'smoke']),
+                         self.graph.transitive_downstream('build'))
+        self.assertEqual(set(), self.graph.transitive_downstream('smoke'))
+
+    def test_critical_path(self):
+        self.assertEqual((['build', 'unit', 'deploy', 'smoke'], 610),
+                         self.graph.critical_path('build'))
+        self.assertEqual((['other'], 1000), self.graph.critical_path())
+
+    def test_cycles(self):
+        self.assertEqual([], self.graph.cycles())
+        self.graph.add_edge('smoke', 'unit')
+        self.graph.add_edge('other', 'other')
+        self.assertEqual([['deploy', 'smoke', 'unit'], ['other']],
+                         sorted(self.graph.cycles()))
+        with self.assertRaises(GraphCycleError):
+            self.graph.critical_path('build')
+
+    def test_export(self):
+        subgraph = self.graph.subgraph('deploy')
+        self.assertEqual({'nodes': [{'name': 'deploy', 'duration': 200},
+                                    {'name': 'smoke', 'duration': 10}],
+                          'edges': [['deploy', 'smoke']]},
+                         json.loads(subgraph.to_json()))
+        self.assertIn('"deploy" -> "smoke";', subgraph.to_dot())
+
+    def test_unknown_job(self):
+        with self.assertRaises(JobInexistent):
+            self.graph.subgraph('nope')
+
+    def test_dot_escapes_names(self):
+        graph = JobGraph()
+        graph.add_edge('say "hi"', 'back\\slash')
+        self.assertIn('"say \\"hi\\"" -> "back\\\\slash";', graph.to_dot())
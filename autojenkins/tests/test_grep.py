@@ -0,0 +1,64 @@
+from unittest import TestCase
+
+from mock import Mock
+
+from autojenkins import grep
+from autojenkins.jobs import HttpNotFoundError
+
+
+LOGS = {
+    1: b'starting\nall good\n',
+    2: b'starting\nERROR: disk full\nretrying\nERROR: disk full\n',
+    3: b'ERROR: timeout\n',
+}
+
+
+def fake_jenkins(logs, chunk_size=5):
+
+    def get(url_pattern, jobname, build_number, stream=False):
+        if build_number not in logs:
+            raise HttpNotFoundError('HTTP Status: 404')
+        log = logs[build_number]
+        response = Mock()
+        response.iter_content.return_value = [
+            log[i:i + chunk_size] for i in range(0, len(log), chunk_size)]
+        return response
+
+    jenkins = Mock()
+    jenkins._build_get.side_effect = get
+    return jenkins
+
+
+class TestGrep(TestCase):
+
+    def test_iter_lines_across_chunks(self):
+        lines = list(grep._iter_lines([b'ab', b'c\nd', b'e\n', b'f']))
+        self.assertEqual([(0, b'abc'), (4, b'de'), (7, b'f')], lines)
+
+    def test_grep_all_matches_with_offsets(self):
+        targets = grep.build_range('job', 1, 3)
+        matches = sorted(grep.grep_console(fake_jenkins(LOGS), 'ERROR',
+                                           targets, workers=2))
+        self.assertEqual(
+            [('job', 2, 2, 9, 'ERROR: disk full'),
+             ('job', 2, 4, 35, 'ERROR: disk full'),
+             ('job', 3, 1, 0, 'ERROR: timeout')],
+            matches)
+
+    def test_grep_limit_stops_early(self):
+        targets = grep.build_range('job', 1, 3)
+        matches = list(grep.grep_console(fake_jenkins(LOGS), 'ERROR',
+                                         targets, limit=1, workers=1))
+        self.assertEqual(1, len(matches))
+
+    def test_grep_first_returns_earliest_build(self):
+        targets = grep.build_range('job', 1, 4)
+        matches = list(grep.grep_console(fake_jenkins(LOGS), 'ERROR',
+                                         targets, first=True, workers=3))
+        self.assertEqual([('job', 2, 2, 9, 'ERROR: disk full')], matches)
+
+    def test_grep_skips_deleted_builds(self):
+        targets = grep.build_range('job', 0, 1)
+        matches = list(grep.grep_console(fake_jenkins(LOGS), 'good',
+                                         targets))
+        self.assertEqual([('job', 1, 2, 9, 'all good')], matches)
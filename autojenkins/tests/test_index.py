@@ -0,0 +1,134 @@
+import shutil
+import tempfile
+from os import path
+from unittest import TestCase
+
+from mock import Mock
+
+from autojenkins.index import ConfigIndex, ConfigIndexError, extract_fields
+from autojenkins.jobs import HttpNotFoundError
+
+
+fixture_path = path.dirname(__file__)
+
+DEPLOY = '''<flow-definition>
+  <properties>
+    <hudson.model.ParametersDefinitionProperty>
+      <parameterDefinitions>
+        <hudson.model.StringParameterDefinition>
+          <name>COMMIT</name>
+        </hudson.model.StringParameterDefinition>
+        <hudson.model.BooleanParameterDefinition>
+          <name>DRY_RUN</name>
+        </hudson.model.BooleanParameterDefinition>
+      </parameterDefinitions>
+    </hudson.model.ParametersDefinitionProperty>
+  </properties>
+  <definition class="org.jenkinsci.plugins.workflow.cps.CpsScmFlowDefinition">
+    <scm class="hudson.scm.SubversionSCM">
+      <locations><hudson.scm.SubversionSCM_-ModuleLocation>
+        <remote>https://svn.acme.com/deploy/trunk</remote>
+      </hudson.scm.SubversionSCM_-ModuleLocation></locations>
+    </scm>
+  </definition>
+  <assignedNode>linux &amp;&amp; docker</assignedNode>
+  <triggers>
+    <jenkins.triggers.ReverseBuildTrigger/>
+  </triggers>
+</flow-definition>'''
+
+
+def load_fixture(name):
+    with open(path.join(fixture_path, name)) as f:
+        return f.read()
+
+
+def config_response(config, status=200, etag=None):
+    response = Mock(status_code=status, text=config)
+    response.headers = {'ETag': etag} if etag else {}
+    return response
+
+
+class TestExtractFields(TestCase):
+
+    def test_git_freestyle_job(self):
+        self.assertEqual([
+            ('branch', 'master'),
+            ('scm', 'git+ssh://git@github.com/glassesdirect/vultan.git'),
+            ('trigger', 'hudson.triggers.SCMTrigger */5 * * * *'),
+        ], extract_fields(load_fixture('get_config_xml.txt')))
+
+    def test_pipeline_job(self):
+        self.assertEqual([
+            ('label', 'linux && docker'),
+            ('parameter', 'COMMIT'),
+            ('parameter', 'DRY_RUN'),
+            ('scm', 'https://svn.acme.com/deploy/trunk'),
+            ('trigger', 'jenkins.triggers.ReverseBuildTrigger'),
+        ], extract_fields(DEPLOY))
+
+
+class TestConfigIndex(TestCase):
+
+    def setUp(self):
+        self.configs = {'vultan': load_fixture('get_config_xml.txt'),
+                        'deploy': DEPLOY}
+        self.jenkins = Mock(ROOT='http://jenkins')
+        self.jenkins.all_jobs.side_effect = lambda include_colorless: [
+            (name, 'blue') for name in self.configs]
+        self.jenkins._build_get.side_effect = self.get
+        self.index = ConfigIndex(':memory:', self.jenkins)
+
+    def get(self, pattern, name, headers):
+        if self.configs[name] is None:
+            raise HttpNotFoundError('HTTP Status: 404')
+        if headers.get('If-None-Match') == 'v1':
+            return config_response('', status=304)
+        etag = 'v1' if name == 'deploy' else None
+        return config_response(self.configs[name], etag=etag)
+
+    def test_search(self):
+        self.assertEqual({'vultan': 'added', 'deploy': 'added'},
+                         self.index.update(workers=2))
+        self.assertEqual(['vultan'], self.index.search(scm='github.com'))
+        self.assertEqual(['deploy'], self.index.search(label='linux'))
+        self.assertEqual(['deploy', 'vultan'],
+                         self.index.search(trigger='Trigger'))
+        self.assertEqual([], self.index.search(branch='mast',
+                                               exact=True))
+        self.assertEqual(['vultan'], self.index.search(branch='master',
+                                                       exact=True))
+        self.assertEqual(['deploy'], self.index.search(any='dry_run'))
+        self.assertEqual(['vultan'], self.index.search(text='disk__usage'))
+        self.assertEqual([], self.index.search(text='%'))
+        self.assertEqual(['COMMIT', 'DRY_RUN'],
+                         self.index.fields('deploy')['parameter'])
+        self.assertRaises(ConfigIndexError, self.index.search, color='blue')
+
+    def test_update_only_reindexes_changed_jobs(self):
+        self.index.update()
+        self.configs['vultan'] = self.configs['vultan'].replace(
+            'master', 'develop')
+        self.configs['new'] = DEPLOY
+        self.assertEqual({'vultan': 'updated', 'new': 'added'},
+                         self.index.update())
+        self.assertEqual(['vultan'], self.index.search(branch='develop'))
+        self.assertEqual({}, self.index.update())
+        del self.configs['deploy']
+        self.assertEqual({'deploy': 'removed'}, self.index.update())
+        self.assertEqual(['new', 'vultan'], self.index.jobs())
+
+    def test_fetch_errors_are_reported(self):
+        self.configs['broken'] = None
+        changes = self.index.update()
+        self.assertIsInstance(changes['broken'], Exception)
+        self.assertEqual(['deploy', 'vultan'], self.index.jobs())
+
+    def test_index_belongs_to_one_server(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        filename = path.join(directory, 'index.sqlite')
+        ConfigIndex(filename, self.jenkins).close()
+        self.jenkins.ROOT = 'http://other'
+        self.assertRaises(ConfigIndexError, ConfigIndex, filename,
+                          self.jenkins)
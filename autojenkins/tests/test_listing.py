@@ -0,0 +1,110 @@
+import io
+import json
+import re
+from unittest import TestCase
+
+from mock import Mock
+
+from autojenkins import listing
+
+
+COLORS = ['blue', 'red', 'blue_anime', 'yellow', None, 'red_anime',
+          'notbuilt', 'disabled']
+
+
+class FakeListing(object):
+    """
+    Answer paged ``tree=`` listing requests from a list of jobs.
+    """
+
+    def __init__(self, count):
+        self.jobs = [{'name': 'job{0:02d}'.format(index),
+                      'color': COLORS[index % len(COLORS)]}
+                     for index in range(count)]
+        for job in self.jobs:
+            if job['color'] is None:
+                del job['color']
+        self.trees = []
+        self.jenkins = Mock()
+        self.jenkins._build_get.side_effect = self.get
+
+    def get(self, pattern, params):
+        self.trees.append(params['tree'])
+        start, end = map(int, re.search(r'\{(\d+),(\d+)\}$',
+                                        params['tree']).groups())
+        response = Mock()
+        response.text = str({'jobs': self.jobs[start:end]})
+        return response
+
+
+class TestJobFilter(TestCase):
+
+    def test_filters_by_name_color_and_status(self):
+        accept = listing.job_filter('^deploy', colors=['red'])
+        self.assertTrue(accept(('deploy-x', 'red_anime')))
+        self.assertFalse(accept(('deploy-x', 'blue')))
+        self.assertFalse(accept(('test-deploy', 'red')))
+        accept = listing.job_filter(statuses=['not_built', 'building'])
+        self.assertTrue(accept(('a', 'notbuilt')))
+        self.assertTrue(accept(('a', 'blue_anime')))
+        self.assertFalse(accept(('a', 'blue')))
+        self.assertIsNone(listing.job_filter())
+
+    def test_unknown_colors_have_a_status(self):
+        self.assertEqual('FAILED', listing.job_status('red_anime'))
+        self.assertEqual('PURPLE', listing.job_status('purple_anime'))
+
+
+class TestIterJobs(TestCase):
+
+    def test_reads_pages_lazily(self):
+        fake = FakeListing(25)
+        jobs = listing.iter_jobs(fake.jenkins, page_size=10)
+        self.assertEqual(('job00', 'blue'), next(jobs))
+        self.assertEqual(['jobs[name,color]{0,10}'], fake.trees)
+        self.assertEqual(22, len(list(jobs)) + 1)
+        self.assertEqual(['jobs[name,color]{0,10}', 'jobs[name,color]{10,20}',
+                          'jobs[name,color]{20,30}'], fake.trees)
+
+    def test_filters_offset_and_limit(self):
+        fake = FakeListing(40)
+        jobs = list(listing.iter_jobs(fake.jenkins, statuses=['FAILED'],
+                                      offset=1, limit=3, page_size=10))
+        self.assertEqual(['job05', 'job09', 'job13'],
+                         [name for name, _ in jobs])
+        self.assertEqual(2, len(fake.trees))
+
+    def test_offset_and_limit_go_to_the_server_for_all_jobs(self):
+        fake = FakeListing(40)
+        jobs = list(listing.iter_jobs(fake.jenkins, offset=15, limit=10,
+                                      page_size=20, include_colorless=True))
+        self.assertEqual(['job{0}'.format(i) for i in range(15, 25)],
+                         [name for name, _ in jobs])
+        self.assertEqual(['jobs[name,color]{15,25}'], fake.trees)
+
+
+class TestWriters(TestCase):
+
+    def test_jsonl_and_tsv(self):
+        jobs = [('a', 'blue_anime'), ('b', 'weird')]
+        output = io.StringIO()
+        listing.write_jsonl(iter(jobs), output)
+        self.assertEqual(
+            [{'name': 'a', 'color': 'blue_anime', 'status': 'SUCCESS',
+              'building': True},
+             {'name': 'b', 'color': 'weird', 'status': 'WEIRD',
+              'building': False}],
+            [json.loads(line) for line in output.getvalue().splitlines()])
+        output = io.StringIO()
+        listing.write_tsv(iter(jobs), output)
+        self.assertEqual('a\tSUCCESS\tblue_anime\nb\tWEIRD\tweird\n',
+                         output.getvalue())
+
+    def test_federated_jobs(self):
+        output = io.StringIO()
+        listing.write_jsonl([('http://a', 'x', 'red')], output)
+        self.assertEqual('http://a',
+                         json.loads(output.getvalue())['controller'])
+        output = io.StringIO()
+        listing.write_tsv([('http://a', 'x', 'red')], output)
+        self.assertEqual('http://a\tx\tFAILED\tred\n', output.getvalue())
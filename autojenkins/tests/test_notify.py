@@ -0,0 +1,57 @@
+import threading
+import time
+from unittest import TestCase
+
+from mock import patch
+
+from autojenkins.jobs import Jenkins
+from autojenkins.notify import NotificationListener, send_notification
+
+
+class TestNotificationListener(TestCase):
+
+    def setUp(self):
+        super(TestNotificationListener, self).setUp()
+        self.listener = NotificationListener().start()
+
+    def tearDown(self):
+        self.listener.stop()
+        super(TestNotificationListener, self).tearDown()
+
+    def test_notification_wakes_waiter(self):
+        results = []
+        waiter = threading.Thread(
+            target=lambda: results.append(
+                self.listener.wait('job', 5, timeout=10)))
+        waiter.start()
+        started = time.time()
+        send_notification(self.listener.url, 'job', 5, status='FAILURE')
+        waiter.join()
+        self.assertLess(time.time() - started, 5)
+        self.assertEqual('FAILURE', results[0]['status'])
+
+    def test_notification_before_wait_is_remembered(self):
+        send_notification(self.listener.url, 'job', 7)
+        self.assertEqual(7, self.listener.wait('job', 6, timeout=0)['number'])
+
+    def test_wait_times_out_without_matching_notification(self):
+        send_notification(self.listener.url, 'job', 3)
+        send_notification(self.listener.url, 'other', 9)
+        send_notification(self.listener.url, 'job', 9, phase='STARTED')
+        self.assertIsNone(self.listener.wait('job', 4, timeout=0.1))
+
+    @patch('autojenkins.jobs.Jenkins.last_result')
+    def test_wait_for_build_uses_listener(self, last_result):
+        last_result.return_value = {'building': True, 'number': 12}
+        send_notification(self.listener.url, 'job', 12)
+        Jenkins('http://jenkins').wait_for_build('job',
+                                                 listener=self.listener)
+        last_result.assert_called_once_with('job')
+
+    @patch('autojenkins.jobs.Jenkins.last_result')
+    def test_wait_for_build_falls_back_to_polling(self, last_result):
+        last_result.side_effect = [{'building': True, 'number': 12},
+                                   {'building': False, 'number': 12}]
+        Jenkins('http://jenkins').wait_for_build(
+            'job', listener=self.listener, fallback_interval=0.05)
+        self.assertEqual(2, last_result.call_count)
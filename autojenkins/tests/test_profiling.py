@@ -0,0 +1,39 @@
+import io
+from unittest import TestCase
+
+from autojenkins import profiling
+from autojenkins.jobs import Jenkins
+from autojenkins.tests.server import FakeJenkinsServer
+
+
+JOBS = str({'jobs': [{'name': 'job1', 'color': 'blue'}]})
+
+
+class TestProfiler(TestCase):
+
+    def test_disabled_by_default(self):
+        self.assertIsNone(profiling.active())
+        with profiling.request('GET', 'http://x') as timing:
+            self.assertIsNone(timing)
+
+    def test_records_phases_and_requests(self):
+        routes = {('GET', '/api/python'): (200, {}, JOBS)}
+        with FakeJenkinsServer(routes) as server:
+            profiler = profiling.Profiler().enable()
+            try:
+                self.assertEqual([('job1', 'blue')],
+                                 Jenkins(server.url).all_jobs())
+            finally:
+                profiler.disable()
+        self.assertEqual(['http', 'parse'], profiler.order)
+        self.assertEqual(1, profiler.phases['parse'][0])
+        [timing] = profiler.requests
+        self.assertEqual(('GET', 200), (timing.method, timing.status))
+        self.assertGreater(timing.connect, 0)
+        self.assertGreater(timing.size, 0)
+        self.assertAlmostEqual(timing.total, timing.connect +
+                               timing.headers + timing.transfer, places=3)
+        output = io.StringIO()
+        profiler.report(output)
+        self.assertIn('/api/python', output.getvalue())
+        self.assertIsNone(profiling.active())
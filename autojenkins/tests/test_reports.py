@@ -0,0 +1,134 @@
+from unittest import TestCase
+
+from mock import Mock
+
+from autojenkins import reports
+from autojenkins.jobs import JOBINFO, HttpNotFoundError
+
+
+def report(cases):
+    """
+    Build a test report of one suite from ``(name, duration, status)``.
+    """
+    return {'suites': [{'cases': [
+        {'className': 'pkg.Test', 'name': name, 'duration': duration,
+         'status': status} for name, duration, status in cases]}]}
+
+
+def response(data):
+    result = Mock()
+    result.text = str(data)
+    return result
+
+
+class FakeReports(object):
+    """
+    Serve the test reports of the builds of one job, by build number.
+    """
+
+    def __init__(self, reports, running=(), missing=()):
+        self.reports = reports
+        self.running = running
+        self.missing = missing
+        self.jenkins = Mock()
+        self.jenkins._build_get.side_effect = self.get
+
+    def get(self, pattern, *args, **kwargs):
+        if pattern == JOBINFO:
+            numbers = sorted(set(self.reports) | set(self.running) |
+                             set(self.missing), reverse=True)
+            return response({'builds': [
+                {'number': number, 'building': number in self.running}
+                for number in numbers]})
+        assert kwargs['params'] == {'tree': reports.REPORT_TREE}
+        if args[1] not in self.reports:
+            raise HttpNotFoundError('HTTP Status: 404')
+        return response(self.reports[args[1]])
+
+
+class TestReportHistory(TestCase):
+
+    def test_columns_per_build(self):
+        history = reports.ReportHistory()
+        history.add(2, *reports.flatten(report([('a', 1.5, 'PASSED'),
+                                                ('b', 2, 'FAILED')])))
+        history.add(1, *reports.flatten(report([('a', 1, 'PASSED')])))
+        history.add(3, *reports.flatten(report([('c', 4, 'SKIPPED'),
+                                                ('a', 0.5, 'FIXED')])))
+        self.assertEqual(['pkg.Test.a', 'pkg.Test.b', 'pkg.Test.c'],
+                         history.tests)
+        self.assertEqual([1, 2, 3], history.builds)
+        self.assertEqual([(1, 1, 0), (2, 1.5, 0), (3, 0.5, 1)],
+                         history.runs(0))
+        self.assertEqual([(2, 2, 2)], history.runs(1))
+        self.assertEqual([], history.runs(2))
+
+
+class TestFetchTestHistory(TestCase):
+
+    def test_skips_running_builds_and_builds_without_report(self):
+        fake = FakeReports({1: report([('a', 1, 'PASSED')]),
+                            3: report([('a', 2, 'PASSED')])},
+                           running=[4], missing=[2])
+        history = reports.fetch_test_history(fake.jenkins, 'job', limit=4)
+        self.assertEqual([1, 3], history.builds)
+        self.assertEqual('job', history.jobname)
+        requested = [call[0][2] for call in
+                     fake.jenkins._build_get.call_args_list
+                     if call[0][0] == reports.REPORT]
+        self.assertEqual([1, 2, 3], sorted(requested))
+
+    def test_other_errors_are_raised(self):
+        jenkins = Mock()
+        jenkins._build_get.side_effect = [
+            response({'builds': [{'number': 1}]}), ValueError('boom')]
+        self.assertRaises(ValueError, reports.fetch_test_history, jenkins,
+                          'job')
+
+
+class TestRankings(TestCase):
+
+    def setUp(self):
+        super(TestRankings, self).setUp()
+        self.history = reports.ReportHistory('job')
+        flaky = ['PASSED', 'FAILED', 'PASSED', 'PASSED', 'FAILED', 'PASSED']
+        broken = ['PASSED'] * 3 + ['FAILED'] * 3
+        for number in range(1, 7):
+            slow = 2 if number <= 3 else 8
+            self.history.add(number, *reports.flatten(report([
+                ('fast', 0.25, 'PASSED'),
+                ('steady', 5, 'PASSED'),
+                ('slowing', slow, 'PASSED'),
+                ('flaky', 1, flaky[number - 1]),
+                ('broken', 1, broken[number - 1])])))
+
+    def test_slowest(self):
+        slowest = reports.slowest(self.history, 2)
+        self.assertEqual(['pkg.Test.slowing', 'pkg.Test.steady'],
+                         [timing.name for timing in slowest])
+        self.assertEqual(reports.CaseTiming('pkg.Test.slowing', 6, 5, 8),
+                         slowest[0])
+
+    def test_regressions(self):
+        found = reports.regressions(self.history, window=3)
+        self.assertEqual([reports.CaseRegression('pkg.Test.slowing', 2, 8)],
+                         found)
+        self.assertEqual(6, found[0].delta)
+        self.assertEqual([], reports.regressions(self.history, window=4))
+
+    def test_flaky(self):
+        self.assertEqual([reports.FlakyCase('pkg.Test.flaky', 6, 2, 4)],
+                         reports.flaky(self.history))
+        self.assertEqual(['pkg.Test.flaky', 'pkg.Test.broken'],
+                         [case.name for case in
+                          reports.flaky(self.history, min_flips=1)])
+
+    def test_large_report(self):
+        history = reports.ReportHistory()
+        cases = [('t{0}'.format(i), i % 7, 'PASSED') for i in range(50000)]
+        for number in range(1, 4):
+            history.add(number, *reports.flatten(report(cases)))
+        self.assertEqual(50000, len(history.tests))
+        self.assertEqual(50000 * 4, history.durations[1].itemsize *
+                         len(history.durations[1]))
+        self.assertEqual(6, reports.slowest(history, 1)[0].median)
@@ -1,7 +1,12 @@
-from mock import Mock, patch
+from mock import ANY, Mock, patch
 from nose.tools import assert_equals
 
-from autojenkins.run import delete_jobs
+from autojenkins.batch import BuildOutcome
+from autojenkins.daemon import DaemonTransport
+from autojenkins.run import (build_jobs, delete_jobs, get_client, get_format,
+                             get_targets, grep_builds, list_jobs,
+                             list_federated_jobs, parse_query, print_job,
+                             toggle_jobs)
 
 
 @patch('autojenkins.run.Jenkins')
@@ -9,7 +14,8 @@ def test_delete_jobs(jenkins):
     jenkins.return_value = Mock()
     delete_jobs('http://jenkins', ['hello', 'bye'], None)
     jenkins.assert_called_with('http://jenkins',
-                               proxies={'http': '', 'https': ''}, auth=None)
+                               proxies={'http': '', 'https': ''}, auth=None,
+                               transport=ANY)
     assert_equals(2, jenkins.return_value.delete.call_count)
     assert_equals(
         [(('hello',), {}), (('bye',), {})],
@@ -27,8 +33,107 @@ def test_delete_jobs_authenticated(job_exists, jenkins):
     options['--proxy'] = ''
     delete_jobs('http://jenkins', ['hello'], options)
     jenkins.assert_called_with('http://jenkins', auth=('carles', 'secret'),
-                               proxies={'http': '', 'https': ''})
+                               proxies={'http': '', 'https': ''},
+                               transport=ANY)
     assert_equals(1, jenkins.return_value.delete.call_count)
     assert_equals(
         [(('hello',), {})],
         jenkins.return_value.delete.call_args_list)
+
+
+@patch('autojenkins.run.Jenkins')
+def test_build_jobs_fails_if_any_build_fails(jenkins):
+    jenkins.return_value.build_many.return_value = [
+        BuildOutcome('a', None, 1, 5, 'SUCCESS', None),
+        BuildOutcome('b', None, 2, 9, 'FAILURE', None)]
+    options = {'--wait': True, '--parallel': '4', '--user': None,
+               '--proxy': None}
+    assert_equals(False, build_jobs('http://jenkins', ['a', 'b'], options))
+    jenkins.return_value.build_many.assert_called_once_with(
+        ['a', 'b'], wait=True, workers=4)
+
+
+@patch('autojenkins.run.print', create=True)
+def test_print_job_with_unknown_color(print_):
+    FORMAT, position = get_format(color=False)
+    print_job('job', 'purple_anime', FORMAT, position)
+    print_.assert_called_once_with('* PURPLE     job')
+
+
+@patch('autojenkins.run.sys')
+@patch('autojenkins.run.listing.iter_jobs')
+@patch('autojenkins.run.Jenkins')
+def test_list_jobs_streams_tsv(jenkins, iter_jobs, sys):
+    iter_jobs.return_value = iter([('a', 'red')])
+    options = {'--user': None, '--proxy': None, '--match': 'a',
+               '--color': [], '--status': ['failed'], '--offset': '0',
+               '--limit': None, '--page-size': '500', '--format': 'tsv'}
+    list_jobs('http://jenkins', options)
+    iter_jobs.assert_called_once_with(
+        jenkins.return_value, pattern='a', colors=[], statuses=['failed'],
+        offset=0, limit=None, page_size=500)
+    sys.stdout.write.assert_called_once_with('a\tFAILED\tred\n')
+
+
+@patch('autojenkins.run.sys')
+@patch('autojenkins.run.FederatedJenkins')
+@patch('autojenkins.run.Jenkins')
+def test_list_federated_jobs_pages_and_formats(jenkins, federated, sys):
+    federated.return_value.all_jobs.return_value = ([
+        ('http://a', 'x', 'blue'), ('http://a', 'y', 'red'),
+        ('http://b', 'x', 'red'), ('http://b', 'z', 'red')], {})
+    options = {'--user': None, '--proxy': None, '--match': None,
+               '--color': ['red'], '--status': [], '--offset': '1',
+               '--limit': '1', '--format': 'tsv'}
+    assert_equals(True, list_federated_jobs(['http://a', 'http://b'],
+                                            options))
+    jenkins.assert_called_with('http://b', proxies={'http': '', 'https': ''},
+                               auth=None, transport=ANY, timeout=30)
+    sys.stdout.write.assert_has_calls([(('http://b\t',),),
+                                       (('x\tFAILED\tred\n',),)])
+    assert_equals(2, sys.stdout.write.call_count)
+
+
+def test_parse_query():
+    assert_equals({'scm': 'github.com/acme', 'label': 'linux',
+                   'any': 'https://svn.acme.com'},
+                  parse_query(['scm:github.com/acme', 'label:linux',
+                               'https://svn.acme.com']))
+
+
+@patch('autojenkins.run.bulk.set_enabled')
+@patch('autojenkins.run.Jenkins')
+def test_toggle_jobs_splits_names_and_globs(jenkins, set_enabled):
+    set_enabled.return_value = []
+    options = {'--user': None, '--proxy': None, '--match': None,
+               '--color': ['blue'], '--parallel': '4', '--dry-run': False}
+    assert_equals(True, toggle_jobs('http://jenkins', False,
+                                    ['release-*', 'deploy'], options))
+    set_enabled.assert_called_once_with(jenkins.return_value, False,
+                                        ['deploy'], ['release-*'], None,
+                                        ['blue'], 4, False)
+
+
+@patch('autojenkins.run.Jenkins')
+def test_clients_go_through_the_daemon(jenkins):
+    get_client('http://jenkins', None, timeout=5)
+    kwargs = jenkins.call_args[1]
+    assert isinstance(kwargs['transport'], DaemonTransport)
+    assert_equals(5, kwargs['timeout'])
+
+
+def test_get_targets():
+    assert_equals([('a', 3), ('a', 4), ('b', 3), ('b', 4)],
+                  get_targets(['a', 'b'], '3-4'))
+    assert_equals([('a', 'lastBuild')], get_targets(['a'], 'lastBuild'))
+
+
+@patch('autojenkins.run.print', create=True)
+@patch('autojenkins.run.Jenkins')
+def test_grep_builds_rejects_bad_ranges(jenkins, print_):
+    for builds in ['5-', 'a-b']:
+        options = {'--builds': builds}
+        assert_equals(False, grep_builds('http://jenkins', 'x', ['a'],
+                                         options))
+    assert_equals(0, jenkins.call_count)
+    assert_equals(2, print_.call_count)
@@ -0,0 +1,155 @@
+import itertools
+from unittest import TestCase
+
+from mock import MagicMock, Mock, patch
+
+from autojenkins.deadline import DeadlineExceeded
+from autojenkins.jobs import QUEUE, JobInexistent
+from autojenkins.scheduler import (COMPUTERS, BuildScheduler, LabelUnavailable,
+                                   Load)
+
+
+def computer(labels, idle, busy=0, offline=False):
+    return {'offline': offline,
+            'assignedLabels': [{'name': label} for label in labels],
+            'executors': [{'idle': True}] * idle + [{'idle': False}] * busy}
+
+
+def response(data, location=None):
+    result = Mock()
+    result.text = str(data)
+    result.headers = {'Location': location} if location else {}
+    return result
+
+
+class FakeController(object):
+    """
+    Serve the listing, node and queue APIs from a list of load snapshots.
+    """
+
+    def __init__(self, loads):
+        self.loads = iter(loads)
+        self.triggered = []
+        self.queue_ids = iter(range(1, 1000))
+        self.jenkins = MagicMock()
+        self.jenkins._build_get.side_effect = self.get
+        self.jenkins._trigger.side_effect = self.trigger
+
+    def get(self, pattern, params=None):
+        if pattern == COMPUTERS:
+            self.computers, self.queue = next(self.loads)
+            return response({'computer': self.computers})
+        elif pattern == QUEUE:
+            return response({'items': [{'id': i} for i in self.queue]})
+        return response({'jobs': [{'name': name, 'buildable': True}
+                                  for name in 'abcdef']})
+
+    def trigger(self, jobname, params):
+        self.triggered.append(jobname)
+        return response('', '/queue/item/%d/' % next(self.queue_ids))
+
+
+class TestLoad(TestCase):
+
+    def test_counts_executors_per_label(self):
+        load = Load([computer(['linux'], 2, 1),
+                     computer(['linux', 'big'], 1, 3),
+                     computer(['windows'], 4),
+                     computer(['linux'], 5, offline=True)],
+                    [{'id': 7}], labels=['linux', 'windows'])
+        self.assertEqual({None: 7, 'linux': 3, 'windows': 4}, load.idle)
+        self.assertEqual({None: 4, 'linux': 4, 'windows': 0}, load.busy)
+        self.assertEqual(set([7]), load.queued)
+
+
+@patch('autojenkins.scheduler.time')
+class TestBuildScheduler(TestCase):
+
+    def test_releases_by_priority_within_idle_executors(self, time):
+        controller = FakeController([
+            ([computer([], 2)], []),
+            ([computer([], 1, 1)], [1]),
+            ([computer([], 2)], []),
+        ])
+        scheduler = BuildScheduler(controller.jenkins)
+        scheduler.submit('a')
+        scheduler.submit('b', priority=5)
+        scheduler.submit('c')
+        scheduler.submit('d', priority=1)
+        outcomes = scheduler.run()
+        self.assertEqual(set(['b', 'd']), set(controller.triggered[:2]))
+        self.assertEqual(set(['a', 'c']), set(controller.triggered[2:]))
+        self.assertEqual(['a', 'b', 'c', 'd'],
+                         [outcome.jobname for outcome in outcomes])
+        self.assertEqual(2, time.sleep.call_count)
+
+    def test_respects_label_limits(self, time):
+        linux = computer(['linux'], 3)
+        controller = FakeController([
+            ([computer(['windows'], 3, 1), linux], []),
+            ([computer(['windows'], 3, 1), linux], [1]),
+            ([computer(['windows'], 4), linux], []),
+        ])
+        scheduler = BuildScheduler(controller.jenkins,
+                                   label_limits={'windows': 2})
+        for job in 'abc':
+            scheduler.submit(job, label='windows')
+        scheduler.submit('d', label='linux')
+        scheduler.submit('e')
+        scheduler.run()
+        self.assertEqual(set(['a', 'd', 'e']), set(controller.triggered[:3]))
+        self.assertEqual(set(['b', 'c']), set(controller.triggered[3:]))
+        self.assertEqual(2, time.sleep.call_count)
+
+    def test_unknown_jobs_are_not_triggered(self, time):
+        controller = FakeController([([computer([], 1)], [])])
+        scheduler = BuildScheduler(controller.jenkins)
+        scheduler.submit('zzz')
+        [outcome] = scheduler.run()
+        self.assertIsInstance(outcome.error, JobInexistent)
+        self.assertEqual([], controller.triggered)
+
+    def test_labels_without_online_nodes_fail(self, time):
+        controller = FakeController([
+            ([computer(['linux'], 2), computer(['windows'], 2, offline=True)],
+             [])])
+        scheduler = BuildScheduler(controller.jenkins)
+        scheduler.submit('a', label='windows')
+        scheduler.submit('b', label='linux')
+        outcomes = scheduler.run()
+        self.assertIsInstance(outcomes[0].error, LabelUnavailable)
+        self.assertEqual(['b'], controller.triggered)
+
+    def test_only_own_queue_items_hold_triggers_back(self, time):
+        controller = FakeController([
+            ([computer([], 2)], [100, 101, 102]),
+        ])
+        scheduler = BuildScheduler(controller.jenkins)
+        scheduler.submit('a')
+        scheduler.submit('b')
+        scheduler.run()
+        self.assertEqual(set(['a', 'b']), set(controller.triggered))
+
+    def test_releases_one_trigger_without_executors(self, time):
+        controller = FakeController([
+            ([], []),
+            ([], [1]),
+            ([computer([], 0, 1)], []),
+        ])
+        scheduler = BuildScheduler(controller.jenkins)
+        scheduler.submit('a')
+        scheduler.submit('b')
+        scheduler.run()
+        self.assertEqual(['a', 'b'], controller.triggered)
+        self.assertEqual(2, time.sleep.call_count)
+
+    def test_deadline(self, time):
+        controller = FakeController(itertools.repeat(
+            ([computer(['linux'], 0, 2)], [])))
+        scheduler = BuildScheduler(controller.jenkins, poll_interval=0.01)
+        scheduler.submit('a', label='linux')
+        with self.assertRaises(DeadlineExceeded) as raised:
+            scheduler.run(deadline=0.05)
+        self.assertEqual([None], [outcome.queue_id
+                                  for outcome in raised.exception.progress])
+        self.assertEqual([], controller.triggered)
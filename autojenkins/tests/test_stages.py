@@ -0,0 +1,112 @@
+import json
+from unittest import TestCase
+
+from mock import Mock
+
+from autojenkins import stages
+from autojenkins.jobs import LIST, HttpNotFoundError, HttpUnauthorized
+
+
+def run(number, durations, status='SUCCESS'):
+    return {'id': str(number), 'status': status,
+            'stages': [{'name': name, 'status': 'SUCCESS',
+                        'durationMillis': duration}
+                       for name, duration in durations]}
+
+
+def response(data, as_json=True):
+    result = Mock()
+    result.text = json.dumps(data) if as_json else str(data)
+    return result
+
+
+class FakePipelines(object):
+    """
+    Serve ``wfapi`` runs of pipelines, returning at most ``page`` runs to
+    ``wfapi/runs`` like the stage view plugin does.
+    """
+
+    def __init__(self, runs, page=10):
+        self.runs = runs
+        self.page = page
+        self.described = []
+        self.jenkins = Mock()
+        self.jenkins._build_get.side_effect = self.get
+
+    def get(self, pattern, *args, **kwargs):
+        if pattern == LIST:
+            return response({'jobs': [
+                {'name': name, 'lastBuild': {'number': len(runs)}}
+                for name, runs in self.runs.items()] +
+                [{'name': 'freestyle', 'lastBuild': {'number': 1}}]},
+                as_json=False)
+        jobname = args[0]
+        if jobname not in self.runs:
+            raise HttpNotFoundError('HTTP Status: 404')
+        if pattern == stages.RUNS:
+            since = int(kwargs['params']['since'][1:])
+            newest = [r for r in reversed(self.runs[jobname])
+                      if int(r['id']) > since]
+            return response(newest[:self.page])
+        self.described.append(args)
+        return response(self.runs[jobname][args[1] - 1])
+
+
+class TestStageHistory(TestCase):
+
+    def test_skips_running_builds_and_stages_not_executed(self):
+        history = stages.StageHistory()
+        self.assertFalse(history.add('p', run(3, [('a', 1)], 'IN_PROGRESS')))
+        second = run(2, [('build', 10), ('test', 20)])
+        second['stages'][1]['status'] = 'NOT_EXECUTED'
+        history.add('p', second)
+        history.add('p', run(1, [('build', 12), ('test', 30)]))
+        self.assertEqual(3, len(history))
+        self.assertEqual(['build', 'test'], history.stages)
+        self.assertEqual({('p', 'build'): [(1, 12.0), (2, 10.0)],
+                          ('p', 'test'): [(1, 30.0)]}, history.series())
+
+
+class TestFetchStageHistory(TestCase):
+
+    def test_reads_runs_in_bulk_and_describes_the_rest(self):
+        fake = FakePipelines({'p': [run(n, [('build', n)])
+                                    for n in range(1, 16)]}, page=10)
+        history = stages.fetch_stage_history(fake.jenkins,
+                                             ['p', 'freestyle', 'none'],
+                                             limit=12, workers=2)
+        self.assertEqual(list(range(4, 16)),
+                         [n for n, _ in history.series()[('p', 'build')]])
+        self.assertEqual([('p', 4), ('p', 5)], sorted(fake.described))
+        fake.jenkins._build_get.assert_any_call(
+            stages.RUNS, 'p', params={'fullStages': 'true', 'since': '#3'})
+
+    def test_other_errors_are_raised(self):
+        fake = FakePipelines({'p': [run(1, [('build', 1)])]})
+        fake.get = Mock(side_effect=HttpUnauthorized('HTTP Status: 401'))
+        fake.jenkins._build_get.side_effect = lambda pattern, *args, **kw: (
+            FakePipelines.get(fake, pattern) if pattern == LIST
+            else fake.get(pattern, *args, **kw))
+        self.assertRaises(HttpUnauthorized, stages.fetch_stage_history,
+                          fake.jenkins, ['p'])
+
+
+class TestRegressions(TestCase):
+
+    def test_flags_stages_slower_than_rolling_baseline(self):
+        history = stages.StageHistory()
+        for number in range(1, 13):
+            test = 60000 if number < 12 else 100000
+            build = 20000 if number != 8 else 24000
+            history.add('p', run(number, [('build', build), ('test', test)]))
+        found = stages.regressions(history, window=5, threshold=0.5,
+                                   min_delta=5000)
+        self.assertEqual([stages.StageRegression('p', 'test', 12, 100000.0,
+                                                 60000.0)], found)
+        self.assertAlmostEqual(1.667, found[0].ratio, places=3)
+        self.assertEqual([], stages.regressions(history, window=5,
+                                                threshold=0.5,
+                                                min_delta=50000))
+        summary = stages.summarize_stages(history)
+        self.assertEqual(12, summary[('p', 'test')]['runs'])
+        self.assertEqual(100000, summary[('p', 'test')]['last'])
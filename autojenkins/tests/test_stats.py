@@ -0,0 +1,83 @@
+import math
+from unittest import TestCase
+
+from mock import Mock
+
+from autojenkins import stats
+
+
+def build(number, duration, result='SUCCESS', queue=None, timestamp=None):
+    actions = [{}]
+    if queue is not None:
+        actions.append({'queuingDurationMillis': queue})
+    return {'number': number, 'duration': duration, 'result': result,
+            'timestamp': timestamp or number * stats.MS_PER_DAY,
+            'actions': actions}
+
+
+class TestStats(TestCase):
+
+    def test_percentile(self):
+        self.assertEqual(2.5, stats.percentile([4, 1, 3, 2], 50))
+        self.assertEqual(4, stats.percentile([4, 1, 3, 2], 100))
+        self.assertEqual(1, stats.percentile([1, float('nan')], 95))
+        self.assertTrue(math.isnan(stats.percentile([], 50)))
+
+    def test_moving_average(self):
+        self.assertEqual([1.5, 2.5, 3.5],
+                         list(stats.moving_average([1, 2, 3, 4], 2)))
+        self.assertEqual([], stats.moving_average([1], 2))
+
+    def test_slope(self):
+        self.assertEqual(2.0, stats.slope([0, 1, 2], [1, 3, 5]))
+        self.assertTrue(math.isnan(stats.slope([0, 1], [1, float('nan')])))
+
+    def test_history_skips_running_builds(self):
+        history = stats.History()
+        history.add('job', [build(3, 0, result=None), build(2, 1000),
+                            build(1, 2000, 'FAILURE', queue=500)])
+        self.assertEqual(2, len(history))
+        self.assertEqual([2, 1], list(history.number))
+        self.assertTrue(math.isnan(history.queue_wait[0]))
+        self.assertEqual(500, history.queue_wait[1])
+
+    def test_summarize_jobs(self):
+        history = stats.History()
+        history.add('a', [build(n, 1000 * n, 'FAILURE' if n % 2 else
+                                'SUCCESS', queue=100) for n in range(1, 5)])
+        history.add('b', [build(1, 5000)])
+        summaries = stats.summarize_jobs(history)
+        self.assertEqual(4, summaries['a']['builds'])
+        self.assertEqual(0.5, summaries['a']['failure_rate'])
+        self.assertEqual(2500, summaries['a']['duration_p50'])
+        self.assertEqual(1000, summaries['a']['duration_trend'])
+        self.assertEqual(100, summaries['a']['queue_p95'])
+        self.assertEqual(5, stats.summarize(history)['builds'])
+
+    def test_summary_moving_average(self):
+        history = stats.History()
+        history.add('a', [build(n, 1000 * n) for n in (3, 2, 1)])
+        history.add('b', [build(1, 5000)])
+        summaries = stats.summarize_jobs(history, window=2)
+        self.assertEqual([1500, 2500], summaries['a']['duration_average'])
+        self.assertEqual([5000], summaries['b']['duration_average'])
+
+    def test_fetch_history_of_all_jobs_in_one_request(self):
+        jenkins = Mock()
+        jenkins._build_get.return_value = Mock(text=str({'jobs': [
+            {'name': 'a', 'builds': [build(1, 10)]},
+            {'name': 'b'}]}))
+        history = stats.fetch_history(jenkins, limit=5)
+        self.assertEqual(['a', 'b'], history.jobs)
+        self.assertEqual(1, jenkins._build_get.call_count)
+        tree = jenkins._build_get.call_args[1]['params']['tree']
+        self.assertTrue(tree.startswith('jobs[name,builds[number,'))
+        self.assertTrue(tree.endswith(']{0,5}]'))
+
+    def test_fetch_history_per_job(self):
+        jenkins = Mock()
+        jenkins._build_get.side_effect = lambda pattern, name, params: Mock(
+            text=str({'builds': [build(1, 10), build(2, 30)]}))
+        history = stats.fetch_history(jenkins, ['a', 'b'], workers=2)
+        self.assertEqual(4, len(history))
+        self.assertEqual(20, stats.summarize(history)['duration_p50'])
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+import json
+from unittest import TestCase
+
+from autojenkins.jobs import Jenkins
+from autojenkins.streaming import StreamError, iter_json
+from autojenkins.transport import MemoryTransport
+
+
+REPORT = {
+    'duration': 12.5,
+    'skipped': {'nested': [[1, 2, {'cases': 'not these'}], '[{]}'], 'n': 1},
+    'suites': [
+        {'name': 'first', 'cases': [
+            {'name': u'caf\xe9 ☃', 'duration': 1234567, 'status': 'PASSED'},
+            {'name': 'quote "]}', 'duration': 0.25, 'status': None}]},
+        {'name': 'empty', 'cases': []},
+        {'name': 'none', 'cases': None},
+        {'name': 'last', 'cases': [{'name': 'z', 'duration': -1e-3}]},
+    ],
+    'total': 3,
+}
+CASES = [case for suite in REPORT['suites'] for case in suite['cases'] or []]
+
+
+def chunked(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class TestIterJson(TestCase):
+
+    def test_any_chunk_size(self):
+        data = json.dumps(REPORT, indent=1).encode('utf-8')
+        for size in (1, 2, 3, 7, 64, len(data)):
+            self.assertEqual(CASES, list(iter_json(chunked(data, size),
+                                                   ('suites', 'cases'))),
+                             size)
+
+    def test_top_level_array(self):
+        data = b' [1, 22, 333] '
+        self.assertEqual([1, 22, 333], list(iter_json(chunked(data, 1), ())))
+
+    def test_missing_path(self):
+        self.assertEqual([], list(iter_json([b'{"jobs": null}'], ('jobs',))))
+        self.assertEqual([], list(iter_json([b'{"views": []}'], ('jobs',))))
+
+    def test_yields_before_download_ends(self):
+        read = []
+
+        def chunks():
+            for chunk in chunked(b'{"jobs": [{"name": "a"}, {"name": "b"}]}',
+                                 4):
+                read.append(chunk)
+                yield chunk
+        items = iter_json(chunks(), ('jobs',))
+        self.assertEqual({'name': 'a'}, next(items))
+        self.assertTrue(len(read) < 10)
+
+    def test_truncated_document(self):
+        data = json.dumps(REPORT).encode('utf-8')
+        with self.assertRaises(StreamError):
+            list(iter_json(chunked(data[:-30], 16), ('suites', 'cases')))
+
+    def test_trailing_data(self):
+        with self.assertRaises(StreamError):
+            list(iter_json([b'{"jobs": []} {'], ('jobs',)))
+
+
+class TestJenkinsStreams(TestCase):
+
+    def setUp(self):
+        super(TestJenkinsStreams, self).setUp()
+        jobs = {'jobs': [{'name': 'job1', 'color': 'blue'},
+                         {'name': 'folder'}]}
+        self.jenkins = Jenkins('http://jenkins', transport=MemoryTransport({
+            ('GET', '/api/json?tree=jobs%5Bname%2Ccolor%5D'):
+                (200, {}, json.dumps(jobs)),
+            ('GET', '/job/job1/api/json?tree=builds%5Bnumber%5D'):
+                (200, {}, json.dumps({'builds': [{'number': 2},
+                                                 {'number': 1}]})),
+            ('GET', '/job/job1/lastBuild/testReport/api/json?tree=suites%5B'
+             'cases%5BclassName%2Cname%2Cduration%2Cstatus%5D%5D'):
+                (200, {}, json.dumps(REPORT)),
+        }))
+
+    def test_iter_jobs(self):
+        self.assertEqual([('job1', 'blue')], list(self.jenkins.iter_jobs()))
+        self.assertEqual([('job1', 'blue'), ('folder', None)],
+                         list(self.jenkins.iter_jobs(include_colorless=True)))
+
+    def test_iter_builds(self):
+        self.assertEqual([{'number': 2}, {'number': 1}],
+                         list(self.jenkins.iter_builds('job1', 'number')))
+
+    def test_iter_test_cases(self):
+        self.assertEqual(CASES, list(self.jenkins.iter_test_cases('job1')))
@@ -0,0 +1,79 @@
+from unittest import TestCase
+
+from mock import Mock, patch
+
+from autojenkins.jobs import LIST, HttpNotFoundError
+from autojenkins.sync import (ADDED, CHANGED, REMOVED, JobChange, JobState,
+                              JobSync)
+
+
+def summary(*jobs):
+    response = Mock()
+    response.text = str({'jobs': [
+        {'name': name, 'color': color,
+         'lastBuild': {'number': number} if number else None}
+        for name, color, number in jobs]})
+    return response
+
+
+class TestJobSync(TestCase):
+
+    def setUp(self):
+        self.jenkins = Mock()
+        self.jenkins.build_info.side_effect = lambda name, number: {
+            'job': name}
+        self.sync = JobSync(self.jenkins, workers=2)
+
+    def test_first_sync_adds_all_jobs(self):
+        self.jenkins._build_get.return_value = summary(
+            ('a', 'blue', 3), ('b', 'notbuilt', None))
+        changes = self.sync.sync()
+        self.assertEqual([
+            JobChange(ADDED, 'a', None, JobState('a', 'blue', 3),
+                      {'job': 'a'}),
+            JobChange(ADDED, 'b', None, JobState('b', 'notbuilt', None),
+                      None),
+        ], changes)
+        self.jenkins._build_get.assert_called_once_with(
+            LIST, params={'tree': 'jobs[name,color,lastBuild[number]]'})
+        self.assertEqual({'a': {'job': 'a'}}, self.sync.builds)
+        self.jenkins.build_info.assert_called_once_with('a', 3)
+
+    def test_fetches_detail_of_changed_jobs_only(self):
+        self.jenkins._build_get.return_value = summary(
+            ('a', 'blue', 3), ('b', 'blue_anime', 7), ('c', 'red', 1))
+        self.sync.sync()
+        self.jenkins.build_info.reset_mock()
+        self.jenkins._build_get.return_value = summary(
+            ('a', 'blue', 3), ('b', 'blue', 7), ('d', 'blue', 1))
+        changes = self.sync.sync()
+        self.assertEqual([(CHANGED, 'b'), (REMOVED, 'c'), (ADDED, 'd')],
+                         [(change.kind, change.name) for change in changes])
+        self.assertEqual(JobState('b', 'blue_anime', 7), changes[0].old)
+        self.assertEqual(2, self.jenkins.build_info.call_count)
+        self.assertEqual(['a', 'b', 'd'], sorted(self.sync.builds))
+
+    def test_unchanged_cycle_costs_one_request(self):
+        self.jenkins._build_get.return_value = summary(('a', 'blue', 3))
+        self.sync.sync()
+        self.assertEqual([], self.sync.sync())
+        self.assertEqual(2, self.jenkins._build_get.call_count)
+        self.assertEqual(1, self.jenkins.build_info.call_count)
+
+    def test_failed_detail_is_retried_next_cycle(self):
+        self.jenkins._build_get.return_value = summary(('a', 'blue', 3))
+        self.jenkins.build_info.side_effect = [
+            HttpNotFoundError('gone'), {'job': 'a'}]
+        self.assertEqual([], self.sync.sync())
+        [change] = self.sync.sync()
+        self.assertEqual((ADDED, {'job': 'a'}), (change.kind, change.build))
+
+    @patch('autojenkins.sync.time')
+    def test_watch_calls_back_with_changes(self, time):
+        self.jenkins._build_get.side_effect = [
+            summary(('a', 'blue', 3)), summary(('a', 'red', 4))]
+        callback = Mock()
+        self.sync.watch(callback, interval=30, cycles=2)
+        self.assertEqual([ADDED, CHANGED],
+                         [call[0][0].kind for call in callback.call_args_list])
+        time.sleep.assert_called_once_with(30)
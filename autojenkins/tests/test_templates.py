@@ -0,0 +1,147 @@
+import json
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from autojenkins.archive import UNCHANGED, UPDATED, config_hash
+from autojenkins.jobs import HttpNotFoundError, Jenkins, JobExists
+from autojenkins.templates import TemplateRegistry, TemplateRegistryError
+from autojenkins.transport import MemoryTransport
+
+
+TEMPLATE = ('<project><disabled>true</disabled>'
+            '<app>{{ app }}</app><v>1</v></project>')
+
+
+class FakeServer(object):
+    """
+    Routes of a server with template jobs and the jobs derived from them.
+    """
+
+    def __init__(self):
+        self.templates = {'deploy': TEMPLATE, 'test': '<t>{{ app }}</t>'}
+        self.configs = {}
+
+    def routes(self):
+        routes = {('GET', '/api/python'): self.list}
+        for name in self.templates:
+            routes[('GET', '/job/{0}/config.xml'.format(name))] = (
+                lambda body, name=name: (200, {}, self.templates[name]))
+        for name in ('app-a', 'app-b', 'app-c', 'gone'):
+            routes[('POST', '/createItem?name=' + name)] = self.writer(name)
+            routes[('POST', '/job/{0}/config.xml'.format(name))] = (
+                self.writer(name) if name != 'gone' else (404, {}, ''))
+        return routes
+
+    def list(self, body):
+        names = sorted(set(self.templates) | set(self.configs))
+        return 200, {}, str({'jobs': [{'name': name, 'color': 'blue'}
+                                      for name in names]})
+
+    def writer(self, name):
+        def write(body):
+            self.configs[name] = body.decode('utf-8')
+            return 200, {}, ''
+        return write
+
+
+class TestTemplateRegistry(TestCase):
+
+    def setUp(self):
+        super(TestTemplateRegistry, self).setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'templates.json')
+        self.server = FakeServer()
+        self.transport = MemoryTransport(self.server.routes())
+        self.jenkins = Jenkins('http://jenkins', transport=self.transport)
+        self.registry = TemplateRegistry(self.path, self.jenkins)
+        self.registry.create_copy('app-a', 'deploy', app='a')
+        self.registry.create_copy('app-b', 'deploy', app='b')
+        self.registry.create_copy('app-c', 'test', app='c')
+        del self.transport.requests[:]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+        super(TestTemplateRegistry, self).tearDown()
+
+    def posts(self):
+        return sorted(path for method, path, _ in self.transport.requests
+                      if method == 'POST')
+
+    def test_create_copy_records_job(self):
+        self.assertEqual('<project><disabled>false</disabled><app>a</app>'
+                         '<v>1</v></project>', self.server.configs['app-a'])
+        job = TemplateRegistry(self.path, self.jenkins).jobs['app-a']
+        self.assertEqual(('deploy', {'app': 'a'}, True), job[1:4])
+        self.assertEqual(config_hash(TEMPLATE), job.template_sha256)
+        self.assertEqual(config_hash(self.server.configs['app-a']),
+                         job.sha256)
+        self.assertEqual(['app-a', 'app-b'],
+                         [job.name for job in
+                          self.registry.derived('deploy')])
+
+    def test_create_copy_existing_job(self):
+        self.assertRaises(JobExists, self.registry.create_copy, 'app-a',
+                          'deploy', app='x')
+        self.registry.create_copy('app-a', 'deploy', force=True, app='x')
+        self.assertIn('<app>x</app>', self.server.configs['app-a'])
+
+    def test_nothing_changed(self):
+        self.assertEqual({}, self.registry.regenerate())
+        self.assertEqual([('GET', '/job/deploy/config.xml'),
+                          ('GET', '/job/test/config.xml')],
+                         sorted(request[:2] for request in
+                                self.transport.requests))
+
+    def test_only_jobs_of_changed_template_are_pushed(self):
+        self.server.templates['deploy'] = TEMPLATE.replace('<v>1', '<v>2')
+        self.assertEqual({'app-a': UPDATED, 'app-b': UPDATED},
+                         self.registry.regenerate(workers=2))
+        self.assertEqual(['/job/app-a/config.xml', '/job/app-b/config.xml'],
+                         self.posts())
+        self.assertIn('<v>2</v>', self.server.configs['app-b'])
+        self.assertEqual({}, TemplateRegistry(self.path,
+                                              self.jenkins).regenerate())
+
+    def test_unchanged_output_is_not_pushed(self):
+        self.server.templates['deploy'] = TEMPLATE.replace(
+            '{{ app }}', '{{ app }}{% if extra %}-x{% endif %}')
+        self.registry.create_copy('app-a', 'deploy', force=True, app='a',
+                                  extra=True)
+        del self.transport.requests[:]
+        self.assertEqual({'app-a': UNCHANGED, 'app-b': UNCHANGED},
+                         self.registry.regenerate())
+        self.assertEqual([], self.posts())
+
+    def test_dry_run(self):
+        self.server.templates['test'] = '<t>{{ app }}!</t>'
+        self.assertEqual({'app-c': UPDATED},
+                         self.registry.regenerate(dry_run=True))
+        self.assertEqual([], self.posts())
+        self.assertEqual({'app-c': UPDATED}, self.registry.regenerate())
+
+    def test_force(self):
+        self.assertEqual({'app-a': UNCHANGED, 'app-b': UNCHANGED,
+                          'app-c': UNCHANGED},
+                         self.registry.regenerate(force=True))
+
+    def test_errors(self):
+        self.registry.track('gone', 'test', app='g')
+        self.registry.track('orphan', 'missing', app='o')
+        outcome = self.registry.regenerate()
+        self.assertIsInstance(outcome['gone'], HttpNotFoundError)
+        self.assertIsInstance(outcome['orphan'], HttpNotFoundError)
+        self.assertEqual(UNCHANGED, outcome['app-c'])
+        self.assertNotIn('app-a', outcome)
+
+    def test_registry_of_other_server(self):
+        other = Jenkins('http://other', transport=self.transport)
+        self.assertRaises(TemplateRegistryError, TemplateRegistry, self.path,
+                          other)
+
+    def test_file_format(self):
+        with open(self.path) as registry:
+            data = json.load(registry)
+        self.assertEqual(1, data['format'])
+        self.assertEqual({'app': 'c'}, data['jobs']['app-c']['context'])
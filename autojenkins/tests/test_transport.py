@@ -0,0 +1,142 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from mock import Mock, PropertyMock, patch
+
+from autojenkins.jobs import HttpNotFoundError, Jenkins
+from autojenkins.tests.server import FakeJenkinsServer
+from autojenkins.transport import (MemoryTransport, RecordingTransport,
+                                   ReplayError, ReplayTransport,
+                                   RequestsTransport, request_key)
+
+
+JOBS = str({'jobs': [{'name': 'job1', 'color': 'blue'},
+                     {'name': 'job2', 'color': 'red'}]})
+
+
+class TestRecordReplay(TestCase):
+
+    def setUp(self):
+        super(TestRecordReplay, self).setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'jenkins.jsonl.gz')
+        building = iter([True, False])
+        routes = {
+            ('GET', '/api/python'): (200, {}, JOBS),
+            ('GET', '/job/job1/lastBuild/api/python'):
+                lambda body: (200, {}, str({'building': next(building)})),
+            ('GET', '/job/job1/1/consoleText'): (200, {}, b'\xff\x00log'),
+        }
+        with FakeJenkinsServer(routes) as server:
+            self.url = server.url
+            with RecordingTransport(RequestsTransport(), self.path) as rec:
+                jenkins = Jenkins(server.url, transport=rec)
+                jenkins.all_jobs()
+                jenkins.last_build_info('job1')
+                jenkins.last_build_info('job1')
+                jenkins.console_text('job1', 1)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+        super(TestRecordReplay, self).tearDown()
+
+    def test_replay_without_network(self):
+        jenkins = Jenkins(self.url, transport=ReplayTransport(self.path))
+        self.assertEqual([('job1', 'blue'), ('job2', 'red')],
+                         jenkins.all_jobs())
+        self.assertEqual(b'\xff\x00log', jenkins.console_text('job1', 1))
+
+    def test_replay_serves_responses_in_order(self):
+        jenkins = Jenkins(self.url, transport=ReplayTransport(self.path))
+        self.assertEqual([True, False, False],
+                         [jenkins.last_build_info('job1')['building']
+                          for _ in range(3)])
+
+    def test_replay_unknown_request(self):
+        jenkins = Jenkins(self.url, transport=ReplayTransport(self.path))
+        with self.assertRaises(ReplayError):
+            jenkins.job_info('other')
+
+    @patch('autojenkins.transport.time')
+    def test_replay_with_scaled_latency(self, time):
+        replay = ReplayTransport(self.path, latency_scale=2.5)
+        [record] = replay._responses[request_key('GET',
+                                                 self.url + '/api/python')]
+        Jenkins(self.url, transport=replay).all_jobs()
+        time.sleep.assert_called_once_with(record['elapsed'] * 2.5)
+
+
+class TestRecordStreams(TestCase):
+
+    def setUp(self):
+        super(TestRecordStreams, self).setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'jenkins.jsonl.gz')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+        super(TestRecordStreams, self).tearDown()
+
+    def ranged(self, method, url, headers=None, stream=False):
+        start, end = map(int, headers['Range'][6:].split('-'))
+        response = Mock(status_code=206, headers={})
+        type(response).content = PropertyMock(
+            side_effect=AssertionError('Streamed body read at once'))
+        response.iter_content.side_effect = lambda size: iter(
+            [b'%d' % number for number in range(start, end + 1)])
+        return response
+
+    def test_ranges_and_streams(self):
+        upstream = Mock()
+        upstream.request.side_effect = self.ranged
+        url = 'http://j/job/a/1/artifact/file'
+        with RecordingTransport(upstream, self.path) as recorder:
+            for start in (0, 5):
+                headers = {'Range': 'bytes={0}-{1}'.format(start, start + 4)}
+                response = recorder.request('GET', url, headers=headers,
+                                            stream=True)
+                list(response.iter_content(2))
+                response.close()
+        replay = ReplayTransport(self.path)
+        self.assertEqual(b'56789', replay.request(
+            'GET', url, headers={'range': 'bytes=5-9'}).content)
+        self.assertEqual(b'01234', replay.request(
+            'GET', url, headers={'Range': 'bytes=0-4'}).content)
+        with self.assertRaises(ReplayError):
+            replay.request('GET', url)
+
+
+class TestMemoryTransport(TestCase):
+
+    def setUp(self):
+        super(TestMemoryTransport, self).setUp()
+        self.configs = {}
+
+        def write(body):
+            self.configs['job1'] = body
+            return 200, {}, ''
+        self.transport = MemoryTransport({
+            ('GET', '/api/python'): (200, {}, JOBS),
+            ('GET', '/api/python?tree=jobs%5Bname%5D'):
+                (200, {}, str({'jobs': [{'name': 'job1'}]})),
+            ('POST', '/job/job1/config.xml'): write,
+        })
+        self.jenkins = Jenkins('http://jenkins', transport=self.transport)
+
+    def test_routes_by_path_and_query(self):
+        self.assertEqual([('job1', 'blue'), ('job2', 'red')],
+                         self.jenkins.all_jobs())
+        response = self.jenkins._build_get('{0}/api/python',
+                                           params={'tree': 'jobs[name]'})
+        self.assertEqual("{'jobs': [{'name': 'job1'}]}", response.text)
+
+    def test_request_body(self):
+        self.jenkins.set_config_xml('job1', '<project/>')
+        self.assertEqual(b'<project/>', self.configs['job1'])
+        self.assertEqual(('POST', '/job/job1/config.xml', b'<project/>'),
+                         self.transport.requests[-1])
+
+    def test_unknown_route(self):
+        self.assertRaises(HttpNotFoundError, self.jenkins.job_info, 'job3')
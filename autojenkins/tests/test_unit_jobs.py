@@ -3,9 +3,11 @@ from os import path
 from unittest import TestCase
 
 from ddt import ddt, data
-from mock import Mock, patch
+from mock import patch
 
-from autojenkins.jobs import Jenkins, HttpNotFoundError, HttpStatusError
+from autojenkins.jobs import (Jenkins, HttpForbidden, HttpNotFoundError,
+                              HttpStatusError)
+from autojenkins.transport import MemoryTransport
 
 
 fixture_path = path.dirname(__file__)
@@ -15,6 +17,9 @@ PY2 = sys.version_info < (3,)
 if not PY2:
     long = int
 
+SENT = {'auth': None, 'proxies': {}, 'verify': True}
+XML = {'Content-Type': 'application/xml'}
+
 
 def load_fixture(name):
     with open(path.join(fixture_path, name)) as f:
@@ -22,16 +27,25 @@ def load_fixture(name):
     return fixture
 
 
-def mock_response(fixture=None, status=200):
-    response = Mock()
+def reply(fixture=None, status=200):
+    """
+    Return a route answering with a fixture file, a dict or nothing.
+    """
     if fixture is None:
-        response.text = ''
+        text = ''
     elif isinstance(fixture, dict):
-        response.text = str(fixture)
+        text = str(fixture)
     else:
-        response.text = load_fixture(fixture)
-    response.status_code = status
-    return response
+        text = load_fixture(fixture)
+    return status, {}, text
+
+
+def replies(*routes):
+    """
+    Return a route answering with each of ``routes`` in turn.
+    """
+    answers = iter(routes)
+    return lambda body: next(answers)
 
 
 def side_effect_job_exists(*args, **kwargs):
@@ -44,54 +58,54 @@ def side_effect_job_exists(*args, **kwargs):
 
 
 @ddt
-@patch('autojenkins.jobs.requests')
 class TestJenkins(TestCase):
 
     def setUp(self):
         super(TestJenkins, self).setUp()
-        self.jenkins = Jenkins('http://jenkins')
+        self.transport = MemoryTransport()
+        self.jenkins = Jenkins('http://jenkins', transport=self.transport)
+
+    def route(self, method, path, *args, **kwargs):
+        self.transport.routes[(method, path)] = reply(*args, **kwargs)
 
-    def test_all_jobs(self, requests):
-        response = {'jobs': [
+    def sent(self, method):
+        """
+        Return the ``(url, kwargs)`` of the requests sent with ``method``.
+        """
+        return [(url, kwargs) for sent, url, kwargs in self.transport.calls
+                if sent == method]
+
+    def test_all_jobs(self):
+        self.route('GET', '/api/python', {'jobs': [
             {'name': 'job1', 'color': 'blue'},
-            {'name': 'colorless'}]}
-        requests.get.return_value = mock_response(response)
+            {'name': 'colorless'}]})
         jobs = self.jenkins.all_jobs()
-        requests.get.assert_called_once_with('http://jenkins/api/python',
-                                             verify=True,
-                                             proxies={},
-                                             auth=None)
+        self.assertEqual([('http://jenkins/api/python', SENT)],
+                         self.sent('GET'))
         self.assertEqual(jobs, [('job1', 'blue')])
 
-    def test_all_jobs_including_colorless(self, requests):
-        response = {'jobs': [
+    def test_all_jobs_including_colorless(self):
+        self.route('GET', '/api/python', {'jobs': [
             {'name': 'job1', 'color': 'blue'},
-            {'name': 'colorless'}]}
-        requests.get.return_value = mock_response(response)
+            {'name': 'colorless'}]})
         jobs = self.jenkins.all_jobs(include_colorless=True)
-        requests.get.assert_called_once_with('http://jenkins/api/python',
-                                             verify=True,
-                                             proxies={},
-                                             auth=None)
+        self.assertEqual([('http://jenkins/api/python', SENT)],
+                         self.sent('GET'))
         self.assertEqual(jobs, [('job1', 'blue'), ('colorless', None)])
 
-    def test_get_job_url(self, *args):
+    def test_get_job_url(self):
         url = self.jenkins.job_url('job123')
         self.assertEqual('http://jenkins/job/job123', url)
 
-    def test_last_result(self, requests, *args):
-        second_response = Mock(status_code=200)
-        second_response.text = "{'result': 23}"
-        requests.get.side_effect = [
-            mock_response('job_info.txt'), second_response
-        ]
+    def test_last_result(self):
+        self.route('GET', '/job/name/api/python', 'job_info.txt')
+        self.route('GET', '/job/Solr-Trunk/1783/api/python', {'result': 23})
         response = self.jenkins.last_result('name')
         self.assertEqual(23, response['result'])
         self.assertEqual(
-            (('https://builds.apache.org/job/Solr-Trunk/1783/api/python',),
-             {'auth': None, 'verify': True, 'proxies': {}}),
-            requests.get.call_args_list[1]
-        )
+            ('https://builds.apache.org/job/Solr-Trunk/1783/api/python',
+             SENT),
+            self.sent('GET')[1])
 
     @data(
         ('job_info', 'job/{0}/api/python'),
@@ -100,26 +114,19 @@ class TestJenkins(TestCase):
         ('last_success', 'job/{0}/lastSuccessfulBuild/api/python'),
         ('get_config_xml', 'job/{0}/config.xml'),
     )
-    def test_get_methods_with_jobname(self, case, requests):
+    def test_get_methods_with_jobname(self, case):
         method, url = case
-        requests.get.return_value = mock_response('{0}.txt'.format(method))
+        self.route('GET', '/' + url.format('name'), '{0}.txt'.format(method))
         response = getattr(self.jenkins, method)('name')
-        requests.get.assert_called_once_with(
-            'http://jenkins/' + url.format('name'),
-            verify=True,
-            proxies={},
-            auth=None)
+        self.assertEqual([('http://jenkins/' + url.format('name'), SENT)],
+                         self.sent('GET'))
         getattr(self, 'checks_{0}'.format(method))(response)
 
-    def test_build_info(self, requests):
+    def test_build_info(self):
         url = 'job/name/3/api/python'
-        requests.get.return_value = mock_response('last_build_info.txt')
+        self.route('GET', '/' + url, 'last_build_info.txt')
         self.jenkins.build_info('name', 3)
-        requests.get.assert_called_once_with(
-            'http://jenkins/' + url,
-            verify=True,
-            proxies={},
-            auth=None)
+        self.assertEqual([('http://jenkins/' + url, SENT)], self.sent('GET'))
 
     def check_result(self, response, route, value):
         for key in route:
@@ -171,81 +178,62 @@ class TestJenkins(TestCase):
 
     # TODO: test job creation, and set_config_xml
     @patch('autojenkins.jobs.Jenkins.job_exists')
-    def test_create(self, job_exists, requests):
+    def test_create(self, job_exists):
         job_exists.side_effect = side_effect_job_exists
-        requests.post.return_value = mock_response()
+        self.route('POST', '/createItem?name=job')
         config_xml = path.join(fixture_path, 'create_copy.txt')
         self.jenkins.create('job', config_xml, value='2')
         CFG = "<value>2</value><disabled>true</disabled>"
-        requests.post.assert_called_once_with(
-            'http://jenkins/createItem',
-            auth=None,
-            headers={'Content-Type': 'application/xml'},
-            params={'name': 'job'},
-            data=CFG,
-            proxies={},
-            verify=True)
+        self.assertEqual(
+            [('http://jenkins/createItem',
+              dict(SENT, headers=XML, params={'name': 'job'}, data=CFG))],
+            self.sent('POST'))
 
     @patch('autojenkins.jobs.Jenkins.job_exists')
-    def test_create_copy(self, job_exists, requests):
+    def test_create_copy(self, job_exists):
         job_exists.side_effect = side_effect_job_exists
-        requests.get.return_value = mock_response('create_copy.txt')
-        requests.post.return_value = mock_response()
+        self.route('GET', '/job/template/config.xml', 'create_copy.txt')
+        self.route('POST', '/createItem?name=job')
         self.jenkins.create_copy('job', 'template', value='2')
         CFG = "<value>2</value><disabled>false</disabled>"
-        requests.post.assert_called_once_with(
-            'http://jenkins/createItem',
-            auth=None,
-            headers={'Content-Type': 'application/xml'},
-            params={'name': 'job'},
-            data=CFG,
-            proxies={},
-            verify=True)
+        self.assertEqual(
+            [('http://jenkins/createItem',
+              dict(SENT, headers=XML, params={'name': 'job'}, data=CFG))],
+            self.sent('POST'))
 
     @patch('autojenkins.jobs.Jenkins.job_exists')
-    def test_create_copy_forced_job_exists(self, job_exists, requests):
+    def test_create_copy_forced_job_exists(self, job_exists):
         job_exists.side_effect = side_effect_job_exists
-        requests.get.return_value = mock_response('create_copy.txt')
-        requests.post.return_value = mock_response()
+        self.route('GET', '/job/template/config.xml', 'create_copy.txt')
+        self.route('POST', '/createItem?name=job')
         self.jenkins.create_copy('job', 'template', _force=True, value='2')
         CFG = "<value>2</value><disabled>false</disabled>"
-        requests.post.assert_called_once_with(
-            'http://jenkins/createItem',
-            auth=None,
-            headers={'Content-Type': 'application/xml'},
-            params={'name': 'job'},
-            data=CFG,
-            proxies={},
-            verify=True)
+        self.assertEqual(
+            [('http://jenkins/createItem',
+              dict(SENT, headers=XML, params={'name': 'job'}, data=CFG))],
+            self.sent('POST'))
 
     @patch('autojenkins.jobs.Jenkins.job_exists')
-    def test_create_copy_forced_new_job(self, job_exists, requests):
+    def test_create_copy_forced_new_job(self, job_exists):
         job_exists.side_effect = side_effect_job_exists
-        requests.get.return_value = mock_response('create_copy.txt')
-        requests.post.return_value = mock_response()
+        self.route('GET', '/job/template/config.xml', 'create_copy.txt')
+        self.route('POST', '/job/name/config.xml')
         self.jenkins.create_copy('name', 'template', _force=True, value='2')
         CFG = "<value>2</value><disabled>false</disabled>"
-        requests.post.assert_called_once_with(
-            'http://jenkins/job/name/config.xml',
-            headers={'Content-Type': 'application/xml'},
-            data=CFG,
-            auth=None,
-            proxies={},
-            verify=True)
-
-    def test_transfer(self, requests):
-        requests.get.return_value = mock_response('transfer.txt')
-        requests.post.return_value = mock_response()
+        self.assertEqual(
+            [('http://jenkins/job/name/config.xml',
+              dict(SENT, headers=XML, data=CFG))],
+            self.sent('POST'))
+
+    def test_transfer(self):
+        self.route('GET', '/job/job/config.xml', 'transfer.txt')
+        self.route('POST', '/createItem?name=job')
         self.jenkins.transfer('job', 'http://jenkins2')
         CFG = load_fixture('transfer.txt')
-        requests.post.assert_called_once_with(
-            'http://jenkins2/createItem',
-            auth=None,
-            headers={'Content-Type': 'application/xml'},
-            params={'name': 'job'},
-            data=CFG,
-            proxies={},
-            verify=True)
+        self.assertEqual(
+            [('http://jenkins2/createItem',
+              dict(SENT, headers=XML, params={'name': 'job'}, data=CFG))],
+            self.sent('POST'))
 
     @data(
         ('build', 'job/{0}/build'),
@@ -256,38 +244,30 @@ class TestJenkins(TestCase):
     @patch('autojenkins.jobs.Jenkins.job_info')
     @patch('autojenkins.jobs.Jenkins.job_exists')
     def test_post_methods_with_jobname_no_data(self, case, job_exists,
-                                               job_info, requests):
+                                               job_info):
         method, url = case
         # Jenkins API post methods return status 302 upon success
-        requests.post.return_value = mock_response(status=302)
+        self.route('POST', '/' + url.format('name'), status=302)
         job_exists.side_effect = side_effect_job_exists
         job_info.return_value = {'buildable': True}
         response = getattr(self.jenkins, method)('name')
         self.assertEqual(302, response.status_code)
-        kwargs = {
-            'auth': None,
-            'proxies': {},
-            'verify': True
-        }
+        kwargs = dict(SENT)
         if method == 'build':
             kwargs['params'] = None
-        requests.post.assert_called_once_with(
-            'http://jenkins/' + url.format('name'),
-            **kwargs)
+        self.assertEqual([('http://jenkins/' + url.format('name'), kwargs)],
+                         self.sent('POST'))
 
-    def test_set_config_xml(self, requests):
-        requests.post.return_value = Mock(status_code=200)
+    def test_set_config_xml(self):
+        self.route('POST', '/job/name/config.xml')
         CFG = '<config>x</config>'
         response = self.jenkins.set_config_xml('name', CFG)
         # return value is a pass-trough
-        self.assertEqual(requests.post.return_value, response)
-        requests.post.assert_called_once_with(
-            'http://jenkins/job/name/config.xml',
-            headers={'Content-Type': 'application/xml'},
-            data=CFG,
-            auth=None,
-            proxies={},
-            verify=True)
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(
+            [('http://jenkins/job/name/config.xml',
+              dict(SENT, headers=XML, data=CFG))],
+            self.sent('POST'))
 
     @patch('autojenkins.jobs.time')
     @patch('autojenkins.jobs.Jenkins.last_result')
@@ -295,27 +275,24 @@ class TestJenkins(TestCase):
     @patch('autojenkins.jobs.Jenkins.job_exists')
     @patch('autojenkins.jobs.Jenkins.job_info')
     def test_build_with_wait(self, job_info, job_exists, wait_for_build,
-                             last_result, time, requests):
+                             last_result, time):
         """Test building a job synchronously"""
         job_exists.side_effect = side_effect_job_exists
         job_info.return_value = {'buildable': True}
-        requests.post.return_value = mock_response(status=302)
+        self.route('POST', '/job/name/build', status=302)
         last_result.return_value = {'result': 'HELLO'}
         result = self.jenkins.build('name', wait=True)
         self.assertEqual({'result': 'HELLO'}, result)
-        requests.post.assert_called_once_with(
-            'http://jenkins/job/name/build',
-            auth=None,
-            params=None,
-            proxies={},
-            verify=True)
+        self.assertEqual(
+            [('http://jenkins/job/name/build', dict(SENT, params=None))],
+            self.sent('POST'))
         last_result.assert_called_once_with('name')
         time.sleep.assert_called_once_with(10)
 
     @patch('autojenkins.jobs.time')
     @patch('autojenkins.jobs.sys')
     @patch('autojenkins.jobs.Jenkins.is_building')
-    def test_wait_for_build(self, is_building, sys, time, requests):
+    def test_wait_for_build(self, is_building, sys, time):
         is_building.side_effect = [True, True, False]
         self.jenkins.wait_for_build('name')
         self.assertEqual(3, is_building.call_count)
@@ -324,22 +301,54 @@ class TestJenkins(TestCase):
 
     @patch('autojenkins.jobs.Jenkins.last_result')
     @data(True, False)
-    def test_is_building(self, building, last_result, _):
+    def test_is_building(self, building, last_result):
         last_result.return_value = {'building': building}
         result = self.jenkins.is_building('name')
         last_result.assert_called_once_with('name')
         self.assertEqual(building, result)
 
-    def test_404_raises_http_not_found(self, requests):
-        http404_response = Mock()
-        http404_response.status_code = 404
-        requests.get.return_value = http404_response
+    def test_404_raises_http_not_found(self):
         with self.assertRaises(HttpNotFoundError):
             self.jenkins.last_build_info('job123')
 
-    def test_500_raises_http_error(self, requests):
-        http500_response = Mock()
-        http500_response.status_code = 500
-        requests.get.return_value = http500_response
+    def test_500_raises_http_error(self):
+        self.route('GET', '/job/job123/lastBuild/api/python', status=500)
         with self.assertRaises(HttpStatusError):
             self.jenkins.last_build_info('job123')
+
+    def test_post_fetches_crumb_once_after_rejection(self):
+        rejected = (403, {}, 'No valid crumb was included in the request')
+        self.route('GET', '/crumbIssuer/api/python',
+                   {'crumbRequestField': 'Jenkins-Crumb', 'crumb': 'abc'})
+        self.transport.routes[('POST', '/job/job1/enable')] = replies(
+            rejected, reply(status=302))
+        self.route('POST', '/job/job2/disable', status=302)
+        self.jenkins.enable('job1')
+        self.jenkins.disable('job2')
+        self.assertEqual([('http://jenkins/crumbIssuer/api/python', SENT)],
+                         self.sent('GET'))
+        posts = self.sent('POST')
+        self.assertEqual(3, len(posts))
+        self.assertEqual(
+            ('http://jenkins/job/job2/disable',
+             dict(SENT, headers={'Jenkins-Crumb': 'abc'})),
+            posts[2])
+
+    def test_post_refreshes_expired_crumb(self):
+        self.jenkins._crumb = ({'Jenkins-Crumb': 'old'}, None)
+        rejected = (403, {}, 'No valid crumb was included in the request')
+        self.route('GET', '/crumbIssuer/api/python',
+                   {'crumbRequestField': 'Jenkins-Crumb', 'crumb': 'new'})
+        self.transport.routes[('POST', '/job/job1/enable')] = replies(
+            rejected, reply(status=302))
+        response = self.jenkins.enable('job1')
+        self.assertEqual(302, response.status_code)
+        self.assertEqual({'Jenkins-Crumb': 'new'},
+                         self.sent('POST')[-1][1]['headers'])
+
+    def test_forbidden_without_crumb_issuer_raises(self):
+        self.transport.routes[('POST', '/job/job1/enable')] = (
+            403, {}, 'No valid crumb was included in the request')
+        with self.assertRaises(HttpForbidden):
+            self.jenkins.enable('job1')
+        self.assertEqual(1, len(self.sent('POST')))
@@ -0,0 +1,383 @@
+"""
+Transports send the HTTP requests of a :class:`autojenkins.jobs.Jenkins`.
+
+Every request of a client goes through its transport, an implementation of
+:class:`Transport`: a ``request(method, url, **kwargs)`` method accepting
+the keyword arguments of :func:`requests.request` and returning a response
+with the interface of :class:`requests.Response`, and a ``close()``
+method::
+
+    jenkins = Jenkins(url, transport=RequestsTransport())
+
+Transports must be safe to call from several threads at once. This module
+provides:
+
+* :class:`SessionTransport`, the default, over pooled keep-alive
+  connections,
+* :class:`RequestsTransport`, a new connection per request,
+* :class:`MemoryTransport`, canned responses without any network, for
+  tests,
+* a recording transport that saves real controller responses to a compact
+  file, and a replay transport that serves them back without any network::
+
+    with RecordingTransport(RequestsTransport(), 'jenkins.jsonl.gz') as rec:
+        Jenkins(url, transport=rec).all_jobs()
+
+    replay = ReplayTransport('jenkins.jsonl.gz', latency_scale=1.0)
+    Jenkins(url, transport=replay).all_jobs()
+"""
+import base64
+import datetime
+import gzip
+import io
+import json
+import tempfile
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from autojenkins.parallel import DEFAULT_WORKERS
+
+
+#: Request headers that select what a response holds, and so are part of
+#: the key matching a request with a recorded response
+KEY_HEADERS = ('Range', 'If-Range', 'If-Match', 'If-None-Match',
+               'If-Modified-Since', 'If-Unmodified-Since')
+#: Bytes of a streamed body encoded at once when recording it; a multiple
+#: of 3, so that the base64 blocks can be concatenated
+SPOOL_BLOCK = 3 * 256 * 1024
+
+
+class ReplayError(Exception):
+    pass
+
+
+class Transport(object):
+    """
+    Interface of transports.
+    """
+
+    def request(self, method, url, **kwargs):
+        """
+        Send a request and return its response.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """
+        Release the resources of the transport, such as connections.
+        """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class RequestsTransport(Transport):
+    """
+    Send each request with the ``requests`` library.
+    """
+
+    def request(self, method, url, **kwargs):
+        return getattr(requests, method.lower())(url, **kwargs)
+
+
+class SessionTransport(Transport):
+    """
+    Send requests over a pool of keep-alive connections.
+
+    Each thread gets its own :class:`requests.Session`, so that cookies and
+    other session state are never shared, but all sessions are mounted on
+    the same adapter and share its connection pool, which ``urllib3`` keeps
+    thread-safe.
+
+    :param pool_size:
+        Connections kept open per host; more threads than this still work,
+        but their extra connections are closed after use
+    :param per_thread_pool:
+        If ``True``, give each thread its own connection pool instead
+    """
+
+    def __init__(self, pool_size=2 * DEFAULT_WORKERS, per_thread_pool=False):
+        self.pool_size = pool_size
+        self.per_thread_pool = per_thread_pool
+        self._adapters = []
+        self._adapters_lock = threading.Lock()
+        self._adapter = None if per_thread_pool else self._new_adapter()
+        self._local = threading.local()
+
+    def _new_adapter(self):
+        adapter = HTTPAdapter(pool_connections=self.pool_size,
+                              pool_maxsize=self.pool_size)
+        with self._adapters_lock:
+            self._adapters.append(adapter)
+        return adapter
+
+    @property
+    def session(self):
+        """
+        The session of the calling thread.
+        """
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            adapter = self._adapter or self._new_adapter()
+            session = requests.Session()
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            self._local.session = session
+        return session
+
+    def request(self, method, url, **kwargs):
+        return self.session.request(method, url, **kwargs)
+
+    def close(self):
+        """
+        Close all pooled connections.
+        """
+        with self._adapters_lock:
+            for adapter in self._adapters:
+                adapter.close()
+
+
+def request_key(method, url, params=None, headers=None):
+    """
+    Return the key used to match a request with a recorded response, made
+    of its method, URL, parameters and :data:`KEY_HEADERS`.
+    """
+    if params:
+        params = sorted((str(key), str(value))
+                        for key, value in params.items())
+    key = [method.upper(), url, params or []]
+    if headers:
+        headers = CaseInsensitiveDict(headers)
+        selected = [[name, str(headers[name])] for name in KEY_HEADERS
+                    if name in headers]
+        if selected:
+            key.append(selected)
+    return json.dumps(key)
+
+
+def _encode_body(content):
+    try:
+        return {'text': content.decode('utf-8')}
+    except UnicodeDecodeError:
+        return {'base64': base64.b64encode(content).decode('ascii')}
+
+
+def _decode_body(record):
+    if 'text' in record:
+        return record['text'].encode('utf-8')
+    return base64.b64decode(record['base64'])
+
+
+class _RecordedStream(object):
+    """
+    A streamed response whose chunks are spooled to a temporary file as
+    they are read, and passed to ``finish`` once the stream is exhausted
+    or closed.
+    """
+
+    def __init__(self, response, finish):
+        self._response = response
+        self._finish = finish
+        self._spool = tempfile.TemporaryFile()
+        self._finished = False
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+    def iter_content(self, chunk_size=1):
+        for chunk in self._response.iter_content(chunk_size):
+            self._spool.write(chunk)
+            yield chunk
+        self._record()
+
+    @property
+    def content(self):
+        return b''.join(self.iter_content(SPOOL_BLOCK))
+
+    @property
+    def text(self):
+        encoding = getattr(self._response, 'encoding', None)
+        return self.content.decode(encoding or 'utf-8', 'replace')
+
+    def _record(self):
+        if not self._finished:
+            self._finished = True
+            self._finish(self._spool)
+
+    def close(self):
+        self._record()
+        self._response.close()
+
+
+class RecordingTransport(Transport):
+    """
+    Pass requests on to another transport and record every response.
+
+    Records are written as gzipped JSON lines, one per response, holding
+    the request method, URL, parameters and :data:`KEY_HEADERS`, and the
+    response status, headers, body and the time it took to receive it.
+
+    Streamed responses are recorded without holding their body in memory:
+    chunks go to a temporary file as they are read, and the record is
+    written once the response is exhausted or closed, with the part of the
+    body that was read.
+    """
+
+    def __init__(self, transport, path):
+        self.transport = transport
+        self.path = path
+        self._file = gzip.open(path, 'wb')
+        self._lock = threading.Lock()
+
+    def request(self, method, url, **kwargs):
+        started = time.time()
+        response = self.transport.request(method, url, **kwargs)
+        record = {
+            'key': request_key(method, url, kwargs.get('params'),
+                               kwargs.get('headers')),
+            'status': response.status_code,
+            'headers': dict(response.headers),
+            'elapsed': time.time() - started,
+        }
+        if kwargs.get('stream'):
+            return _RecordedStream(
+                response, lambda spool: self._write_spooled(record, spool))
+        record.update(_encode_body(response.content))
+        line = (json.dumps(record, sort_keys=True) + '\n').encode('utf-8')
+        with self._lock:
+            self._file.write(line)
+        return response
+
+    def _write_spooled(self, record, spool):
+        """
+        Write a record whose body is in the file ``spool``, encoding it a
+        block at a time.
+        """
+        head = json.dumps(record, sort_keys=True)[:-1] + ', "base64": "'
+        spool.seek(0)
+        with self._lock:
+            self._file.write(head.encode('utf-8'))
+            for block in iter(lambda: spool.read(SPOOL_BLOCK), b''):
+                self._file.write(base64.b64encode(block))
+            self._file.write(b'"}\n')
+        spool.close()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class ReplayResponse(object):
+    """
+    A recorded response, with the parts of the ``requests.Response``
+    interface that autojenkins uses.
+    """
+
+    def __init__(self, url, status_code, headers, content, elapsed=0.0):
+        self.url = url
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers)
+        self.content = content
+        self.elapsed = datetime.timedelta(seconds=elapsed)
+        self.cookies = {}
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', 'replace')
+
+    def iter_content(self, chunk_size=1):
+        stream = io.BytesIO(self.content)
+        return iter(lambda: stream.read(chunk_size), b'')
+
+    def json(self):
+        return json.loads(self.text)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError('HTTP Status: {0}'.format(
+                self.status_code))
+
+    def close(self):
+        pass
+
+
+class ReplayTransport(Transport):
+    """
+    Serve responses from a file written by :class:`RecordingTransport`.
+
+    Responses to the same request are served in the order they were
+    recorded; the last one is repeated once they are exhausted.
+
+    :param latency_scale:
+        If given, wait for the recorded response time multiplied by this
+        factor before returning each response.
+    """
+
+    def __init__(self, path, latency_scale=None):
+        self.latency_scale = latency_scale
+        self._responses = {}
+        self._lock = threading.Lock()
+        with gzip.open(path, 'rb') as records:
+            for line in records:
+                record = json.loads(line.decode('utf-8'))
+                self._responses.setdefault(record['key'], []).append(record)
+
+    def request(self, method, url, **kwargs):
+        key = request_key(method, url, kwargs.get('params'),
+                          kwargs.get('headers'))
+        with self._lock:
+            records = self._responses.get(key)
+            if not records:
+                raise ReplayError('No recorded response for {0} {1}'.format(
+                    method, url))
+            record = records.pop(0) if len(records) > 1 else records[0]
+        if self.latency_scale:
+            time.sleep(record['elapsed'] * self.latency_scale)
+        return ReplayResponse(url, record['status'], record['headers'],
+                              _decode_body(record), record['elapsed'])
+
+
+class MemoryTransport(Transport):
+    """
+    Serve canned responses from ``routes``, without any network.
+
+    ``routes`` maps ``(method, path)`` to ``(status, headers, body)`` or to
+    a callable taking the request body and returning that tuple, where
+    ``path`` includes the query string, as in the routes of the test
+    server. Other requests get a 404. :attr:`requests` holds the
+    ``(method, path, body)`` of every request served, and :attr:`calls`
+    the ``(method, url, kwargs)`` it was sent with.
+    """
+
+    def __init__(self, routes=None):
+        self.routes = routes or {}
+        self.requests = []
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def request(self, method, url, **kwargs):
+        prepared = requests.Request(
+            method, url, params=kwargs.get('params'),
+            data=kwargs.get('data'), headers=kwargs.get('headers')).prepare()
+        body = prepared.body or b''
+        if not isinstance(body, bytes):
+            body = body.encode('utf-8')
+        with self._lock:
+            self.requests.append((method, prepared.path_url, body))
+            self.calls.append((method, url, kwargs))
+        route = self.routes.get((method, prepared.path_url))
+        if route is None:
+            status, headers, content = 404, {}, 'Not found'
+        else:
+            status, headers, content = (route(body) if callable(route)
+                                        else route)
+        if not isinstance(content, bytes):
+            content = content.encode('utf-8')
+        return ReplayResponse(prepared.url, status, headers, content)
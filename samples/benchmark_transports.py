@@ -0,0 +1,111 @@
+"""
+Compare the transports on the same workload.
+
+A local server stands in for Jenkins with a fixed latency per request, and
+the in-memory transport serves the very same routes without any network.
+Each transport runs the same mix of job listings and job information
+requests from several threads. Last, the speed-up of the shared session
+pool from one thread to all of them is measured.
+
+Usage: python samples/benchmark_transports.py [REQUESTS] [WORKERS] [LATENCY]
+"""
+from __future__ import print_function
+
+import sys
+import time
+
+from autojenkins import Jenkins
+from autojenkins.parallel import imap_unordered
+from autojenkins.stats import percentile
+from autojenkins.tests.server import FakeJenkinsServer
+from autojenkins.transport import (MemoryTransport, RequestsTransport,
+                                   SessionTransport)
+
+
+JOBS = 64
+
+
+def routes(latency):
+    def respond(content):
+        def handle(body):
+            time.sleep(latency)
+            return 200, {}, content
+        return handle
+
+    jobs = [{'name': 'job{0}'.format(index), 'color': 'blue'}
+            for index in range(JOBS)]
+    table = {('GET', '/api/python'): respond(str({'jobs': jobs}))}
+    for job in jobs:
+        table[('GET', '/job/{0}/api/python'.format(job['name']))] = respond(
+            str(dict(job, buildable=True, builds=[{'number': 1}])))
+    return table
+
+
+def workload(jenkins, count, workers):
+    """
+    Run ``count`` operations, one in ten a job listing, from ``workers``
+    threads; return the elapsed time and the latency of each operation.
+    """
+    def operate(index):
+        started = time.time()
+        if index % 10 == 0:
+            jenkins.all_jobs()
+        else:
+            jenkins.job_info('job{0}'.format(index % JOBS))
+        return time.time() - started
+
+    started = time.time()
+    latencies = []
+    for _, latency, error in imap_unordered(operate, range(count), workers):
+        if error is not None:
+            raise error
+        latencies.append(latency)
+    return time.time() - started, latencies
+
+
+def scaling(table, count, workers):
+    """
+    Return how many times more operations per second the shared session
+    pool runs from ``workers`` threads than from one.
+    """
+    serial_count = max(count // workers, 1)
+    with FakeJenkinsServer(table) as server:
+        jenkins = Jenkins(server.url, transport=SessionTransport())
+        serial, _ = workload(jenkins, serial_count, 1)
+        parallel, _ = workload(jenkins, count, workers)
+        jenkins.close()
+    return (count / parallel) / (serial_count / serial)
+
+
+def main(count=2000, workers=8, latency=0.002):
+    table = routes(latency)
+    transports = [
+        ('requests', RequestsTransport),
+        ('session (shared pool)', SessionTransport),
+        ('session (pool per thread)',
+         lambda: SessionTransport(per_thread_pool=True)),
+        ('memory', lambda: MemoryTransport(table)),
+    ]
+    FORMAT = '{0:<26} {1:>10} {2:>9} {3:>9} {4:>12}'
+    print(FORMAT.format('TRANSPORT', 'REQ/S', 'P50(ms)', 'P95(ms)',
+                        'CONNECTIONS'))
+    for name, factory in transports:
+        with FakeJenkinsServer(table) as server:
+            transport = factory()
+            jenkins = Jenkins(server.url, transport=transport)
+            elapsed, latencies = workload(jenkins, count, workers)
+            transport.close()
+            connections = (len(server.clients)
+                           if not isinstance(transport, MemoryTransport)
+                           else '-')
+        print(FORMAT.format(name, '{0:.0f}'.format(count / elapsed),
+                            '{0:.2f}'.format(percentile(latencies, 50) * 1000),
+                            '{0:.2f}'.format(percentile(latencies, 95) * 1000),
+                            connections))
+    print('Shared pool speed-up from 1 to {0} threads: {1:.1f}x'.format(
+        workers, scaling(table, count, workers)))
+
+
+if __name__ == '__main__':
+    arguments = sys.argv[1:]
+    main(*[cast(value) for cast, value in zip((int, int, float), arguments)])
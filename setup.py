@@ -15,7 +15,8 @@ setup(
     author_email='carles@barrobes.com',
     url='https://github.com/txels/autojenkins',
     packages=['autojenkins'],
-    install_requires=['docopt', 'requests', 'jinja2'],
+    install_requires=['docopt', 'requests', 'jinja2',
+                      'futures; python_version < "3"'],
     entry_points=dict(
         console_scripts=[
             'autojenkins = autojenkins.run:Commands.main'